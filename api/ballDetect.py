@@ -1,20 +1,35 @@
-import cv2
-import numpy as np
 import os
-import shutil
-import base64
+import time
 import sys
-from ultralytics import YOLO
+import asyncio
+import torch
+from concurrent.futures import ThreadPoolExecutor
 
 # --- ADD THIS TO FIND 'src' FOLDER ---
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # -------------------------------------
 
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, UploadFile, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
+from src.config import (DEFAULT_CONF, INFERENCE_BATCH_SIZE, ANALYSIS_FPS, JOB_WORKERS,
+                        BUDGET_SECONDS, BUDGET_FRAMES, TRACK_DETECT_EVERY, INFERENCE_BACKEND,
+                        INFERENCE_IMGSZ, EVIDENCE_JPEG_QUALITY, EVIDENCE_MAX_WIDTH, MAX_PROCESSING_SECONDS,
+                        MAX_ANALYZED_FRAMES, CASCADE_THRESHOLD, svm_model_path)
+from src.analysis import analyze_video, validate_mode
+from src.ingest import ingest_upload, UploadTooLarge
+from src.jobs import JobManager, QueueFull, Cancelled
+from src.detector import validate_backend, available_backends, weights_version
+from src.resolution import parse_imgsz
+from src.cascade import validate_cascade
+from src.model_registry import thread_model, preload_thread_models, registry_stats
+from src.result_cache import ResultCache, cache_key
+from src.detection_cache import open_store, validate_conf
+from src.evidence import Evidence, EvidenceStore
+from src.streaming import EventStream, sse, await_unless_disconnected
+
 app = FastAPI()
 
 # --- ENABLE BROWSER ACCESS ---
@@ -32,124 +47,314 @@ frontend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'fr
 if os.path.exists(frontend_dir):
     app.mount("/static", StaticFiles(directory=frontend_dir), name="static")
 
-# 1. Load Model
-src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
-# Try specific model first, then fallback
-model_paths = [
-    os.path.join(src_dir, 'best.pt')
-]
-
-model = None
-model_path = None
-for mp in model_paths:
-    if os.path.exists(mp):
-        model_path = mp
-        break
-
-target_classes = None
-
-if model_path:
-    print(f"Loading model from: {model_path}")
-    model = YOLO(model_path)
-    # Check for 'ball' class to filter
-    ball_ids = [k for k, v in model.names.items() if 'ball' in v.lower()]
-    if ball_ids:
-        target_classes = ball_ids
-        print(f"Filtering for ball classes: {target_classes}")
-else:
+# Split torch's intra-op threads between concurrent jobs instead of oversubscribing the CPU
+torch.set_num_threads(max(1, (os.cpu_count() or 1) // JOB_WORKERS))
+
+# 1. Load Model (see src/model_registry.py). Every job worker thread gets its own instance, since
+# predictors are not thread-safe; they are loaded and warmed up now rather than on each worker's
+# first job. The first one also answers for the weights path and class names, so no extra copy is held
+worker_models = preload_thread_models(count=JOB_WORKERS)
+loaded_model = worker_models[0] if worker_models else None
+model = loaded_model.model if loaded_model else None
+target_classes = loaded_model.classes if loaded_model else None
+if loaded_model is None:
     print("Warning: No  model found.")
 
+def worker_model(backend):
+    return thread_model(loaded_model.path, backend).model
+
+jobs = JobManager()
+
+# Finished analyses keyed by upload content hash, weights version and options, so a repeated
+# upload is answered from disk without decoding a single frame
+results = ResultCache()
+# Cache writes encode the evidence JPEG, so they happen off the request path
+cache_writer = ThreadPoolExecutor(max_workers=1)
+
+# Evidence frames are drawn and encoded only when fetched from GET /evidence/{id}
+evidence_store = EvidenceStore()
+
+def analysis_options(target_fps: float = ANALYSIS_FPS, mode: str = 'first-hit',
+                     budget_seconds: float = BUDGET_SECONDS, budget_frames: int = BUDGET_FRAMES,
+                     track: bool = False, detect_every: int = TRACK_DETECT_EVERY, motion: bool = False,
+                     cascade: bool = False, cascade_threshold: float = CASCADE_THRESHOLD,
+                     backend: str = INFERENCE_BACKEND, imgsz: str = INFERENCE_IMGSZ, conf: float = DEFAULT_CONF):
+    """Query parameters shared by /detect and /jobs; all but backend are passed straight through to analyze_video."""
+    return {
+        "target_fps": target_fps,
+        "mode": mode,
+        "budget_seconds": budget_seconds,
+        "budget_frames": budget_frames,
+        "track": track,
+        "detect_every": detect_every,
+        "motion": motion,
+        "cascade": cascade,
+        "cascade_threshold": cascade_threshold,
+        "backend": backend,
+        "imgsz": imgsz,
+        "conf": conf,
+    }
+
+def validate_options(options):
+    """
+    Raise ValueError for an unknown mode or imgsz, a conf below the detection
+    cache's floor, cascade=true without a trained SVM, or a backend whose
+    weights haven't been exported.
+    """
+    validate_mode(options["mode"])
+    validate_conf(options["conf"])
+    parse_imgsz(options["imgsz"])
+    validate_cascade(options["cascade"])
+    if validate_backend(options["backend"]) not in available_backends(loaded_model.path):
+        raise ValueError(f"No {options['backend']} weights; export them with: python run.py --mode export "
+                         f"--format {options['backend']}")
+
+def result_key(video, options):
+    """Result cache key for an ingested upload analysed with options (backend included)."""
+    version = weights_version(loaded_model.path, options["backend"])
+    if options["cascade"]:
+        # A retrained SVM gates different frames
+        version += '+' + weights_version(svm_model_path, 'pytorch')
+    return cache_key(video.digest, version, options["conf"], options)
+
+def evidence_fields(evidence):
+    """Where to fetch the evidence image from, instead of the image itself."""
+    if evidence is None:
+        return {"evidence_id": None, "evidence_url": None}
+    evidence_id = evidence_store.add(evidence)
+    return {"evidence_id": evidence_id, "evidence_url": f"/evidence/{evidence_id}"}
+
+def cached_response(cached, filename, video, request_start):
+    """A cache hit as a /detect response; only the timings of this request are fresh."""
+    response, image = cached
+    response["filename"] = filename
+    response.update(evidence_fields(Evidence.from_jpeg(image) if image is not None else None))
+    response["cached"] = True
+    response["timings"] = dict(video.stats(), total_seconds=round(time.perf_counter() - request_start, 3))
+    return response
+
+def run_analysis(video, filename, request_start, options, progress=None, should_stop=None, key=None, stream=None):
+    """
+    Blocking part of /detect, /detect/stream and /jobs; runs on a job worker
+    thread. With a result cache key, the response is stored for later uploads
+    of the same video unless it is partial (stopped by the processing budget,
+    the server's request limits or cancelled). With an EventStream, progress
+    and every detection are emitted to it as they happen.
+    """
+    options = dict(options)
+    backend = options.pop("backend")
+    on_detection = None
+    if stream is not None:
+        progress = stream.progress_callback(also=progress)
+        on_detection = stream.detection_callback(evidence_fields)
+    try:
+        if should_stop is not None and should_stop():
+            raise Cancelled("Cancelled before it started.")
+        # OPTIMIZATION: decode on a reader thread and run YOLO on batches of sampled frames (see src/analysis.py)
+        store = open_store(video.digest, weights_version(loaded_model.path, backend))
+        analysis = analyze_video(worker_model(backend), video.path, classes=target_classes,
+                                 batch_size=INFERENCE_BATCH_SIZE, progress=progress, on_detection=on_detection,
+                                 should_stop=should_stop, started_at=request_start, store=store,
+                                 max_seconds=MAX_PROCESSING_SECONDS, max_frames=MAX_ANALYZED_FRAMES, **options)
+    finally:
+        video.close()
+
+    timings = analysis["timings"]
+    timings.update(video.stats())
+    frame_skip = analysis["frame_skip"]
+
+    print(f"Processed {analysis['frames_processed']} out of {analysis['video_frames']} frames (skipped {frame_skip-1} of every {frame_skip} frames, batch size {INFERENCE_BATCH_SIZE})")
+    print(f"Stage timings: {timings}")
+
+    # 3. Return Results
+    detections = analysis["detections"]
+    is_knock_on = len(detections) > 0
+    evidence = analysis["evidence"]
+
+    response = {
+        "filename": filename,
+        "total_frames": analysis["total_frames"],
+        "event_detected": is_knock_on,
+        "detections_count": len(detections),
+        "first_detection_frame": detections[0]["frame"] if detections else None,
+        "event_confidence": analysis["event_confidence"],
+        "mode": analysis["mode"],
+        "stop_reason": analysis["stop_reason"],
+        "coverage": analysis["coverage"],
+        "trajectory": analysis["trajectory"],
+        "model_calls": analysis["model_calls"],
+        "backend": backend,
+        "imgsz": analysis["imgsz"],
+        "motion": analysis["motion"],
+        "cascade": analysis["cascade"],
+        "detection_cache": analysis["detection_cache"],
+        "frame_skip": frame_skip,
+        "decode_ms_per_analyzed_frame": timings["decode_ms_per_analyzed_frame"],
+        "timings": timings
+    }
+    # mode='adaptive' also reports the [start, end] frames of every ball event it refined
+    if "events" in analysis:
+        response["events"] = analysis["events"]
+    if key is not None and analysis["stop_reason"] in ('end', 'first-hit'):
+        cache_writer.submit(results.put, key, dict(response), evidence.jpeg if evidence is not None else None)
+    response.update(evidence_fields(evidence))
+    response["cached"] = False
+    return response
+
+def busy_response(e):
+    return JSONResponse(status_code=429, content={"error": str(e)}, headers={"Retry-After": "5"})
+
 @app.post("/detect")
-async def detect_knock_on(file: UploadFile = File(...)):
+async def detect_knock_on(request: Request, file: UploadFile = File(...), options: dict = Depends(analysis_options)):
     if model is None:
         return {"error": "Model is not loaded."}
+    try:
+        validate_options(options)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    request_start = time.perf_counter()
+
+    # 2. Open the uploaded video for decoding (no copy into the working directory).
+    # Hashing the upload and the cache lookup read files, so they run off the event loop
+    try:
+        video = await asyncio.to_thread(ingest_upload, file)
+    except UploadTooLarge as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
 
-    # 2. Save the uploaded video temporarily
-    temp_filename = f"temp_{file.filename}"
-    with open(temp_filename, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # The same video with the same model and options was analysed before: answer without decoding
+    key = await asyncio.to_thread(result_key, video, options)
+    cached = await asyncio.to_thread(results.get, key)
+    if cached is not None:
+        video.close()
+        return cached_response(cached, file.filename, video, request_start)
 
+    # The blocking OpenCV/torch work runs on the job pool so /health and other requests stay responsive
     try:
-        cap = cv2.VideoCapture(temp_filename)
-        
-        # Get video properties
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        
-        # OPTIMIZATION: Process every Nth frame instead of all frames
-        # For 30fps video, process every 5th frame = 6fps (still plenty for detection)
-        frame_skip = max(1, fps // 6)  # Process ~6 frames per second
-        
-        frame_count = 0
-        frames_processed = 0
-        detections_found = []
-        detected_image_base64 = None
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            
-            # Skip frames for faster processing
-            if frame_count % frame_skip != 0:
-                continue
-            
-            frames_processed += 1
-            
-            # conf=0.25 is standard, lower if detection is missed
-            results = model(frame, conf=0.25, verbose=False, classes=target_classes)
-            
-            # results[0].boxes contains the detections
-            boxes = results[0].boxes
-            
-            if len(boxes) > 0:
-                # Format boxes for JSON response: [x1, y1, x2, y2]
-                current_boxes = boxes.xyxy.cpu().numpy().tolist()
-                
-                detections_found.append({
-                    "frame": frame_count,
-                    "box_count": len(current_boxes),
-                    "boxes": current_boxes
-                })
-
-                # --- Capture the FIRST evidence image ---
-                if detected_image_base64 is None:
-                    # Draw boxes on this specific frame for the evidence image
-                    annotated_frame = results[0].plot() 
-                    
-                    _, buffer = cv2.imencode('.jpg', annotated_frame)
-                    detected_image_base64 = base64.b64encode(buffer).decode('utf-8')
-                    
-                    # OPTIMIZATION: Stop after first detection for faster response
-                    # Remove this break if you want to scan entire video
-                    break
-
-        cap.release()
-        
-        print(f"Processed {frames_processed} out of {total_frames} frames (skipped {frame_skip-1} of every {frame_skip} frames)")
-        
-        # 3. Return Results
-        is_knock_on = len(detections_found) > 0 
-        
-        return {
-            "filename": file.filename,
-            "total_frames": frame_count,
-            "event_detected": is_knock_on,
-            "detected_image": detected_image_base64
-        }
+        job = jobs.submit(run_analysis, video, file.filename, request_start, options, key=key)
+    except QueueFull as e:
+        video.close()
+        return busy_response(e)
+
+    # If the client goes away the job is cancelled, so its worker is free for the next request
+    try:
+        return await await_unless_disconnected(request, asyncio.wrap_future(job.future), job.cancel)
     except Exception as e:
         print(f"Error processing video: {e}")
         return {"error": str(e)}
 
-    finally:
-        # 4. Cleanup
-        if os.path.exists(temp_filename):
-            try:
-                os.remove(temp_filename)
-            except:
-                pass
+@app.post("/detect/stream")
+async def detect_stream(file: UploadFile = File(...), options: dict = Depends(analysis_options)):
+    """
+    /detect as Server-Sent Events: 'job' (its id, for POST /jobs/{job_id}/cancel),
+    then 'progress' and a 'detection' per frame with the ball as the analysis
+    runs, and finally 'result' (the /detect response) or 'error'. Closing the
+    connection cancels the job.
+    """
+    if model is None:
+        return JSONResponse(status_code=503, content={"error": "Model is not loaded."})
+    try:
+        validate_options(options)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    request_start = time.perf_counter()
+    try:
+        video = await asyncio.to_thread(ingest_upload, file)
+    except UploadTooLarge as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+
+    key = await asyncio.to_thread(result_key, video, options)
+    cached = await asyncio.to_thread(results.get, key)
+    if cached is not None:
+        video.close()
+        response = cached_response(cached, file.filename, video, request_start)
+
+        async def cached_events():
+            yield sse('result', response)
+        return StreamingResponse(cached_events(), media_type="text/event-stream")
+
+    stream = EventStream()
+    try:
+        job = jobs.submit(run_analysis, video, file.filename, request_start, options, key=key, stream=stream)
+    except QueueFull as e:
+        video.close()
+        return busy_response(e)
+
+    def finished(future):
+        if future.cancelled() or isinstance(future.exception(), Cancelled):
+            stream.emit('error', {"error": "Cancelled.", "job_id": job.id})
+        elif future.exception() is not None:
+            stream.emit('error', {"error": str(future.exception()), "job_id": job.id})
+        else:
+            stream.emit('result', future.result())
+    job.future.add_done_callback(finished)
+
+    async def events():
+        try:
+            yield sse('job', job.to_dict())
+            async for message in stream.events():
+                yield message
+        finally:
+            # Runs when the client disconnects too: stop decoding and inference for nobody
+            job.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...), options: dict = Depends(analysis_options)):
+    """Queue a video for analysis and return immediately; poll GET /jobs/{job_id} for the result."""
+    if model is None:
+        return JSONResponse(status_code=503, content={"error": "Model is not loaded."})
+    try:
+        validate_options(options)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    request_start = time.perf_counter()
+
+    # The job outlives this request, so the upload is copied out of the request's spool file
+    try:
+        video = await asyncio.to_thread(ingest_upload, file, persist=True)
+    except UploadTooLarge as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+
+    key = await asyncio.to_thread(result_key, video, options)
+    try:
+        job = jobs.submit(run_analysis, video, file.filename, request_start, options, key=key)
+    except QueueFull as e:
+        video.close()
+        return busy_response(e)
+
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found."})
+    return job.to_dict()
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """Stop a queued or running job and free its worker; a running one keeps its partial result."""
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found."})
+    job.cancel()
+    return job.to_dict()
+
+@app.get("/evidence/{evidence_id}")
+def get_evidence(evidence_id: str, quality: int = EVIDENCE_JPEG_QUALITY, max_width: int = EVIDENCE_MAX_WIDTH):
+    """
+    Annotated frame of a result's first detection as image/jpeg. quality is the
+    JPEG quality (1-100); max_width downscales wider frames (0 = full size).
+    """
+    evidence = evidence_store.get(evidence_id)
+    if evidence is None:
+        return JSONResponse(status_code=404, content={"error": "Evidence not found."})
+    return Response(content=evidence.jpeg(quality, max_width), media_type="image/jpeg")
 
 @app.get("/")
 def root():
@@ -165,7 +370,12 @@ def health_check():
     return {
         "status": "healthy",
         "model_loaded": model is not None,
-        "model_classes": list(model.names.values()) if model else []
+        "model_classes": list(model.names.values()) if model else [],
+        "model": registry_stats(),
+        "backends": available_backends(loaded_model.path) if loaded_model else [],
+        "jobs": jobs.stats(),
+        "result_cache": results.stats(),
+        "evidence": evidence_store.stats()
     }
 
 if __name__ == "__main__":
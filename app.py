@@ -2,25 +2,21 @@ import cv2
 import numpy as np
 import os
 import gradio as gr
-from ultralytics import YOLO
 
-# Load Model
-model_path = os.path.join('src', 'best.pt')
+from src.config import (DEFAULT_CONF, INFERENCE_BATCH_SIZE, ANALYSIS_MODES, BUDGET_SECONDS, YOLO_MODEL_PATH,
+                        INFERENCE_IMGSZ, IMGSZ_CHOICES)
+from src.model_registry import get_model
+from src.analysis import analyze_video
 
-model = None
-target_classes = None
-
-if os.path.exists(model_path):
-    print(f"Loading model from: {model_path}")
-    model = YOLO(model_path)
-    ball_ids = [k for k, v in model.names.items() if 'ball' in v.lower()]
-    if ball_ids:
-        target_classes = ball_ids
-        print(f"Filtering for ball classes: {target_classes}")
-else:
+# Load Model (shared registry: loaded once and warmed up before the first request)
+model_path = YOLO_MODEL_PATH
+loaded_model = get_model(model_path)
+model = loaded_model.model if loaded_model else None
+target_classes = loaded_model.classes if loaded_model else None
+if loaded_model is None:
     print("Warning: No model found at", model_path)
 
-def detect_knock_on(video_file):
+def detect_knock_on(video_file, mode='full-scan', budget_seconds=BUDGET_SECONDS, imgsz=INFERENCE_IMGSZ):
     """Process video and detect knock-on events"""
     
     if model is None:
@@ -30,57 +26,51 @@ def detect_knock_on(video_file):
         return "⚠️ Please upload a video file.", None
     
     try:
-        cap = cv2.VideoCapture(video_file)
-        
-        frame_count = 0
-        detections_found = []
-        detected_frame = None
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            
-            results = model(frame, conf=0.25, verbose=False, classes=target_classes)
-            boxes = results[0].boxes
-            
-            if len(boxes) > 0:
-                current_boxes = boxes.xyxy.cpu().numpy().tolist()
-                
-                detections_found.append({
-                    "frame": frame_count,
-                    "box_count": len(current_boxes),
-                })
+        # Every frame is analysed (target_fps=0); frames are decoded on a reader
+        # thread while YOLO runs on the previous batch
+        analysis = analyze_video(model, video_file, target_fps=0, conf=DEFAULT_CONF, classes=target_classes,
+                                 batch_size=INFERENCE_BATCH_SIZE, mode=mode,
+                                 budget_seconds=budget_seconds or 0, imgsz=imgsz)
 
-                if detected_frame is None:
-                    annotated_frame = results[0].plot()
-                    detected_frame = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
-
-        cap.release()
+        detections_found = analysis["detections"]
+        frame_count = analysis["total_frames"]
+        timings = analysis["timings"]
+        coverage = analysis["coverage"]
+        timing_text = (f"⏱️ Decode {timings['decode_seconds']}s, inference {timings['inference_seconds']}s, "
+                       f"total {timings['total_seconds']}s\n"
+                       f"📼 Mode {analysis['mode']}: covered {coverage['fraction'] * 100:.0f}% of the video "
+                       f"(stopped: {analysis['stop_reason']})")
         
         if len(detections_found) > 0:
+            detected_frame = cv2.cvtColor(analysis["evidence"].image(), cv2.COLOR_BGR2RGB)
             result_text = f"✅ **Knock-on / Ball Event Detected!**\n\n"
             result_text += f"📊 Total Frames: {frame_count}\n"
             result_text += f"🎯 Detections in {len(detections_found)} frames\n"
-            result_text += f"🏉 First detection at frame {detections_found[0]['frame']}"
+            result_text += f"🏉 First detection at frame {detections_found[0]['frame']}\n"
+            result_text += f"📈 Event confidence: {analysis['event_confidence']:.2f}\n"
+            result_text += timing_text
             return result_text, detected_frame
         else:
-            return f"❌ No event detected.\n\n📊 Total Frames Analyzed: {frame_count}", None
+            return f"❌ No event detected.\n\n📊 Total Frames Analyzed: {frame_count}\n{timing_text}", None
             
     except Exception as e:
         return f"❌ Error processing video: {str(e)}", None
 
 demo = gr.Interface(
     fn=detect_knock_on,
-    inputs=gr.Video(label="Upload Rugby Video"),
+    inputs=[
+        gr.Video(label="Upload Rugby Video"),
+        gr.Radio(list(ANALYSIS_MODES), value='full-scan', label="Analysis Mode"),
+        gr.Number(value=BUDGET_SECONDS, label="Time Budget in seconds (budgeted mode)"),
+        gr.Dropdown(['auto'] + [str(size) for size in IMGSZ_CHOICES], value=INFERENCE_IMGSZ,
+                    label="Inference Resolution (px, or auto)"),
+    ],
     outputs=[
-        gr.Textbox(label="Detection Result", lines=5),
+        gr.Textbox(label="Detection Result", lines=7),
         gr.Image(label="Evidence Frame (if detected)")
     ],
     title="🏈 Rugby Knock-On Detector",
-    description="Upload a rugby video to detect knock-on events using AI. The system will analyze each frame and highlight any ball detections.",
+    description="Upload a rugby video to detect knock-on events using AI. The system will analyze each frame and highlight any ball detections. Use first-hit or budgeted mode to trade recall for a faster answer.",
     theme=gr.themes.Soft(),
 )
 
@@ -1,12 +1,24 @@
 import cv2
 import numpy as np
 import os
-import base64
-import shutil
-from ultralytics import YOLO
-from fastapi import FastAPI, File, UploadFile
+import time
+import asyncio
+import threading
+from fastapi import FastAPI, File, UploadFile, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+
+from src.config import (DEFAULT_CONF, INFERENCE_BATCH_SIZE, ANALYSIS_FPS, BUDGET_SECONDS, BUDGET_FRAMES,
+                        TRACK_DETECT_EVERY, YOLO_MODEL_PATH, INFERENCE_IMGSZ, EVIDENCE_JPEG_QUALITY,
+                        EVIDENCE_MAX_WIDTH, MAX_PROCESSING_SECONDS, MAX_ANALYZED_FRAMES, CASCADE_THRESHOLD)
+from src.model_registry import get_model, registry_stats
+from src.analysis import analyze_video, validate_mode
+from src.resolution import parse_imgsz
+from src.cascade import validate_cascade
+from src.ingest import ingest_upload, UploadTooLarge
+from src.detection_cache import open_store, validate_conf
+from src.evidence import EvidenceStore
+from src.streaming import EventStream, await_unless_disconnected
 
 app = FastAPI()
 
@@ -19,21 +31,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load Model
-model_path = os.path.join('src', 'best.pt')
+# Load Model (shared registry: loaded once and warmed up before the first request)
+model_path = YOLO_MODEL_PATH
+loaded_model = get_model(model_path)
+model = loaded_model.model if loaded_model else None
+target_classes = loaded_model.classes if loaded_model else None
+if loaded_model is None:
+    print("Warning: No model found at", model_path)
 
-model = None
-target_classes = None
+# Evidence frames are drawn and encoded only when fetched from GET /evidence/{id}
+evidence_store = EvidenceStore()
 
-if os.path.exists(model_path):
-    print(f"Loading model from: {model_path}")
-    model = YOLO(model_path)
-    ball_ids = [k for k, v in model.names.items() if 'ball' in v.lower()]
-    if ball_ids:
-        target_classes = ball_ids
-        print(f"Filtering for ball classes: {target_classes}")
-else:
-    print("Warning: No model found at", model_path)
+# Analyses run on worker threads and the model is not thread-safe, so they take turns
+model_lock = threading.Lock()
 
 @app.get("/")
 async def root():
@@ -48,97 +58,170 @@ async def health_check():
     return {
         "status": "healthy",
         "model_loaded": model is not None,
-        "model_path": model_path
+        "model_path": model_path,
+        "model": registry_stats(),
+        "evidence": evidence_store.stats()
+    }
+
+def analysis_options(target_fps: float = ANALYSIS_FPS, mode: str = 'full-scan',
+                     budget_seconds: float = BUDGET_SECONDS, budget_frames: int = BUDGET_FRAMES,
+                     track: bool = False, detect_every: int = TRACK_DETECT_EVERY, motion: bool = False,
+                     cascade: bool = False, cascade_threshold: float = CASCADE_THRESHOLD,
+                     imgsz: str = INFERENCE_IMGSZ, conf: float = DEFAULT_CONF):
+    """Query parameters shared by /detect and /detect/stream, passed straight through to analyze_video."""
+    return {
+        "target_fps": target_fps,
+        "mode": mode,
+        "budget_seconds": budget_seconds,
+        "budget_frames": budget_frames,
+        "track": track,
+        "detect_every": detect_every,
+        "motion": motion,
+        "cascade": cascade,
+        "cascade_threshold": cascade_threshold,
+        "imgsz": imgsz,
+        "conf": conf,
+    }
+
+def evidence_fields(evidence):
+    return {"evidence_url": f"/evidence/{evidence_store.add(evidence)}"}
+
+def run_detection(video, options, request_start, progress=None, on_detection=None, should_stop=None):
+    """Analyse an ingested upload and build the /detect response (blocking)."""
+    # Decode on a reader thread and run YOLO detection on batches of sampled frames
+    # (~target_fps frames per second of video)
+    with model_lock:
+        analysis = analyze_video(model, video.path, classes=target_classes,
+                                 batch_size=INFERENCE_BATCH_SIZE, started_at=request_start,
+                                 store=open_store(video.digest, loaded_model.version), progress=progress,
+                                 on_detection=on_detection, should_stop=should_stop,
+                                 max_seconds=MAX_PROCESSING_SECONDS, max_frames=MAX_ANALYZED_FRAMES, **options)
+    timings = analysis["timings"]
+    timings.update(video.stats())
+
+    response = {
+        "total_frames": analysis["total_frames"],
+        "frames_processed": analysis["frames_processed"],
+        "mode": analysis["mode"],
+        "stop_reason": analysis["stop_reason"],
+        "coverage": analysis["coverage"],
+        "trajectory": analysis["trajectory"],
+        "model_calls": analysis["model_calls"],
+        "motion": analysis["motion"],
+        "cascade": analysis["cascade"],
+        "imgsz": analysis["imgsz"],
+        "detection_cache": analysis["detection_cache"],
+        "frame_skip": analysis["frame_skip"],
+        "decode_ms_per_analyzed_frame": timings["decode_ms_per_analyzed_frame"],
+        "timings": timings
     }
+    if "events" in analysis:
+        response["events"] = analysis["events"]
+
+    detections_found = analysis["detections"]
+    if len(detections_found) > 0:
+        response.update({
+            "event_detected": True,
+            "detections_count": len(detections_found),
+            "first_detection_frame": detections_found[0]['frame'],
+            "event_confidence": analysis["event_confidence"],
+            **evidence_fields(analysis["evidence"]),
+        })
+    else:
+        response.update({
+            "event_detected": False,
+            "message": "No knock-on event detected",
+        })
+    return response
+
+def open_upload(file, options):
+    """
+    Validate options and ingest the upload; returns (video, None) or (None, error response).
+    Ingesting copies and hashes the file, so async handlers call this with asyncio.to_thread.
+    """
+    if model is None:
+        return None, {"error": "Model is not loaded.", "event_detected": False}
+    try:
+        validate_mode(options["mode"])
+        validate_conf(options["conf"])
+        parse_imgsz(options["imgsz"])
+        validate_cascade(options["cascade"])
+    except ValueError as e:
+        return None, JSONResponse(status_code=400, content={"error": str(e), "event_detected": False})
+
+    # Open the uploaded video for decoding without copying it into the working directory
+    try:
+        return ingest_upload(file), None
+    except UploadTooLarge as e:
+        return None, JSONResponse(status_code=413, content={"error": str(e), "event_detected": False})
 
 @app.post("/detect")
-async def detect_knock_on(file: UploadFile = File(...)):
+async def detect_knock_on(request: Request, file: UploadFile = File(...), options: dict = Depends(analysis_options)):
     """Process video and detect knock-on events"""
-    
-    if model is None:
-        return {"error": "Model is not loaded.", "event_detected": False}
-    
-    # Save the uploaded video temporarily
-    temp_filename = f"temp_{file.filename}"
+    request_start = time.perf_counter()
+    video, error = await asyncio.to_thread(open_upload, file, options)
+    if error is not None:
+        return error
+
+    # Analysed on a worker thread so a client that disconnects can be noticed and its analysis cancelled
+    cancelled = threading.Event()
     try:
-        with open(temp_filename, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        cap = cv2.VideoCapture(temp_filename)
-        
-        # Get video properties
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        
-        # Process every Nth frame for optimization
-        frame_skip = max(1, fps // 6)  # Process ~6 frames per second
-        
-        frame_count = 0
-        frames_processed = 0
-        detections_found = []
-        detected_image_base64 = None
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            
-            # Skip frames for faster processing
-            if frame_count % frame_skip != 0:
-                continue
-            
-            frames_processed += 1
-            
-            # Run YOLO detection
-            results = model(frame, conf=0.25, verbose=False, classes=target_classes)
-            boxes = results[0].boxes
-            
-            if len(boxes) > 0:
-                current_boxes = boxes.xyxy.cpu().numpy().tolist()
-                
-                detections_found.append({
-                    "frame": frame_count,
-                    "box_count": len(current_boxes),
-                })
-
-                # Capture first detection frame
-                if detected_image_base64 is None:
-                    annotated_frame = results[0].plot()
-                    _, buffer = cv2.imencode('.jpg', annotated_frame)
-                    detected_image_base64 = base64.b64encode(buffer).decode('utf-8')
-
-        cap.release()
-        
-        # Clean up
-        if os.path.exists(temp_filename):
-            os.remove(temp_filename)
-        
-        if len(detections_found) > 0:
-            return {
-                "event_detected": True,
-                "total_frames": frame_count,
-                "frames_processed": frames_processed,
-                "detections_count": len(detections_found),
-                "first_detection_frame": detections_found[0]['frame'],
-                "detected_image": detected_image_base64
-            }
-        else:
-            return {
-                "event_detected": False,
-                "total_frames": frame_count,
-                "frames_processed": frames_processed,
-                "message": "No knock-on event detected"
-            }
-            
+        future = asyncio.get_running_loop().run_in_executor(None, lambda: run_detection(
+            video, options, request_start, should_stop=cancelled.is_set))
+        return await await_unless_disconnected(request, future, cancelled.set)
     except Exception as e:
-        # Clean up on error
-        if os.path.exists(temp_filename):
-            os.remove(temp_filename)
         return {
             "error": str(e),
             "event_detected": False
         }
+    finally:
+        # Clean up
+        video.close()
+
+@app.post("/detect/stream")
+async def detect_stream(file: UploadFile = File(...), options: dict = Depends(analysis_options)):
+    """
+    /detect as Server-Sent Events: 'progress' and a 'detection' per frame with
+    the ball while the video is analysed, then 'result' (the /detect
+    response) or 'error'. Closing the connection stops the analysis.
+    """
+    request_start = time.perf_counter()
+    video, error = await asyncio.to_thread(open_upload, file, options)
+    if error is not None:
+        return error
+
+    stream = EventStream()
+    cancelled = threading.Event()
+
+    def work():
+        try:
+            stream.emit('result', run_detection(video, options, request_start, progress=stream.progress_callback(),
+                                                on_detection=stream.detection_callback(evidence_fields),
+                                                should_stop=cancelled.is_set))
+        except Exception as e:
+            stream.emit('error', {"error": str(e), "event_detected": False})
+        finally:
+            video.close()
+
+    asyncio.get_running_loop().run_in_executor(None, work)
+
+    async def events():
+        try:
+            async for message in stream.events():
+                yield message
+        finally:
+            cancelled.set()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/evidence/{evidence_id}")
+async def get_evidence(evidence_id: str, quality: int = EVIDENCE_JPEG_QUALITY, max_width: int = EVIDENCE_MAX_WIDTH):
+    """Annotated frame of a result's first detection as image/jpeg (max_width=0 keeps the full size)."""
+    evidence = evidence_store.get(evidence_id)
+    if evidence is None:
+        return JSONResponse(status_code=404, content={"error": "Evidence not found."})
+    return Response(content=evidence.jpeg(quality, max_width), media_type="image/jpeg")
 
 if __name__ == "__main__":
     import uvicorn
@@ -8,23 +8,70 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from src import collect_training_data
 from src import train_model
 from src import detect_knock_on
+from src import detector
+from src import batch
+from src import sample_shards
+from src.config import (YOLO_MODEL_PATH, EXPORT_IMGSZ, DETECTOR_BACKENDS, DATASET_DIR, INFERENCE_BACKEND,
+                        BATCH_OUTPUT_DIR, BATCH_WORKERS, DEFAULT_CONF, SAMPLE_SHARD_DIR)
 
 def main():
     parser = argparse.ArgumentParser(description="Rugby Knock-On Detection System")
-    parser.add_argument('--mode', type=str, choices=['collect', 'train', 'detect'], required=True,
-                      help='Mode to run: collect (label data), train (train model), or detect (run detection)')
+    parser.add_argument('--mode', type=str, choices=['collect', 'pack', 'train', 'detect', 'batch', 'export'], required=True,
+                      help='Mode to run: collect (label data), pack (pack samples into memory-mapped shards), '
+                           'train (train model), detect (run detection), '
+                           'batch (analyse every video in a directory headlessly), '
+                           'or export (convert the YOLO model for another inference backend)')
+    parser.add_argument('--format', type=str, choices=[b for b in DETECTOR_BACKENDS if b != 'pytorch'],
+                      default='onnx', help='Backend to export for (export mode)')
+    parser.add_argument('--weights', type=str, default=YOLO_MODEL_PATH,
+                      help='PyTorch YOLO checkpoint to export (export mode) or to run (batch mode)')
+    parser.add_argument('--imgsz', type=int, default=EXPORT_IMGSZ,
+                      help='Nominal input size for the export (export mode)')
+    parser.add_argument('--calibration-dir', type=str, default=DATASET_DIR,
+                      help='Videos to calibrate onnx-int8-static on (export mode)')
+    parser.add_argument('--incremental', action='store_true',
+                      help='Update the saved SVM with only the new samples, out of core, via SGD (train mode)')
+    parser.add_argument('--no-baseline', action='store_true',
+                      help='With --incremental, skip fitting the in-memory LinearSVC baseline (train mode)')
+    parser.add_argument('--repack', action='store_true',
+                      help='Rebuild the sample shards from scratch instead of appending new samples (pack mode)')
+    parser.add_argument('--input-dir', type=str, default=DATASET_DIR, help='Videos to analyse (batch mode)')
+    parser.add_argument('--output-dir', type=str, default=BATCH_OUTPUT_DIR,
+                      help='Where the per-video JSONL timelines go (batch mode)')
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS,
+                      help='Videos analysed concurrently, one process each (batch mode)')
+    parser.add_argument('--backend', type=str, choices=DETECTOR_BACKENDS, default=INFERENCE_BACKEND,
+                      help='Inference backend (batch mode)')
+    parser.add_argument('--conf', type=float, default=DEFAULT_CONF, help='Confidence threshold (batch mode)')
+    parser.add_argument('--overwrite', action='store_true',
+                      help='Re-analyse videos that already have a timeline (batch mode)')
     
     args = parser.parse_args()
     
     if args.mode == 'collect':
         print("Starting Data Collection Tool...")
         collect_training_data.main()
+    elif args.mode == 'pack':
+        print("Packing training samples...")
+        packed, skipped = sample_shards.pack_samples(append=not args.repack)
+        print(f"Packed {packed} samples ({skipped} already packed) into {SAMPLE_SHARD_DIR}")
     elif args.mode == 'train':
         print("Starting Training...")
-        train_model.train()
+        if args.incremental:
+            train_model.train_incremental(baseline=not args.no_baseline)
+        else:
+            train_model.train()
     elif args.mode == 'detect':
         print("Starting Detection...")
         detect_knock_on.main()
+    elif args.mode == 'batch':
+        print(f"Starting batch analysis of {args.input_dir}...")
+        batch.run_batch(args.input_dir, args.output_dir, workers=args.workers, weights=args.weights,
+                        backend=args.backend, conf=args.conf, overwrite=args.overwrite)
+    elif args.mode == 'export':
+        print(f"Exporting {args.weights} for {args.format}...")
+        path = detector.export(args.weights, args.format, imgsz=args.imgsz, video_dir=args.calibration_dir)
+        print(f"Saved to {path}. Select it with INFERENCE_BACKEND={args.format}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,157 @@
+import time
+import cv2
+
+from src.config import DEFAULT_CONF, INFERENCE_BATCH_SIZE, ADAPTIVE_COARSE_FPS, ADAPTIVE_REFINE_FACTOR
+from src.inference import iter_batched_predictions
+from src.frame_pipeline import read_frames, sampling_stride, count_frames
+from src.evidence import Evidence
+from src.limits import over_limit
+
+
+def coarse_samples(total_frames, stride):
+    """Frame numbers 1, 1+stride, ... always including the last frame so no tail goes unchecked."""
+    samples = list(range(1, total_frames + 1, stride))
+    if samples and samples[-1] != total_frames:
+        samples.append(total_frames)
+    return samples
+
+
+def refine_points(hits, refine_factor):
+    """
+    New frame numbers to analyse: every pair of neighbouring samples where the
+    ball appears or disappears is subdivided refine_factor ways. Once the pair
+    is less than refine_factor frames apart, every frame in between is taken,
+    so boundaries end up resolved at full frame rate.
+    """
+    ordered = sorted(hits)
+    points = []
+    for a, b in zip(ordered, ordered[1:]):
+        if b - a > 1 and (hits[a] is None) != (hits[b] is None):
+            step = max(1, (b - a) // refine_factor)
+            points.extend(range(a + step, b, step))
+    return points
+
+
+def group_events(hits):
+    """Merge runs of neighbouring sampled frames that contain the ball into [start, end] events."""
+    events = []
+    for frame_number in sorted(hits):
+        if hits[frame_number] is None:
+            if events and events[-1]["open"]:
+                events[-1]["open"] = False
+            continue
+        if events and events[-1]["open"]:
+            events[-1]["end"] = frame_number
+        else:
+            events.append({"start": frame_number, "end": frame_number, "open": True})
+    return [{"start": e["start"], "end": e["end"]} for e in events]
+
+
+def adaptive_search(model, video_path, conf=DEFAULT_CONF, classes=None, batch_size=INFERENCE_BATCH_SIZE,
+                    coarse_fps=ADAPTIVE_COARSE_FPS, refine_factor=ADAPTIVE_REFINE_FACTOR, progress=None, imgsz=None,
+                    store=None, on_detection=None, should_stop=None, max_seconds=0, max_frames=0):
+    """
+    Coarse-to-fine temporal search for ball events.
+
+    The whole video is first scanned at coarse_fps. Then, round by round, the
+    gaps between a sampled frame without the ball and one with it are
+    subdivided refine_factor ways until each event start and end is pinned to
+    an exact frame. Long stretches with no ball only cost one model call per
+    coarse interval. Events shorter than the coarse interval can be missed; that
+    is the trade for far fewer model calls than a dense scan.
+
+    store is an optional FrameDetectionStore (see iter_batched_predictions);
+    frames it already holds are not sent to the model again. on_detection
+    should_stop, max_seconds and max_frames work as in analyze_video(); hits
+    are reported in search order, not frame order.
+
+    The coarse samples need the video's length. When the container doesn't
+    report a frame count, the video is grabbed through once to count its
+    frames first (included in the decode time).
+
+    Returns a dict shaped like analyze_video()'s, plus 'events', the number
+    of 'model_calls' (frames sent to the model), the 'last_frame' analysed
+    and 'stop_reason' ('end', 'limit' or 'cancelled').
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError("Could not open video file.")
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    video_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    stride = sampling_stride(fps, coarse_fps)
+    refine_factor = max(2, int(refine_factor))
+
+    timings = {'decode': 0.0, 'inference': 0.0}
+    total_frames = video_frames
+    if total_frames <= 0:
+        # Sampling 0 frames would report an unsearched video as fully covered with no ball
+        start = time.perf_counter()
+        total_frames = count_frames(video_path)
+        timings['decode'] += time.perf_counter() - start
+
+    hits = {}  # frame_number -> detection dict, or None when the model found nothing
+    evidence = None  # Evidence of the earliest hit so far
+    attempted = set()
+    model_calls = 0
+    rounds = 0
+    stop_reason = 'end'
+    start = time.perf_counter()
+
+    try:
+        pending = coarse_samples(total_frames, stride)
+        while pending:
+            rounds += 1
+            attempted.update(pending)
+            frames = read_frames(cap, sorted(set(pending)), timings=timings)
+            predictions = iter_batched_predictions(model, frames, batch_size=batch_size, conf=conf,
+                                                   classes=classes, timings=timings, imgsz=imgsz, store=store)
+
+            for frame_number, frame, found in predictions:
+                model_calls += found.source == 'detector'
+                if len(found) == 0:
+                    hits[frame_number] = None
+                else:
+                    hits[frame_number] = found.to_dict(frame_number)
+                    if evidence is None or frame_number < evidence.frame_number:
+                        evidence = Evidence(frame_number, frame, found)
+                    if on_detection is not None:
+                        on_detection(hits[frame_number], evidence)
+
+                # Only the coarse pass walks the whole video, so it alone drives progress
+                if progress is not None and rounds == 1:
+                    progress(frame_number, total_frames)
+
+                if should_stop is not None and should_stop():
+                    stop_reason = 'cancelled'
+                    break
+                if over_limit(start, len(hits), max_seconds, max_frames):
+                    stop_reason = 'limit'
+                    break
+
+            # Frames that could not be decoded are not retried
+            if stop_reason != 'end':
+                break
+            pending = [p for p in refine_points(hits, refine_factor) if p not in attempted]
+    finally:
+        cap.release()
+
+    detections = [hits[n] for n in sorted(hits) if hits[n] is not None]
+    timings = {f"{stage}_seconds": round(seconds, 3) for stage, seconds in timings.items()}
+    timings["total_seconds"] = round(time.perf_counter() - start, 3)
+    timings["refine_rounds"] = rounds
+
+    return {
+        "total_frames": total_frames,
+        "video_frames": video_frames,
+        "last_frame": max(hits) if hits else 0,
+        "fps": fps,
+        "frame_skip": stride,
+        "frames_processed": len(hits),
+        "model_calls": model_calls,
+        "detections": detections,
+        "events": group_events(hits),
+        "evidence": evidence,
+        "stop_reason": stop_reason,
+        "timings": timings,
+    }
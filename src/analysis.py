@@ -0,0 +1,248 @@
+import time
+import cv2
+
+from src.config import (DEFAULT_CONF, INFERENCE_BATCH_SIZE, ANALYSIS_FPS, ANALYSIS_MODES,
+                        BUDGET_SECONDS, BUDGET_FRAMES, EVENT_SUPPORT_FRAMES, TRACK_DETECT_EVERY, CASCADE_THRESHOLD)
+from src.inference import iter_batched_predictions
+from src.tracker import iter_tracked_predictions
+from src.motion import MotionGate, iter_gated_predictions
+from src.cascade import SvmCascade, iter_cascade_predictions
+from src.frame_pipeline import FramePipeline, sampling_stride, count_frames
+from src.adaptive_search import adaptive_search
+from src.resolution import make_imgsz, imgsz_stats
+from src.detection_cache import save_store
+from src.evidence import Evidence
+from src.limits import over_limit
+
+
+def validate_mode(mode):
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"Unknown mode '{mode}'. Choose one of: {', '.join(ANALYSIS_MODES)}.")
+    return mode
+
+
+def event_confidence(detections, max_gap):
+    """
+    Confidence that the detections form a real ball event rather than a one-frame
+    false positive: the best box score, scaled down when fewer than
+    EVENT_SUPPORT_FRAMES consecutive analysed frames (at most max_gap frames
+    apart) contain the ball. Returns (confidence, longest_run).
+    """
+    if not detections:
+        return 0.0, 0
+
+    longest = run = 1
+    for previous, current in zip(detections, detections[1:]):
+        run = run + 1 if current["frame"] - previous["frame"] <= max_gap else 1
+        longest = max(longest, run)
+
+    # Tracker scores are template-match similarities, not detector confidences
+    scored = [d for d in detections if d["source"] in ('detector', 'cache')] or detections
+    best_score = max(max(d["scores"]) for d in scored)
+    return best_score * min(1.0, longest / EVENT_SUPPORT_FRAMES), longest
+
+
+def trajectory(detections):
+    """Centre of the best box on every frame with a detection, for knock-on logic downstream."""
+    points = []
+    for d in detections:
+        best = max(range(d["box_count"]), key=lambda i: d["scores"][i])
+        x1, y1, x2, y2 = d["boxes"][best]
+        points.append({"frame": d["frame"], "x": round((x1 + x2) / 2, 1), "y": round((y1 + y2) / 2, 1),
+                       "source": d["source"]})
+    return points
+
+
+def video_length(pipeline, video_path, video_frames, last_frame, stop_reason):
+    """
+    total_frames for analyze_video(). The reader runs ahead of the analysis,
+    so its position is only the video's length once it grabbed every frame
+    to the end. A reader that seeked stopped at the last sampled frame, so
+    then it is the container's count, or the frames are counted if it has
+    none. An analysis that stopped early reports the container's count (at
+    least the last analysed frame).
+    """
+    if stop_reason != 'end':
+        return max(video_frames, last_frame)
+    if pipeline.seeks == 0:
+        return pipeline.frames_read
+    return video_frames if video_frames > 0 else count_frames(video_path)
+
+
+def analyze_video(model, video_path, target_fps=ANALYSIS_FPS, conf=DEFAULT_CONF, classes=None,
+                  batch_size=INFERENCE_BATCH_SIZE, mode='full-scan', budget_seconds=BUDGET_SECONDS,
+                  budget_frames=BUDGET_FRAMES, track=False, detect_every=TRACK_DETECT_EVERY,
+                  motion=False, cascade=False, cascade_threshold=CASCADE_THRESHOLD, imgsz=None, progress=None,
+                  started_at=None, store=None, on_detection=None, should_stop=None, max_seconds=0, max_frames=0):
+    """
+    Run ball detection over a video file and return a plain dict with total_frames (see
+    video_length()), video_frames, fps, frame_skip, frames_processed, model_calls (times YOLO ran),
+    detections, trajectory, evidence, mode, stop_reason, coverage, event_confidence, support_frames,
+    timings and the motion/cascade/imgsz/detection_cache stats of whatever was in use.
+
+    mode is one of ANALYSIS_MODES ('adaptive' runs src/adaptive_search.py instead). track, motion
+    and cascade put src/tracker.py, src/motion.py or src/cascade.py in front of YOLO, in that order
+    of precedence. imgsz is a size in px, 'auto' or None. store is a FrameDetectionStore for this
+    video and model, used by the batched and adaptive paths only. progress(frame, video_frames) and
+    on_detection(detection, evidence) are called as the analysis runs; should_stop() returning True
+    stops it ('cancelled'), as do max_seconds/max_frames ('limit', 0 = none).
+    """
+    validate_mode(mode)
+    imgsz = make_imgsz(imgsz)
+    session = store.session() if store is not None else None
+    if mode == 'adaptive':
+        return _analyze_adaptive(model, video_path, conf, classes, batch_size, progress, imgsz, store, session,
+                                 on_detection, should_stop, max_seconds, max_frames)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError("Could not open video file.")
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    video_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frame_skip = sampling_stride(fps, target_fps)
+
+    frames_processed = 0
+    model_calls = 0
+    last_frame = 0
+    detections = []
+    evidence = None
+    stop_reason = 'end'
+    gate = None
+    svm_cascade = None
+    analysis_start = time.perf_counter()
+
+    try:
+        with FramePipeline(cap, frame_skip=frame_skip) as pipeline:
+            if track:
+                predictions = iter_tracked_predictions(model, pipeline, detect_every=detect_every, conf=conf,
+                                                       classes=classes, timings=pipeline.timings, imgsz=imgsz)
+            elif motion:
+                gate = MotionGate()
+                predictions = iter_gated_predictions(model, pipeline, conf=conf, classes=classes,
+                                                     timings=pipeline.timings, gate=gate, imgsz=imgsz)
+            elif cascade:
+                svm_cascade = SvmCascade(threshold=cascade_threshold)
+                predictions = iter_cascade_predictions(model, pipeline, conf=conf, classes=classes,
+                                                       timings=pipeline.timings, cascade=svm_cascade, imgsz=imgsz)
+            else:
+                predictions = iter_batched_predictions(model, pipeline, batch_size=batch_size, conf=conf,
+                                                       classes=classes, timings=pipeline.timings, imgsz=imgsz,
+                                                       store=session)
+
+            for frame_number, frame, found in predictions:
+                frames_processed += 1
+                last_frame = frame_number
+                if found.source == 'detector':
+                    model_calls += 1
+
+                if len(found) > 0:
+                    detections.append(found.to_dict(frame_number))
+
+                    if evidence is None:
+                        evidence = Evidence(frame_number, frame, found)
+                    if on_detection is not None:
+                        on_detection(detections[-1], evidence)
+
+                if progress is not None:
+                    progress(frame_number, video_frames)
+
+                if should_stop is not None and should_stop():
+                    stop_reason = 'cancelled'
+                    break
+
+                if over_limit(analysis_start, frames_processed, max_seconds, max_frames):
+                    stop_reason = 'limit'
+                    break
+
+                if mode == 'first-hit' and detections:
+                    stop_reason = 'first-hit'
+                    break
+
+                if mode == 'budgeted':
+                    out_of_time = budget_seconds and time.perf_counter() - analysis_start >= budget_seconds
+                    out_of_frames = budget_frames and frames_processed >= budget_frames
+                    if out_of_time or out_of_frames:
+                        stop_reason = 'budget'
+                        break
+    finally:
+        cap.release()
+        if store is not None and not (track or motion or cascade):
+            save_store(store)
+
+    if gate is not None:
+        # Every crop that missed was followed by a full-frame pass: two model calls for that frame
+        model_calls += gate.roi_misses
+    timings = pipeline.stats()
+    total_frames = video_length(pipeline, video_path, video_frames, last_frame, stop_reason)
+    if started_at is not None and pipeline.first_frame_at is not None:
+        timings["time_to_first_frame_ms"] = round(1000 * (pipeline.first_frame_at - started_at), 3)
+
+    # Reaching the end means the whole video was covered even if the container's frame count was off
+    covered = 1.0 if stop_reason == 'end' else (min(1.0, last_frame / video_frames) if video_frames else 0.0)
+    confidence, support = event_confidence(detections, frame_skip)
+
+    return {
+        "total_frames": total_frames,
+        "video_frames": video_frames,
+        "fps": fps,
+        "frame_skip": frame_skip,
+        "frames_processed": frames_processed,
+        "model_calls": model_calls,
+        "motion": gate.stats() if gate is not None else None,
+        "cascade": svm_cascade.stats() if svm_cascade is not None else None,
+        "imgsz": imgsz_stats(imgsz),
+        "detection_cache": session.stats() if store is not None and not (track or motion or cascade) else None,
+        "detections": detections,
+        "trajectory": trajectory(detections),
+        "evidence": evidence,
+        "mode": mode,
+        "stop_reason": stop_reason,
+        "coverage": {
+            "last_frame": last_frame,
+            "fraction": round(covered, 3),
+            "seconds": round(last_frame / fps, 3) if fps else None,
+        },
+        "event_confidence": round(confidence, 3),
+        "support_frames": support,
+        "timings": timings,
+    }
+
+
+def _analyze_adaptive(model, video_path, conf, classes, batch_size, progress, imgsz, store, session, on_detection,
+                      should_stop, max_seconds, max_frames):
+    try:
+        analysis = adaptive_search(model, video_path, conf=conf, classes=classes, batch_size=batch_size,
+                                   progress=progress, imgsz=imgsz, store=session, on_detection=on_detection,
+                                   should_stop=should_stop, max_seconds=max_seconds, max_frames=max_frames)
+    finally:
+        if store is not None:
+            save_store(store)
+    confidence, support = event_confidence(analysis["detections"], analysis["frame_skip"])
+    fps = analysis["fps"]
+    total_frames = analysis["total_frames"]
+    last_frame = analysis.pop("last_frame")
+    if analysis["stop_reason"] == 'end':
+        # An empty or unreadable video has no frames to cover
+        covered = 1.0 if total_frames else 0.0
+    else:
+        covered = min(1.0, last_frame / total_frames) if total_frames else 0.0
+    analysis.update({
+        "mode": 'adaptive',
+        "coverage": {
+            "last_frame": last_frame,
+            "fraction": round(covered, 3),
+            "seconds": round(last_frame / fps, 3) if fps else None,
+        },
+        "event_confidence": round(confidence, 3),
+        "support_frames": support,
+        "trajectory": trajectory(analysis["detections"]),
+        "motion": None,
+        "cascade": None,
+        "imgsz": imgsz_stats(imgsz),
+        "detection_cache": session.stats() if session is not None else None,
+    })
+    analysis["timings"]["decode_ms_per_analyzed_frame"] = round(
+        1000 * analysis["timings"]["decode_seconds"] / analysis["frames_processed"], 3
+    ) if analysis["frames_processed"] else 0.0
+    return analysis
@@ -0,0 +1,117 @@
+import os
+import json
+import time
+from concurrent.futures import as_completed
+
+import cv2
+
+from src.config import (DATASET_DIR, BATCH_OUTPUT_DIR, BATCH_WORKERS, VIDEO_EXTENSIONS, YOLO_MODEL_PATH,
+                        INFERENCE_BACKEND, DEFAULT_CONF, ANALYSIS_FPS, INFERENCE_BATCH_SIZE, INFERENCE_IMGSZ)
+from src.model_registry import get_model
+from src.analysis import analyze_video
+from src.sharded import shard_pool
+
+
+def find_videos(video_dir):
+    """Video files directly in video_dir, sorted by name."""
+    return sorted(os.path.join(video_dir, name) for name in os.listdir(video_dir)
+                  if name.lower().endswith(VIDEO_EXTENSIONS) and os.path.isfile(os.path.join(video_dir, name)))
+
+
+def timeline_path(video_path, output_dir):
+    return os.path.join(output_dir, os.path.splitext(os.path.basename(video_path))[0] + '.jsonl')
+
+
+def _process_video(video_path, output_path, weights, backend, conf, target_fps, batch_size, imgsz):
+    """
+    Full scan of one video in a worker process. Detections are appended to
+    <output_path>.part as they are found, one JSON object per line; the file
+    is renamed to output_path only once the video is finished, so an
+    interrupted run leaves no timeline that looks complete.
+    """
+    loaded = get_model(weights, backend)
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+
+    partial = output_path + '.part'
+    with open(partial, 'w', encoding='utf-8', buffering=1) as f:
+        def on_detection(detection, evidence):
+            record = dict(detection, time=round(detection["frame"] / fps, 3) if fps else None)
+            f.write(json.dumps(record) + '\n')
+
+        analysis = analyze_video(loaded.model, video_path, target_fps=target_fps, conf=conf, classes=loaded.classes,
+                                 batch_size=batch_size, mode='full-scan', imgsz=imgsz, on_detection=on_detection)
+    os.replace(partial, output_path)
+
+    return {
+        "video": video_path,
+        "timeline": output_path,
+        "frames_processed": analysis["frames_processed"],
+        "detections": len(analysis["detections"]),
+        "video_seconds": analysis["coverage"]["seconds"] or 0.0,
+        "event_confidence": analysis["event_confidence"],
+        "seconds": analysis["timings"]["total_seconds"],
+    }
+
+
+def run_batch(video_dir=DATASET_DIR, output_dir=BATCH_OUTPUT_DIR, workers=BATCH_WORKERS, weights=YOLO_MODEL_PATH,
+              backend=INFERENCE_BACKEND, conf=DEFAULT_CONF, target_fps=ANALYSIS_FPS,
+              batch_size=INFERENCE_BATCH_SIZE, imgsz=INFERENCE_IMGSZ, overwrite=False):
+    """
+    Analyse every video in video_dir without a display, `workers` videos at
+    a time in separate processes (each with its own model and share of the
+    cores, see src/sharded.py's shard_pool()), and write a JSONL detection
+    timeline per video to output_dir. Videos that already have a timeline
+    are skipped unless overwrite is set, so a run that was interrupted
+    picks up where it stopped. Prints one line per video and an aggregate
+    throughput summary, and returns the summary as a dict.
+    """
+    videos = find_videos(video_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    pending = [v for v in videos if overwrite or not os.path.exists(timeline_path(v, output_dir))]
+    skipped = len(videos) - len(pending)
+    print(f"{len(videos)} videos in {video_dir}: {len(pending)} to analyse, {skipped} already done")
+
+    finished = []
+    failed = 0
+    start = time.perf_counter()
+    if pending:
+        with shard_pool(min(workers, len(pending)), weights, backend) as pool:
+            futures = {pool.submit(_process_video, video, timeline_path(video, output_dir), weights, backend, conf,
+                                   target_fps, batch_size, imgsz): video for video in pending}
+            try:
+                for future in as_completed(futures):
+                    name = os.path.basename(futures[future])
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        failed += 1
+                        print(f"  {name}: failed: {e}")
+                        continue
+                    finished.append(result)
+                    print(f"  {name}: {result['frames_processed']} frames, {result['detections']} with the ball, "
+                          f"event confidence {result['event_confidence']}, {result['seconds']}s "
+                          f"[{len(finished) + failed}/{len(pending)}]")
+            except KeyboardInterrupt:
+                # Queued videos are dropped; finished timelines are kept and skipped next time
+                pool.shutdown(cancel_futures=True)
+                raise
+    wall = time.perf_counter() - start
+
+    frames = sum(r["frames_processed"] for r in finished)
+    video_seconds = sum(r["video_seconds"] for r in finished)
+    summary = {
+        "videos": len(finished),
+        "skipped": skipped,
+        "failed": failed,
+        "frames_processed": frames,
+        "detections": sum(r["detections"] for r in finished),
+        "wall_seconds": round(wall, 3),
+        "frames_per_second": round(frames / wall, 2) if wall and frames else 0.0,
+        "video_seconds_per_second": round(video_seconds / wall, 2) if wall and video_seconds else 0.0,
+    }
+    print(f"Analysed {summary['videos']} videos ({summary['skipped']} skipped, {summary['failed']} failed) "
+          f"in {summary['wall_seconds']}s: {summary['frames_per_second']} frames/sec, "
+          f"{summary['video_seconds_per_second']}x real time, timelines in {output_dir}")
+    return summary
@@ -0,0 +1,559 @@
+import os
+import sys
+import json
+import time
+import argparse
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from src.config import (DEFAULT_CONF, INFERENCE_BATCH_SIZE, DETECTOR_BACKENDS, IMGSZ_CHOICES, ANALYSIS_FPS,
+                        ADAPTIVE_COARSE_FPS, ADAPTIVE_REFINE_FACTOR, PROCESSED_DATA_DIR, SAMPLE_SHARD_DIR, svm_model_path,
+                        SVM_DETECT_WIDTH, SVM_THRESHOLD, CASCADE_THRESHOLD)
+from src.inference import Detections, predict_batch
+from src.detector import load_detector
+from src.model_registry import ball_classes
+from src.analysis import analyze_video
+from src.adaptive_search import adaptive_search
+from src.sharded import analyze_sharded, shard_pool
+from src.sample_shards import list_samples, load_shards
+from src.svm_detector import SvmDetector
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL = os.path.join(SRC_DIR, 'best.pt')
+
+
+def load_frames(video_path, max_frames, frame_skip=1):
+    """Decode up to max_frames frames (every frame_skip-th) so that benchmarks time inference only."""
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    frame_count = 0
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_count += 1
+        if frame_count % frame_skip == 0:
+            frames.append(frame)
+    cap.release()
+    return frames
+
+
+def benchmark_batch_sizes(model, frames, batch_sizes=(1, 4, 8, 16), conf=DEFAULT_CONF, classes=None):
+    """Time batched inference over the same frames for each batch size. Returns {batch_size: frames/sec}."""
+    # Warm-up pass so the first timed configuration doesn't pay allocator/graph setup
+    predict_batch(model, frames[:1], conf=conf, classes=classes)
+
+    fps_by_batch = {}
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(frames), batch_size):
+            predict_batch(model, frames[i:i + batch_size], conf=conf, classes=classes)
+        elapsed = time.perf_counter() - start
+        fps_by_batch[batch_size] = len(frames) / elapsed if elapsed > 0 else 0.0
+    return fps_by_batch
+
+
+def run_batch(args):
+    model = YOLO(args.model)
+    frames = load_frames(args.video, args.frames)
+    if not frames:
+        print(f"No frames could be read from {args.video}")
+        return
+
+    print(f"Benchmarking {len(frames)} frames from {args.video} on CPU")
+    results = benchmark_batch_sizes(model, frames, batch_sizes=args.batch_sizes,
+                                    conf=args.conf, classes=ball_classes(model))
+    baseline = results.get(1)
+    for batch_size, fps in results.items():
+        speedup = f" ({fps / baseline:.2f}x)" if baseline else ""
+        print(f"  batch={batch_size:<3d} {fps:7.2f} frames/sec{speedup}")
+
+
+def first_frame(detections):
+    return detections[0]["frame"] if detections else None
+
+
+def run_adaptive(args):
+    model = YOLO(args.model)
+    classes = ball_classes(model)
+    total_dense = total_adaptive = matches = 0
+
+    for video in args.video:
+        dense = analyze_video(model, video, target_fps=0, conf=args.conf, classes=classes, mode='full-scan')
+        adaptive = adaptive_search(model, video, conf=args.conf, classes=classes,
+                                   coarse_fps=args.coarse_fps, refine_factor=args.refine_factor)
+
+        dense_first = first_frame(dense["detections"])
+        adaptive_first = first_frame(adaptive["detections"])
+        match = dense_first == adaptive_first
+        matches += match
+        total_dense += dense["frames_processed"]
+        total_adaptive += adaptive["model_calls"]
+
+        print(f"{os.path.basename(video)}")
+        print(f"  dense:    {dense['frames_processed']:6d} model calls, first detection {dense_first}, "
+              f"{dense['timings']['total_seconds']}s")
+        print(f"  adaptive: {adaptive['model_calls']:6d} model calls, first detection {adaptive_first}, "
+              f"{adaptive['timings']['total_seconds']}s, {adaptive['timings']['refine_rounds']} rounds, "
+              f"events {adaptive['events']}")
+        print(f"  same first detection: {'yes' if match else 'NO'}")
+
+    if total_adaptive:
+        print(f"Total: {total_dense} dense vs {total_adaptive} adaptive model calls "
+              f"({total_dense / total_adaptive:.1f}x fewer), first detection matched on {matches}/{len(args.video)} videos")
+
+
+def run_motion(args):
+    model = YOLO(args.model)
+    classes = ball_classes(model)
+
+    for video in args.video:
+        dense = analyze_video(model, video, target_fps=args.target_fps, conf=args.conf, classes=classes,
+                              batch_size=1, mode='full-scan')
+        gated = analyze_video(model, video, target_fps=args.target_fps, conf=args.conf, classes=classes,
+                              mode='full-scan', motion=True)
+
+        dense_frames = {d["frame"] for d in dense["detections"]}
+        gated_frames = {d["frame"] for d in gated["detections"]}
+        motion = gated["motion"]
+
+        print(f"{os.path.basename(video)}")
+        print(f"  every frame: {dense['model_calls']:6d} model calls, {len(dense_frames)} frames with the ball, "
+              f"{dense['timings']['total_seconds']}s")
+        print(f"  motion gate: {gated['model_calls']:6d} model calls, {len(gated_frames)} frames with the ball, "
+              f"{gated['timings']['total_seconds']}s")
+        print(f"  skipped {motion['frames_skipped']}/{motion['frames_seen']} frames and "
+              f"{100 * motion['pixels_skipped_fraction']:.1f}% of pixels; "
+              f"{len(dense_frames - gated_frames)} missed, {len(gated_frames - dense_frames)} extra frames with the ball")
+
+
+def box_parity(reference, candidate, conf, tolerance):
+    """
+    Match each reference box to the closest candidate box of the same class.
+    Boxes scoring within 0.01 of conf may legitimately appear in one backend
+    and not the other, so they are ignored. Returns (max pixel error,
+    unmatched boxes).
+    """
+    worst, unmatched = 0.0, 0
+    for ref, cand in zip(reference, candidate):
+        ref_keep = ref.scores >= conf + 0.01
+        cand_boxes, cand_classes = cand.boxes, cand.class_ids
+        for box, class_id in zip(ref.boxes[ref_keep], ref.class_ids[ref_keep]):
+            same_class = cand_boxes[cand_classes == class_id]
+            if len(same_class) == 0:
+                unmatched += 1
+                continue
+            error = float(np.abs(same_class - box).max(axis=1).min())
+            if error > tolerance:
+                unmatched += 1
+            worst = max(worst, error)
+        unmatched += max(0, int((cand.scores >= conf + 0.01).sum()) - int(ref_keep.sum()))
+    return worst, unmatched
+
+
+def time_per_frame(model, frames, batch_size, conf, classes):
+    predict_batch(model, frames[:batch_size], conf=conf, classes=classes)
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        predict_batch(model, frames[i:i + batch_size], conf=conf, classes=classes)
+    return 1000 * (time.perf_counter() - start) / len(frames)
+
+
+def run_backends(args):
+    frames = load_frames(args.video, args.frames, frame_skip=args.frame_skip)
+    if not frames:
+        print(f"No frames could be read from {args.video}")
+        sys.exit(1)
+
+    reference_model = load_detector(args.model, 'pytorch')
+    classes = ball_classes(reference_model)
+    reference = [Detections.from_result(r) for r in predict_batch(reference_model, frames, conf=args.conf,
+                                                                     classes=classes)]
+    print(f"Comparing backends on {len(frames)} frames from {args.video} (tolerance {args.tolerance}px)")
+    print(f"  {'pytorch':<9s} batch=1 {time_per_frame(reference_model, frames, 1, args.conf, classes):7.2f} ms/frame, "
+          f"batch={INFERENCE_BATCH_SIZE} "
+          f"{time_per_frame(reference_model, frames, INFERENCE_BATCH_SIZE, args.conf, classes):7.2f} ms/frame")
+
+    failed = False
+    for backend in args.backend:
+        model = load_detector(args.model, backend)
+        candidate = [Detections.from_result(r) for r in predict_batch(model, frames, conf=args.conf, classes=classes)]
+        worst, unmatched = box_parity(reference, candidate, args.conf, args.tolerance)
+        ok = unmatched == 0
+        failed |= not ok
+        print(f"  {backend:<9s} batch=1 {time_per_frame(model, frames, 1, args.conf, classes):7.2f} ms/frame, "
+              f"batch={INFERENCE_BATCH_SIZE} "
+              f"{time_per_frame(model, frames, INFERENCE_BATCH_SIZE, args.conf, classes):7.2f} ms/frame, "
+              f"max box error {worst:.2f}px, {unmatched} unmatched boxes: {'PASS' if ok else 'FAIL'}")
+
+    if failed:
+        sys.exit(1)
+
+
+def box_iou(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    areas = (box[2] - box[0]) * (box[3] - box[1]) + (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(areas - inter, 1e-9)
+
+
+def agreement_ap50(reference, candidate, iou_threshold=0.5):
+    """
+    mAP proxy without labels: the reference model's boxes are taken as ground
+    truth and the candidate's boxes, ranked by score, are matched to them at
+    IoU >= iou_threshold. Returns (AP50, recall) averaged over classes present
+    in the reference.
+    """
+    aps, recalls = [], []
+    classes = set(np.concatenate([r.class_ids for r in reference]).tolist()) if reference else set()
+    for class_id in classes:
+        truth = [r.boxes[r.class_ids == class_id] for r in reference]
+        total = sum(len(t) for t in truth)
+        ranked = sorted(((score, i, box) for i, c in enumerate(candidate)
+                         for box, score, cls in zip(c.boxes, c.scores, c.class_ids) if cls == class_id),
+                        key=lambda item: -item[0])
+        used = [np.zeros(len(t), dtype=bool) for t in truth]
+        hits = []
+        for _, i, box in ranked:
+            hit = False
+            if len(truth[i]):
+                ious = box_iou(box, truth[i])
+                ious[used[i]] = 0
+                best = int(np.argmax(ious))
+                if ious[best] >= iou_threshold:
+                    used[i][best] = hit = True
+            hits.append(hit)
+
+        tp = np.cumsum(hits)
+        recall = tp / total
+        precision = tp / np.arange(1, len(hits) + 1)
+        # All-point interpolated area under the precision/recall curve
+        envelope = np.maximum.accumulate(precision[::-1])[::-1] if len(hits) else np.array([])
+        steps = np.diff(np.concatenate([[0.0], recall])) if len(hits) else np.array([])
+        aps.append(float((steps * envelope).sum()))
+        recalls.append(float(recall[-1]) if len(hits) else 0.0)
+    if not aps:
+        return 1.0, 1.0
+    return float(np.mean(aps)), float(np.mean(recalls))
+
+
+def run_quantized(args):
+    frames = load_frames(args.video, args.frames, frame_skip=args.frame_skip)
+    if not frames:
+        print(f"No frames could be read from {args.video}")
+        sys.exit(1)
+
+    reference_model = load_detector(args.model, 'pytorch')
+    classes = ball_classes(reference_model)
+    reference = [Detections.from_result(r) for r in predict_batch(reference_model, frames, conf=args.conf,
+                                                                     classes=classes)]
+    boxes = sum(len(r) for r in reference)
+    print(f"Agreement with FP32 best.pt ({boxes} boxes on {len(frames)} frames from {args.video}, conf {args.conf})")
+    print(f"  {'variant':<18s} {'AP50':>6s} {'recall':>7s} {'ms/frame':>9s}")
+    print(f"  {'pytorch (FP32)':<18s} {1.0:6.3f} {1.0:7.3f} "
+          f"{time_per_frame(reference_model, frames, 1, args.conf, classes):9.2f}")
+
+    for backend in args.backend:
+        try:
+            model = load_detector(args.model, backend)
+        except FileNotFoundError as e:
+            print(f"  {backend:<18s} skipped: {e}")
+            continue
+        # Candidate boxes are kept down to a low floor so the precision/recall curve is complete
+        candidate = [Detections.from_result(r) for r in predict_batch(model, frames, conf=min(args.conf, 0.01),
+                                                                     classes=classes)]
+        ap50, recall = agreement_ap50(reference, candidate)
+        print(f"  {backend:<18s} {ap50:6.3f} {recall:7.3f} {time_per_frame(model, frames, 1, args.conf, classes):9.2f}")
+
+
+def run_resolution(args):
+    model = YOLO(args.model)
+    classes = ball_classes(model)
+    sizes = [str(size) for size in sorted(args.sizes, reverse=True)] + ['auto']
+    totals = {size: {"frames": 0, "hits": 0, "seconds": 0.0, "recalled": 0} for size in sizes}
+    reference_hits = 0
+    # Warm-up pass so the first size timed doesn't pay allocator/graph setup
+    predict_batch(model, load_frames(args.video[0], 1), conf=args.conf, classes=classes)
+
+    for video in args.video:
+        print(f"{os.path.basename(video)}")
+        reference = None
+        for size in sizes:
+            analysis = analyze_video(model, video, target_fps=args.target_fps, conf=args.conf, classes=classes,
+                                     mode='full-scan', imgsz=size)
+            hits = {d["frame"] for d in analysis["detections"]}
+            # The largest size is the reference for what the ball detector can see at all
+            if reference is None:
+                reference = hits
+                reference_hits += len(reference)
+            frames = analysis["frames_processed"]
+            seconds = analysis["timings"]["inference_seconds"]
+            total = totals[size]
+            total["frames"] += frames
+            total["hits"] += len(hits)
+            total["seconds"] += seconds
+            total["recalled"] += len(hits & reference)
+            print(f"  imgsz={size:<5s} {1000 * seconds / max(1, frames):8.2f} ms/frame, "
+                  f"ball in {len(hits)}/{frames} frames, {len(hits & reference)}/{len(reference)} of the "
+                  f"imgsz={sizes[0]} hits" + (f", sizes used {analysis['imgsz']['frames_by_size']}" if size == 'auto' else ""))
+
+    print("Total")
+    for size, total in totals.items():
+        recall = total["recalled"] / reference_hits if reference_hits else 1.0
+        print(f"  imgsz={size:<5s} {1000 * total['seconds'] / max(1, total['frames']):8.2f} ms/frame, "
+              f"hit rate {total['hits'] / max(1, total['frames']):.3f}, recall vs imgsz={sizes[0]} {recall:.3f}")
+
+
+def run_shards(args):
+    baseline = reference = None
+    print(f"Sharded full scan of {args.video} at {args.target_fps} fps")
+    for workers in args.workers:
+        with shard_pool(workers, args.model) as pool:
+            # The first run starts the workers and loads their models; only the second is timed
+            analyze_sharded(args.video, workers=workers, weights=args.model, target_fps=args.target_fps,
+                            conf=args.conf, pool=pool)
+            analysis = analyze_sharded(args.video, workers=workers, weights=args.model,
+                                       target_fps=args.target_fps, conf=args.conf, pool=pool)
+        seconds = analysis["timings"]["total_seconds"]
+        fps = analysis["frames_processed"] / seconds if seconds else 0.0
+        hits = {d["frame"] for d in analysis["detections"]}
+        if baseline is None:
+            baseline, reference = fps, hits
+        print(f"  workers={workers:<2d} {fps:8.2f} frames/sec ({fps / baseline:.2f}x), {seconds}s, "
+              f"{analysis['frames_processed']} frames, ball in {len(hits)}, "
+              f"same frames as workers={args.workers[0]}: {'yes' if hits == reference else 'NO'}")
+
+
+def run_dataset(args):
+    paths, _ = list_samples(args.processed_dir)
+    shards = load_shards(args.shard_dir)
+    if not paths or shards is None:
+        print(f"Need samples in {args.processed_dir} and shards in {args.shard_dir} (python run.py --mode pack)")
+        return
+
+    start = time.perf_counter()
+    images = [cv2.imread(path) for path in paths]
+    jpeg_seconds = time.perf_counter() - start
+    jpeg_bytes = sum(os.path.getsize(path) for path in paths)
+
+    start = time.perf_counter()
+    shards = load_shards(args.shard_dir)
+    open_seconds = time.perf_counter() - start
+    # Touch every pixel, as featurisation would; the mapping itself reads nothing
+    for images, _ in shards.batches():
+        images.sum(dtype=np.uint64)
+    shard_seconds = time.perf_counter() - start
+    shard_bytes = sum(os.path.getsize(path) for path in shards.image_paths)
+
+    print(f"{len(paths)} JPEGs: {1000 * jpeg_seconds:9.1f} ms to decode, {jpeg_bytes / 2 ** 20:.1f} MB on disk")
+    print(f"{len(shards)} packed: {1000 * shard_seconds:9.1f} ms to read every pixel "
+          f"({1000 * open_seconds:.1f} ms to open), {shard_bytes / 2 ** 20:.1f} MB on disk, "
+          f"{jpeg_seconds / shard_seconds if shard_seconds else 0.0:.1f}x faster")
+    if len(shards) != sum(image is not None for image in images):
+        print("  note: the shards and the JPEG directory hold different samples; run python run.py --mode pack")
+
+
+def run_svm(args):
+    frames = load_frames(args.video, args.frames, args.frame_skip)
+    if not frames:
+        print(f"No frames could be read from {args.video}")
+        return
+    detector = SvmDetector(args.svm, width=args.width, threshold=args.threshold)
+    detector.detect(frames[0])
+
+    start = time.perf_counter()
+    hits = sum(len(detector.detect(frame)) > 0 for frame in frames)
+    svm_fps = len(frames) / (time.perf_counter() - start)
+    print(f"{len(frames)} frames from {args.video}, detection width {detector.width}px, "
+          f"{len(detector.windows)} pyramid levels, {detector.stats()['windows_per_frame']} windows/frame")
+    print(f"  HOG-SVM: {svm_fps:7.2f} frames/sec, ball in {hits} frames")
+
+    if args.model:
+        model = YOLO(args.model)
+        classes = ball_classes(model)
+        ms = time_per_frame(model, frames, 1, args.conf, classes)
+        print(f"  YOLO:    {1000 / ms:7.2f} frames/sec at batch size 1; the SVM is {svm_fps * ms / 1000:.2f}x as fast")
+
+
+def load_labels(video_path):
+    """
+    Frames with the ball in a labelled clip, from the <clip>.json next to it:
+    {"ball": [[first, last], ...]}, inclusive ranges of frame numbers counted
+    from 1 as FramePipeline numbers them. None if the clip has no labels.
+    """
+    path = os.path.splitext(video_path)[0] + '.json'
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        ranges = json.load(f)["ball"]
+    return {frame for first, last in ranges for frame in range(first, last + 1)}
+
+
+def run_cascade(args):
+    model = YOLO(args.model)
+    classes = ball_classes(model)
+    thresholds = sorted(args.thresholds)
+    totals = {t: {"calls": 0, "avoided": 0, "crops": 0, "seconds": 0.0, "recalled": 0, "labelled_hits": 0}
+              for t in thresholds}
+    baseline = {"frames": 0, "calls": 0, "seconds": 0.0, "hits": 0, "labelled": 0, "labelled_hits": 0}
+    predict_batch(model, load_frames(args.video[0], 1), conf=args.conf, classes=classes)
+
+    for video in args.video:
+        dense = analyze_video(model, video, target_fps=args.target_fps, conf=args.conf, classes=classes,
+                              batch_size=1, mode='full-scan')
+        reference = {d["frame"] for d in dense["detections"]}
+        labels = load_labels(video)
+        truth = None
+        if labels is not None:
+            # Only the sampled frames can be found by either run
+            step, last = dense["frame_skip"], dense["coverage"]["last_frame"]
+            truth = {frame for frame in labels if frame % step == 0 and frame <= last}
+            baseline["labelled"] += len(truth)
+            baseline["labelled_hits"] += len(reference & truth)
+        baseline["frames"] += dense["frames_processed"]
+        baseline["calls"] += dense["model_calls"]
+        baseline["seconds"] += dense["timings"]["total_seconds"]
+        baseline["hits"] += len(reference)
+
+        print(f"{os.path.basename(video)}" + (f" ({len(truth)} labelled frames with the ball)" if truth is not None
+                                              else " (no labels)"))
+        print(f"  YOLO only:        {dense['model_calls']:5d} YOLO calls, ball in {len(reference)} frames"
+              + (f", recall {len(reference & truth) / max(1, len(truth)):.3f}" if truth is not None else "")
+              + f", {dense['timings']['total_seconds']}s")
+        for threshold in thresholds:
+            run = analyze_video(model, video, target_fps=args.target_fps, conf=args.conf, classes=classes,
+                                mode='full-scan', cascade=True, cascade_threshold=threshold)
+            hits = {d["frame"] for d in run["detections"]}
+            cascade = run["cascade"]
+            total = totals[threshold]
+            total["calls"] += run["model_calls"]
+            total["avoided"] += cascade["yolo_calls_avoided"]
+            total["crops"] += cascade["roi_frames"]
+            total["seconds"] += run["timings"]["total_seconds"]
+            total["recalled"] += len(hits & reference)
+            if truth is not None:
+                total["labelled_hits"] += len(hits & truth)
+            print(f"  cascade {threshold:+6.2f}: {run['model_calls']:5d} YOLO calls ({cascade['yolo_calls_avoided']} "
+                  f"avoided, {cascade['roi_frames']} on crops), ball in {len(hits)} frames, "
+                  f"{len(hits & reference)}/{len(reference)} of YOLO's"
+                  + (f", recall {len(hits & truth) / max(1, len(truth)):.3f}" if truth is not None else "")
+                  + f", {run['timings']['total_seconds']}s (SVM {run['timings'].get('cascade_seconds', 0.0)}s)")
+
+    labelled = baseline["labelled"]
+    baseline_recall = baseline["labelled_hits"] / labelled if labelled else None
+    print(f"Total over {len(args.video)} clips, {baseline['frames']} analysed frames"
+          + (f", {labelled} labelled frames with the ball" if labelled else ", no labels: recall is against YOLO"))
+    print(f"  YOLO only:        {baseline['calls']:5d} YOLO calls, {baseline['seconds']:.2f}s"
+          + (f", recall {baseline_recall:.3f}" if labelled else ""))
+    for threshold, total in totals.items():
+        avoided = total["avoided"] / baseline["frames"] if baseline["frames"] else 0.0
+        kept = total["recalled"] / baseline["hits"] if baseline["hits"] else 1.0
+        line = (f"  cascade {threshold:+6.2f}: {total['calls']:5d} YOLO calls, {total['avoided']} avoided "
+                f"({100 * avoided:.1f}%), {total['crops']} on crops, {total['seconds']:.2f}s, "
+                f"recall vs YOLO only {kept:.3f}")
+        if labelled:
+            recall = total["labelled_hits"] / labelled
+            line += f", recall {recall:.3f} ({100 * (baseline_recall - recall):.1f} points lost)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inference benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    batch_parser = subparsers.add_parser('batch', help='Frames/sec for different YOLO batch sizes')
+    batch_parser.add_argument('--video', type=str, required=True, help='Path to video file')
+    batch_parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help='Path to YOLO model')
+    batch_parser.add_argument('--frames', type=int, default=64, help='Number of frames to benchmark')
+    batch_parser.add_argument('--conf', type=float, default=DEFAULT_CONF, help='Confidence threshold')
+    batch_parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16])
+    batch_parser.set_defaults(func=run_batch)
+
+    adaptive_parser = subparsers.add_parser('adaptive', help='Model calls of coarse-to-fine search vs. a dense scan')
+    adaptive_parser.add_argument('--video', type=str, nargs='+', required=True, help='Path(s) to video files')
+    adaptive_parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help='Path to YOLO model')
+    adaptive_parser.add_argument('--conf', type=float, default=DEFAULT_CONF, help='Confidence threshold')
+    adaptive_parser.add_argument('--coarse-fps', type=float, default=ADAPTIVE_COARSE_FPS)
+    adaptive_parser.add_argument('--refine-factor', type=int, default=ADAPTIVE_REFINE_FACTOR)
+    adaptive_parser.set_defaults(func=run_adaptive)
+
+    motion_parser = subparsers.add_parser('motion', help='Model calls and detections with the motion gate vs. without')
+    motion_parser.add_argument('--video', type=str, nargs='+', required=True, help='Path(s) to video files')
+    motion_parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help='Path to YOLO model')
+    motion_parser.add_argument('--conf', type=float, default=DEFAULT_CONF, help='Confidence threshold')
+    motion_parser.add_argument('--target-fps', type=float, default=ANALYSIS_FPS)
+    motion_parser.set_defaults(func=run_motion)
+
+    backends_parser = subparsers.add_parser('backends', help='Box parity and latency of exported backends vs. best.pt')
+    backends_parser.add_argument('--video', type=str, required=True, help='Path to video file')
+    backends_parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help='PyTorch YOLO checkpoint')
+    backends_parser.add_argument('--backend', type=str, nargs='+', default=['onnx'],
+                                 choices=[b for b in DETECTOR_BACKENDS if b != 'pytorch'])
+    backends_parser.add_argument('--frames', type=int, default=32, help='Number of frames to compare')
+    backends_parser.add_argument('--frame-skip', type=int, default=5, help='Use every n-th frame')
+    backends_parser.add_argument('--conf', type=float, default=DEFAULT_CONF, help='Confidence threshold')
+    backends_parser.add_argument('--tolerance', type=float, default=1.0, help='Max box coordinate error in pixels')
+    backends_parser.set_defaults(func=run_backends)
+
+    quantized_parser = subparsers.add_parser('quantized', help='AP50 agreement with FP32 vs. ms/frame per model variant')
+    quantized_parser.add_argument('--video', type=str, required=True, help='Path to video file')
+    quantized_parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help='PyTorch YOLO checkpoint')
+    quantized_parser.add_argument('--backend', type=str, nargs='+',
+                                  default=['onnx', 'onnx-int8-static', 'onnx-int8-dynamic'],
+                                  choices=[b for b in DETECTOR_BACKENDS if b != 'pytorch'])
+    quantized_parser.add_argument('--frames', type=int, default=64, help='Number of frames to compare')
+    quantized_parser.add_argument('--frame-skip', type=int, default=5, help='Use every n-th frame')
+    quantized_parser.add_argument('--conf', type=float, default=DEFAULT_CONF, help='Confidence threshold')
+    quantized_parser.set_defaults(func=run_quantized)
+
+    resolution_parser = subparsers.add_parser('resolution', help='Latency and hit rate by inference size, incl. auto')
+    resolution_parser.add_argument('--video', type=str, nargs='+', required=True, help='Path(s) to video files')
+    resolution_parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help='Path to YOLO model')
+    resolution_parser.add_argument('--conf', type=float, default=DEFAULT_CONF, help='Confidence threshold')
+    resolution_parser.add_argument('--target-fps', type=float, default=ANALYSIS_FPS)
+    resolution_parser.add_argument('--sizes', type=int, nargs='+', default=list(IMGSZ_CHOICES))
+    resolution_parser.set_defaults(func=run_resolution)
+
+    shards_parser = subparsers.add_parser('shards', help='Frames/sec of a sharded full scan for each process count')
+    shards_parser.add_argument('--video', type=str, required=True, help='Path to video file')
+    shards_parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help='Path to YOLO model')
+    shards_parser.add_argument('--conf', type=float, default=DEFAULT_CONF, help='Confidence threshold')
+    shards_parser.add_argument('--target-fps', type=float, default=ANALYSIS_FPS)
+    shards_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    shards_parser.set_defaults(func=run_shards)
+
+    dataset_parser = subparsers.add_parser('dataset', help='Load time of the packed sample shards vs. the JPEGs')
+    dataset_parser.add_argument('--processed-dir', type=str, default=PROCESSED_DATA_DIR)
+    dataset_parser.add_argument('--shard-dir', type=str, default=SAMPLE_SHARD_DIR)
+    dataset_parser.set_defaults(func=run_dataset)
+
+    svm_parser = subparsers.add_parser('svm', help='Frames/sec of the sliding-window HOG-SVM detector vs. YOLO')
+    svm_parser.add_argument('--video', type=str, required=True, help='Path to video file')
+    svm_parser.add_argument('--svm', type=str, default=svm_model_path, help='Path to the trained SVM')
+    svm_parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help="YOLO model to compare with ('' to skip)")
+    svm_parser.add_argument('--frames', type=int, default=32, help='Number of frames to benchmark')
+    svm_parser.add_argument('--frame-skip', type=int, default=5, help='Use every n-th frame')
+    svm_parser.add_argument('--width', type=int, default=SVM_DETECT_WIDTH, help='Detection width in px')
+    svm_parser.add_argument('--threshold', type=float, default=SVM_THRESHOLD, help='SVM margin threshold')
+    svm_parser.add_argument('--conf', type=float, default=DEFAULT_CONF, help='YOLO confidence threshold')
+    svm_parser.set_defaults(func=run_svm)
+
+    cascade_parser = subparsers.add_parser('cascade', help='YOLO calls saved and recall lost by the HOG-SVM cascade')
+    cascade_parser.add_argument('--video', type=str, nargs='+', required=True,
+                                help='Path(s) to video files; <clip>.json next to a clip holds its labels')
+    cascade_parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help='Path to YOLO model')
+    cascade_parser.add_argument('--conf', type=float, default=DEFAULT_CONF, help='Confidence threshold')
+    cascade_parser.add_argument('--target-fps', type=float, default=ANALYSIS_FPS)
+    cascade_parser.add_argument('--thresholds', type=float, nargs='+', default=[CASCADE_THRESHOLD],
+                                help='SVM margin thresholds to try')
+    cascade_parser.set_defaults(func=run_cascade)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import os
+import time
+import numpy as np
+
+from src.config import (svm_model_path, DEFAULT_CONF, CASCADE_WIDTH, CASCADE_THRESHOLD, CASCADE_ROI_SIZE,
+                        CASCADE_ROI_SCALE)
+from src.inference import Detections, predict_batch, add_time, square_roi
+from src.resolution import current_imgsz, observe_imgsz
+from src.svm_detector import SvmDetector
+
+
+def validate_cascade(cascade, model_path=svm_model_path):
+    """Raise ValueError if the cascade is asked for but there is no trained SVM to gate with."""
+    if cascade and not os.path.exists(model_path):
+        raise ValueError(f"No HOG-SVM at {model_path} for the cascade. Train one with: python run.py --mode train")
+    return cascade
+
+
+class SvmCascade:
+    """
+    Cheap first stage of a two-stage cascade in front of YOLO.
+
+    Every frame is scored by the sliding-window HOG-SVM of
+    src/svm_detector.py at `width` px wide. If no window's margin exceeds
+    threshold, the frame is rejected and YOLO never sees it. Otherwise the
+    surviving windows are the candidates: when they are close together, YOLO
+    only needs a square crop around them, else it runs on the whole frame.
+    Rejected frames and crops are counted for stats().
+    """
+
+    def __init__(self, model_path=svm_model_path, threshold=CASCADE_THRESHOLD, width=CASCADE_WIDTH,
+                 roi_size=CASCADE_ROI_SIZE, roi_scale=CASCADE_ROI_SCALE):
+        self.detector = SvmDetector(model_path, width=width, threshold=threshold)
+        self.threshold = threshold
+        self.roi_size = roi_size
+        self.roi_scale = roi_scale
+
+        self.frames_seen = 0
+        self.frames_rejected = 0
+        self.roi_frames = 0
+
+    def candidates(self, frame):
+        """SVM windows (source='svm', scores are margins) above the threshold; none means reject the frame."""
+        self.frames_seen += 1
+        found = self.detector.detect(frame)
+        if len(found) == 0:
+            self.frames_rejected += 1
+        return found
+
+    def roi(self, frame, candidates):
+        """(x0, y0, x1, y1) square crop around all candidates, or None if it would cover most of the frame."""
+        box = np.concatenate([candidates.boxes[:, :2].min(axis=0), candidates.boxes[:, 2:].max(axis=0)])
+        region = square_roi(frame, box, self.roi_size, self.roi_scale)
+        self.roi_frames += region is not None
+        return region
+
+    def stats(self):
+        return {
+            "threshold": self.threshold,
+            "frames_seen": self.frames_seen,
+            "frames_rejected": self.frames_rejected,
+            "roi_frames": self.roi_frames,
+            "full_frames": self.frames_seen - self.frames_rejected - self.roi_frames,
+            "yolo_calls_avoided": self.frames_rejected,
+            "rejected_fraction": round(self.frames_rejected / self.frames_seen, 3) if self.frames_seen else 0.0,
+        }
+
+
+def iter_cascade_predictions(model, numbered_frames, conf=DEFAULT_CONF, classes=None, timings=None, cascade=None,
+                             imgsz=None):
+    """
+    Like iter_batched_predictions, but every frame first goes through an
+    SvmCascade. Rejected frames yield an empty result with source='svm' and
+    cost no model call. The rest run through YOLO, on a crop around the SVM
+    candidates when they are close together (boxes are mapped back to
+    full-frame coordinates) or else on the whole frame. A crop in which YOLO
+    finds nothing is final: the SVM only ever saw a ball there. imgsz
+    applies to full-frame passes; crops always run at their own size.
+
+    Yields (frame_number, frame, Detections).
+    """
+    cascade = cascade or SvmCascade()
+
+    for frame_number, frame in numbered_frames:
+        start = time.perf_counter()
+        candidates = cascade.candidates(frame)
+        add_time(timings, 'cascade', start)
+
+        if len(candidates) == 0:
+            yield frame_number, frame, Detections(np.zeros((0, 4), np.float32), [], source='svm')
+            continue
+
+        region = cascade.roi(frame, candidates)
+        start = time.perf_counter()
+        if region is not None:
+            x0, y0, x1, y1 = region
+            result = predict_batch(model, [frame[y0:y1, x0:x1]], conf=conf, classes=classes, imgsz=x1 - x0)[0]
+            add_time(timings, 'inference', start)
+            crop = Detections.from_result(result)
+            found = Detections(crop.boxes + np.array([x0, y0, x0, y0], np.float32), crop.scores, crop.class_ids)
+        else:
+            size = current_imgsz(imgsz)
+            result = predict_batch(model, [frame], conf=conf, classes=classes, imgsz=size)[0]
+            add_time(timings, 'inference', start)
+            found = Detections.from_result(result)
+            observe_imgsz(imgsz, size, [(frame, found)])
+        yield frame_number, frame, found
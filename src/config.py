@@ -13,3 +13,148 @@ os.makedirs(os.path.join(PROCESSED_DATA_DIR, 'negative'), exist_ok=True)
 
 # Model Settings
 svm_model_path = os.path.join(MODELS_DIR, 'ball_detector_svm.joblib')
+
+# Inference Settings
+DEFAULT_CONF = 0.25
+# Number of sampled frames sent to YOLO in a single forward pass
+INFERENCE_BATCH_SIZE = int(os.environ.get('INFERENCE_BATCH_SIZE', 8))
+# Maximum number of decoded frames buffered between the reader thread and inference
+FRAME_QUEUE_SIZE = int(os.environ.get('FRAME_QUEUE_SIZE', 32))
+# Frames analysed per second of video; skipped frames are grabbed but not decoded to BGR
+ANALYSIS_FPS = float(os.environ.get('ANALYSIS_FPS', 6))
+# Seek with CAP_PROP_POS_FRAMES instead of grabbing when the sampling stride is at least this many frames (0 = never)
+SEEK_MIN_STRIDE = int(os.environ.get('SEEK_MIN_STRIDE', 120))
+
+# Upload Settings
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_MB', 500)) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Job Settings
+# Videos analysed concurrently, and how many more may wait before requests get HTTP 429
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_QUEUE_DEPTH = int(os.environ.get('JOB_QUEUE_DEPTH', 8))
+# Finished jobs kept for GET /jobs/{id}
+JOB_HISTORY = int(os.environ.get('JOB_HISTORY', 100))
+
+# Analysis Modes (see src/analysis.py); budgets of 0 = no limit
+ANALYSIS_MODES = ('first-hit', 'full-scan', 'budgeted', 'adaptive')
+BUDGET_SECONDS = float(os.environ.get('BUDGET_SECONDS', 10))
+BUDGET_FRAMES = int(os.environ.get('BUDGET_FRAMES', 0))
+# Consecutive analysed frames with the ball needed for full event confidence
+EVENT_SUPPORT_FRAMES = 3
+ADAPTIVE_COARSE_FPS = float(os.environ.get('ADAPTIVE_COARSE_FPS', 1))
+ADAPTIVE_REFINE_FACTOR = 4
+
+# Tracking Settings
+# YOLO re-runs every TRACK_DETECT_EVERY analysed frames, or when template matching drops below TRACK_MIN_CONFIDENCE
+TRACK_DETECT_EVERY = int(os.environ.get('TRACK_DETECT_EVERY', 5))
+TRACK_MIN_CONFIDENCE = 0.5
+# Search window around the predicted position, as a multiple of the ball box size
+TRACK_SEARCH_SCALE = 3.0
+
+# Motion Gate Settings
+# Frames with fewer than MOTION_MIN_PIXELS changed pixels (absolute: a new ball is tiny) reuse the previous result
+MOTION_DIFF_WIDTH = 320
+MOTION_PIXEL_THRESHOLD = 15
+MOTION_MIN_PIXELS = int(os.environ.get('MOTION_MIN_PIXELS', 4))
+MOTION_MAX_SKIP = 30
+# Crop around the last ball position: at least MOTION_ROI_SIZE px or MOTION_ROI_SCALE times its box
+MOTION_ROI_SIZE = 320
+MOTION_ROI_SCALE = 6.0
+
+# Model Registry Settings
+YOLO_MODEL_PATH = os.environ.get('YOLO_MODEL_PATH', os.path.join(BASE_DIR, 'src', 'best.pt'))
+# Blank-frame passes right after loading, so the first request doesn't pay for graph setup
+MODEL_WARMUP_RUNS = int(os.environ.get('MODEL_WARMUP_RUNS', 1))
+MODEL_WARMUP_SIZE = (int(os.environ.get('MODEL_WARMUP_WIDTH', 1280)), int(os.environ.get('MODEL_WARMUP_HEIGHT', 720)))
+
+# Detector Backend Settings
+# Every backend but pytorch runs a copy exported next to YOLO_MODEL_PATH by `python run.py --mode export`
+DETECTOR_BACKENDS = ('pytorch', 'onnx', 'onnx-int8-static', 'onnx-int8-dynamic', 'openvino')
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'pytorch')
+EXPORT_IMGSZ = 640
+# Frames from the Dataset/ videos used to calibrate static INT8 quantization
+QUANT_CALIBRATION_FRAMES = 64
+
+# Inference Resolution Settings
+# A size in px or 'auto' (src/resolution.py picks from IMGSZ_CHOICES by the ball's size)
+INFERENCE_IMGSZ = os.environ.get('INFERENCE_IMGSZ', '640')
+IMGSZ_CHOICES = (320, 416, 512, 640)
+AUTO_MIN_BALL_PX = 12
+AUTO_IMGSZ_PATIENCE = 5
+
+# Result Cache Settings
+# /detect responses by upload hash, model version and options; LRU above RESULT_CACHE_MAX_MB (0 = off)
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'results'))
+RESULT_CACHE_MAX_MB = float(os.environ.get('RESULT_CACHE_MAX_MB', 256))
+
+# Detection Cache Settings
+# Raw per-frame YOLO boxes above DETECTION_CACHE_FLOOR; LRU above DETECTION_CACHE_MAX_MB (0 = off)
+DETECTION_CACHE_DIR = os.environ.get('DETECTION_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'detections'))
+DETECTION_CACHE_MAX_MB = float(os.environ.get('DETECTION_CACHE_MAX_MB', 512))
+DETECTION_CACHE_FLOOR = 0.01
+
+# Evidence Image Settings
+# Drawn and encoded only when fetched from GET /evidence/{id}; EVIDENCE_MAX_WIDTH 0 = full size
+EVIDENCE_JPEG_QUALITY = int(os.environ.get('EVIDENCE_JPEG_QUALITY', 85))
+EVIDENCE_MAX_WIDTH = int(os.environ.get('EVIDENCE_MAX_WIDTH', 1280))
+EVIDENCE_HISTORY = int(os.environ.get('EVIDENCE_HISTORY', 100))
+
+# Streaming Settings
+# Minimum seconds between progress events of POST /detect/stream
+STREAM_PROGRESS_INTERVAL = float(os.environ.get('STREAM_PROGRESS_INTERVAL', 0.25))
+
+# Request Limit Settings
+# Caps on every API analysis whatever the client asked for (0 = none); past them the partial result is returned
+MAX_PROCESSING_SECONDS = float(os.environ.get('MAX_PROCESSING_SECONDS', 300))
+MAX_ANALYZED_FRAMES = int(os.environ.get('MAX_ANALYZED_FRAMES', 20000))
+DISCONNECT_POLL_SECONDS = 0.5
+
+# Sharded Analysis Settings
+# Processes (one model each) a sharded full scan of one video is split across
+SHARD_WORKERS = int(os.environ.get('SHARD_WORKERS', 2))
+
+# Batch Settings
+# `python run.py --mode batch`: videos analysed at once, and where their JSONL timelines go
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 2))
+BATCH_OUTPUT_DIR = os.environ.get('BATCH_OUTPUT_DIR', os.path.join(BASE_DIR, 'timelines'))
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+
+# HOG Feature Settings
+# Samples are resized to HOG_WIN_SIZE (1764 features); features are cached by sample path and mtime
+HOG_WIN_SIZE = (64, 64)
+HOG_BLOCK_SIZE = (16, 16)
+HOG_BLOCK_STRIDE = (8, 8)
+HOG_CELL_SIZE = (8, 8)
+HOG_NBINS = 9
+TRAIN_WORKERS = int(os.environ.get('TRAIN_WORKERS', os.cpu_count() or 1))
+FEATURE_CACHE_PATH = os.environ.get('FEATURE_CACHE_PATH', os.path.join(BASE_DIR, 'cache', 'hog_features.npz'))
+
+# Sample Shard Settings
+# `python run.py --mode pack` packs the sample JPEGs into memory-mapped shards of SAMPLE_SIZE patches
+SAMPLE_SHARD_DIR = os.environ.get('SAMPLE_SHARD_DIR', os.path.join(PROCESSED_DATA_DIR, 'shards'))
+SAMPLE_SHARD_SIZE = 4096
+SAMPLE_SIZE = (64, 64)
+
+# Incremental Training Settings
+# `--mode train --incremental`: SGD (hinge loss) over unseen samples; HOLDOUT_PERCENT is kept for evaluation
+SGD_BATCH_SIZE = int(os.environ.get('SGD_BATCH_SIZE', 256))
+SGD_EPOCHS = int(os.environ.get('SGD_EPOCHS', 5))
+SGD_ALPHA = 1e-4
+HOLDOUT_PERCENT = 20
+
+# SVM Detector Settings
+# Sliding-window HOG-SVM (src/svm_detector.py) over balls of SVM_MIN_WINDOW to SVM_MAX_WINDOW px
+SVM_DETECT_WIDTH = int(os.environ.get('SVM_DETECT_WIDTH', 640))
+SVM_MIN_WINDOW = 48
+SVM_MAX_WINDOW = 192
+SVM_SCALE_STEP = 1.25
+SVM_THRESHOLD = float(os.environ.get('SVM_THRESHOLD', 0.0))
+SVM_NMS_IOU = 0.3
+
+# Cascade Settings
+# YOLO only runs where an SVM margin exceeds CASCADE_THRESHOLD (below SVM_THRESHOLD, to favour recall)
+CASCADE_WIDTH = int(os.environ.get('CASCADE_WIDTH', 320))
+CASCADE_THRESHOLD = float(os.environ.get('CASCADE_THRESHOLD', -0.5))
+CASCADE_ROI_SIZE = 320
+CASCADE_ROI_SCALE = 2.0
@@ -1,60 +1,22 @@
 import cv2
 import os
 import argparse
-from ultralytics import YOLO
-from src.config import DATASET_DIR, BASE_DIR
+from src.config import (DATASET_DIR, BASE_DIR, TRACK_DETECT_EVERY, YOLO_MODEL_PATH, DETECTOR_BACKENDS,
+                        INFERENCE_BACKEND, INFERENCE_IMGSZ, SVM_THRESHOLD, CASCADE_THRESHOLD)
+from src.model_registry import get_model
+from src.frame_pipeline import FramePipeline
+from src.inference import iter_batched_predictions
+from src.tracker import iter_tracked_predictions
+from src.motion import MotionGate, iter_gated_predictions
+from src.resolution import make_imgsz, imgsz_stats
+from src.ingest import hash_file
+from src.detection_cache import open_store, save_store
+from src.sharded import analyze_sharded
+from src.svm_detector import SvmDetector, iter_svm_predictions
+from src.cascade import SvmCascade, iter_cascade_predictions
 
-def main():
-    parser = argparse.ArgumentParser(description='Detect Knock-on with YOLOv8')
-    parser.add_argument('--video', type=str, help='Path to video file', default=None)
-    parser.add_argument('--model', type=str, help='Path to YOLO model', default=None)
-    parser.add_argument('--conf', type=float, help='Confidence threshold', default=0.25)
-    args = parser.parse_args()
-
-    if args.model and os.path.exists(args.model):
-        model_path = args.model
-    else:
-        src_dir = os.path.dirname(os.path.abspath(__file__))
-        default_model = os.path.join(src_dir, 'best.pt') 
-        if os.path.exists(default_model):
-            model_path = default_model
-        else:
-             possible_models = [
-                os.path.join(src_dir, 'best.pt'),
-                os.path.join(src_dir, 'best.pt')
-             ]
-             model_path = None
-             for p in possible_models:
-                 if os.path.exists(p):
-                     model_path = p
-                     break
-    
-    if not model_path:
-        print("model not found.")
-        return
-
-    print(f"Loading ...")
-    try:
-        model = YOLO(model_path)
-    except Exception as e:
-        print(f"{e}")
-        return
-
-    target_classes = None
-    print("Model classes found:", model.names)
-    
-    ball_ids = []
-    for class_id, class_name in model.names.items():
-        if 'ball' in class_name.lower():
-            ball_ids.append(class_id)
-    
-    if ball_ids:
-        target_classes = ball_ids
-        print(f"-> Auto-filtering mainly for ball detection (Class IDs: {ball_ids}).")
-    else:
-        print("-> 'ball' class not explicitly found in names. Displaying all detections.")
-
-    video_path = args.video
+def find_video(video_path):
+    """video_path if it exists, else the first .mp4 in the Dataset or videos folder (None if there is none)."""
     if not video_path or not os.path.exists(video_path):
         possible_dirs = [
             DATASET_DIR, 
@@ -77,7 +39,113 @@ def main():
         
         if not found:
             print("No video found in Dataset or videos folder.")
+            return None
+
+    return video_path
+
+
+def run_sharded(video_path, model_path, args):
+    print(f"Analysing {video_path} across {args.workers} processes ...")
+    try:
+        analysis = analyze_sharded(video_path, workers=args.workers, weights=model_path, backend=args.backend,
+                                   conf=args.conf, imgsz=args.imgsz)
+    except Exception as e:
+        print(f"{e}")
+        return
+    for shard in analysis["shards"]:
+        print(f"  frames {shard['first_frame']}-{shard['last_frame']}: {shard['frames_processed']} analysed, "
+              f"{shard['detections']} with the ball, {shard['seconds']}s")
+    for point in analysis["trajectory"]:
+        print(f"frame {point['frame']}: ball at ({point['x']}, {point['y']})")
+    print(f"{analysis['frames_processed']} frames analysed in {analysis['timings']['total_seconds']}s, "
+          f"event confidence {analysis['event_confidence']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detect Knock-on with YOLOv8')
+    parser.add_argument('--video', type=str, help='Path to video file', default=None)
+    parser.add_argument('--model', type=str, help='Path to YOLO model', default=None)
+    parser.add_argument('--conf', type=float, help='Confidence threshold', default=0.25)
+    parser.add_argument('--backend', type=str, choices=DETECTOR_BACKENDS, default=INFERENCE_BACKEND,
+                        help='Inference backend (onnx/openvino need `python run.py --mode export` first)')
+    parser.add_argument('--track', action='store_true', help='Follow the ball between detector runs')
+    parser.add_argument('--detect-every', type=int, default=TRACK_DETECT_EVERY,
+                        help='With --track, run YOLO at least every N frames')
+    parser.add_argument('--motion', action='store_true',
+                        help='Skip static frames and crop inference around the last ball position')
+    parser.add_argument('--imgsz', type=str, default=INFERENCE_IMGSZ,
+                        help="Inference size in px, or 'auto' to shrink it to the observed ball size")
+    parser.add_argument('--no-detection-cache', action='store_true',
+                        help="Don't reuse or store raw per-frame detections (see src/detection_cache.py)")
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Analyse the whole video without the display window, split across N processes '
+                             '(src/sharded.py), and print the detection timeline')
+    parser.add_argument('--detector', type=str, choices=['yolo', 'svm'], default='yolo',
+                        help='yolo, or svm for the sliding-window HOG-SVM from `python run.py --mode train` '
+                             '(src/svm_detector.py; --track, --motion, --cascade and --workers apply to yolo only)')
+    parser.add_argument('--svm-threshold', type=float, default=SVM_THRESHOLD,
+                        help='With --detector svm, the SVM margin a window needs to count as the ball')
+    parser.add_argument('--cascade', action='store_true',
+                        help='Only run YOLO on frames where the HOG-SVM finds a ball-like window '
+                             '(src/cascade.py; --track and --motion take precedence)')
+    parser.add_argument('--cascade-threshold', type=float, default=CASCADE_THRESHOLD,
+                        help='With --cascade, the SVM margin a frame needs to be passed on to YOLO')
+    args = parser.parse_args()
+    try:
+        imgsz = make_imgsz(args.imgsz)
+    except ValueError as e:
+        print(e)
+        return
+
+    model_path = args.model if args.model and os.path.exists(args.model) else YOLO_MODEL_PATH
+    if args.detector == 'yolo' and not os.path.exists(model_path):
+        print("model not found.")
+        return
+
+    video_path = find_video(args.video)
+    if video_path is None:
+        return
+
+    if args.workers > 0 and args.detector == 'yolo':
+        run_sharded(video_path, model_path, args)
+        return
+
+    svm = None
+    if args.detector == 'svm':
+        try:
+            svm = SvmDetector(threshold=args.svm_threshold)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"{e}")
             return
+        print(f"HOG-SVM detector: {len(svm.windows)} pyramid levels, margin threshold {svm.threshold}")
+    else:
+        print(f"Loading ...")
+        try:
+            loaded_model = get_model(model_path, args.backend)
+        except Exception as e:
+            print(f"{e}")
+            return
+        if loaded_model is None:
+            print(f"No {args.backend} weights for {model_path}. Run: python run.py --mode export --format {args.backend}")
+            return
+        model = loaded_model.model
+        target_classes = loaded_model.classes
+        print("Model classes found:", model.names)
+        print(f"Loaded in {loaded_model.load_seconds:.2f}s, warmed up in {loaded_model.warmup_seconds:.2f}s")
+
+        if target_classes:
+            print(f"-> Auto-filtering mainly for ball detection (Class IDs: {target_classes}).")
+        else:
+            print("-> 'ball' class not explicitly found in names. Displaying all detections.")
+
+    cascade = None
+    if args.cascade and svm is None and not (args.track or args.motion):
+        try:
+            cascade = SvmCascade(threshold=args.cascade_threshold)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"{e}")
+            return
+        print(f"Cascade: YOLO runs only where the HOG-SVM margin exceeds {cascade.threshold}")
 
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
@@ -92,34 +160,65 @@ def main():
     cv2.namedWindow('Knock-on Detector', cv2.WINDOW_NORMAL)
     cv2.resizeWindow('Knock-on Detector', display_width, display_height)
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        results = model(frame, conf=args.conf, verbose=False, classes=target_classes)
+    gate = MotionGate() if args.motion and svm is None else None
+    # Frames seen before with this model are replayed from the detection cache and just
+    # re-filtered at --conf, so only new frames cost a model call
+    store = None
+    if svm is None and not (args.track or args.motion or args.cascade or args.no_detection_cache):
+        store = open_store(hash_file(video_path), loaded_model.version)
 
-        annotated_frame = results[0].plot()
-        
-        # Resize frame to fit the window while maintaining aspect ratio
-        h, w = annotated_frame.shape[:2]
-        aspect = w / h
-        if aspect > display_width / display_height:
-            new_w = display_width
-            new_h = int(display_width / aspect)
+    # Decoding runs on a reader thread so it overlaps with inference and display
+    with FramePipeline(cap) as pipeline:
+        if svm is not None:
+            predictions = iter_svm_predictions(svm, pipeline, timings=pipeline.timings)
+        elif args.track:
+            predictions = iter_tracked_predictions(model, pipeline, detect_every=args.detect_every, conf=args.conf,
+                                                   classes=target_classes, timings=pipeline.timings, imgsz=imgsz)
+        elif gate is not None:
+            predictions = iter_gated_predictions(model, pipeline, conf=args.conf, classes=target_classes,
+                                                 timings=pipeline.timings, gate=gate, imgsz=imgsz)
+        elif cascade is not None:
+            predictions = iter_cascade_predictions(model, pipeline, conf=args.conf, classes=target_classes,
+                                                   timings=pipeline.timings, cascade=cascade, imgsz=imgsz)
         else:
-            new_h = display_height
-            new_w = int(display_height * aspect)
-        
-        resized_frame = cv2.resize(annotated_frame, (new_w, new_h))
+            predictions = iter_batched_predictions(model, pipeline, batch_size=1, conf=args.conf,
+                                                   classes=target_classes, timings=pipeline.timings, imgsz=imgsz,
+                                                   store=store)
 
-        cv2.imshow('Knock-on Detector', resized_frame)
-        
-        if cv2.waitKey(30) & 0xFF == ord('q'):
-            break
+        for frame_number, frame, found in predictions:
+            annotated_frame = found.plot(frame)
+            
+            # Resize frame to fit the window while maintaining aspect ratio
+            h, w = annotated_frame.shape[:2]
+            aspect = w / h
+            if aspect > display_width / display_height:
+                new_w = display_width
+                new_h = int(display_width / aspect)
+            else:
+                new_h = display_height
+                new_w = int(display_height * aspect)
+            
+            resized_frame = cv2.resize(annotated_frame, (new_w, new_h))
+
+            cv2.imshow('Knock-on Detector', resized_frame)
+            
+            if cv2.waitKey(30) & 0xFF == ord('q'):
+                break
             
     cap.release()
     cv2.destroyAllWindows()
+    if store is not None:
+        save_store(store)
+        print(f"Detection cache: {store.stats()}")
+    if svm is not None:
+        print(f"HOG-SVM detector: {svm.stats()}")
+    print(f"Stage timings: {pipeline.stats()}")
+    if gate is not None:
+        print(f"Motion gate: {gate.stats()}")
+    if cascade is not None:
+        print(f"Cascade: {cascade.stats()}")
+    if svm is None:
+        print(f"Inference size: {imgsz_stats(imgsz)}")
 
 if __name__ == "__main__":
     main()
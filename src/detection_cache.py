@@ -0,0 +1,205 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.config import DETECTION_CACHE_DIR, DETECTION_CACHE_MAX_MB, DETECTION_CACHE_FLOOR
+from src.inference import Detections
+
+# One row per box; frames where the model found nothing get a single row with cls=-1,
+# so "no detections" is cached too
+ROW_DTYPE = np.dtype([('frame', np.int32), ('imgsz', np.int16), ('cls', np.int16),
+                      ('score', np.float32), ('box', np.float32, (4,))])
+
+
+def validate_conf(conf, floor=DETECTION_CACHE_FLOOR):
+    """Raise ValueError unless conf is in [floor, 1], the range the cached raw detections can answer."""
+    if not floor <= conf <= 1:
+        raise ValueError(f"conf must be between {floor} and 1.")
+    return conf
+
+
+def _key(frame_number, imgsz):
+    return (int(frame_number), int(imgsz or 0))
+
+
+class FrameDetectionStore:
+    """
+    Raw detections of one video under one model version, for every frame and
+    inference size it has been run at.
+
+    Boxes are kept above a floor confidence (DETECTION_CACHE_FLOOR) for every
+    class, so any later conf >= floor and any class filter can be answered
+    by filtering. On disk the store is a single .npy of ROW_DTYPE rows sorted
+    by (frame, imgsz), read whole on load and indexed by its frame/imgsz
+    columns. It is not memory-mapped: Windows can't replace or delete a file
+    that is still mapped, which save() and the LRU eviction both do. New
+    frames are held in memory until save(), which rewrites the file atomically.
+    """
+
+    def __init__(self, path, floor=DETECTION_CACHE_FLOOR):
+        self.path = path
+        self.floor = floor
+        self.lock = threading.Lock()
+        self.rows = np.zeros(0, dtype=ROW_DTYPE)
+        self.index = {}  # (frame, imgsz) -> (first row, row count)
+        self.new = {}  # (frame, imgsz) -> Detections not saved yet
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        try:
+            rows = np.load(self.path)
+        except (OSError, ValueError):
+            return
+        if rows.dtype != ROW_DTYPE:
+            return
+        self.rows = rows
+        keys = rows['frame'].astype(np.int64) << 16 | rows['imgsz'].astype(np.int64)
+        _, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+        self.index = {_key(rows['frame'][s], rows['imgsz'][s]): (int(s), int(c)) for s, c in zip(starts, counts)}
+
+    def __len__(self):
+        return len(self.index.keys() | self.new.keys())
+
+    def get(self, frame_number, imgsz):
+        """Raw Detections (source='cache') for a frame at imgsz, or None if it was never run."""
+        key = _key(frame_number, imgsz)
+        with self.lock:
+            if key in self.new:
+                self.hits += 1
+                found = self.new[key]
+                return Detections(found.boxes, found.scores, found.class_ids, source='cache')
+            if key not in self.index:
+                self.misses += 1
+                return None
+            self.hits += 1
+            start, count = self.index[key]
+            rows = self.rows[start:start + count]
+        rows = rows[rows['cls'] >= 0]
+        return Detections(rows['box'], rows['score'], rows['cls'], source='cache')
+
+    def put(self, frame_number, imgsz, found):
+        """Record the model's output for a frame, run at conf=self.floor with no class filter."""
+        with self.lock:
+            self.new[_key(frame_number, imgsz)] = found
+
+    def save(self):
+        """Merge new frames into the file. Also refreshes its mtime, which the LRU eviction goes by."""
+        with self.lock:
+            if not self.new:
+                if os.path.exists(self.path):
+                    os.utime(self.path)
+                return
+            old = self.rows
+            if len(old):
+                keys = list(zip(old['frame'].tolist(), old['imgsz'].tolist()))
+                old = old[np.array([k not in self.new for k in keys], dtype=bool)]
+            rows = np.concatenate([old] + [_rows(key, found) for key, found in self.new.items()])
+            rows = rows[np.lexsort((rows['imgsz'], rows['frame']))]
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.save(f, rows)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.remove(tmp)
+                raise
+            self.new = {}
+            self._load()
+
+    def stats(self):
+        return {"frames": len(self), "hits": self.hits, "misses": self.misses, "floor": self.floor}
+
+    def session(self):
+        """A StoreSession for one analysis of this video."""
+        return StoreSession(self)
+
+
+class StoreSession:
+    """
+    One analysis's use of a FrameDetectionStore. The store is shared by every
+    analysis of the video in this process, so its hits and misses are running
+    totals; a session counts only the lookups made through it.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.floor = store.floor
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, frame_number, imgsz):
+        found = self.store.get(frame_number, imgsz)
+        if found is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return found
+
+    def put(self, frame_number, imgsz, found):
+        self.store.put(frame_number, imgsz, found)
+
+    def stats(self):
+        return dict(self.store.stats(), hits=self.hits, misses=self.misses)
+
+
+def _rows(key, found):
+    if len(found) == 0:
+        rows = np.zeros(1, dtype=ROW_DTYPE)
+        rows['cls'] = -1
+    else:
+        rows = np.zeros(len(found), dtype=ROW_DTYPE)
+        rows['cls'] = found.class_ids
+        rows['score'] = found.scores
+        rows['box'] = found.boxes
+    rows['frame'], rows['imgsz'] = key
+    return rows
+
+
+_lock = threading.Lock()
+_stores = OrderedDict()  # path -> FrameDetectionStore, shared by concurrent analyses of the same video
+_MAX_OPEN_STORES = 32
+
+
+def open_store(video_hash, model_version, directory=DETECTION_CACHE_DIR,
+               max_bytes=int(DETECTION_CACHE_MAX_MB * 1024 * 1024)):
+    """
+    The FrameDetectionStore for a video (sha256 of its bytes) under a model
+    version (src.detector.weights_version), or None when the cache is disabled.
+    """
+    if max_bytes <= 0 or not video_hash:
+        return None
+    path = os.path.join(directory, f"{video_hash}_{model_version}.npy")
+    with _lock:
+        if path not in _stores:
+            _stores[path] = FrameDetectionStore(path)
+            if len(_stores) > _MAX_OPEN_STORES:
+                _stores.popitem(last=False)
+        _stores.move_to_end(path)
+        return _stores[path]
+
+
+def save_store(store, directory=DETECTION_CACHE_DIR, max_bytes=int(DETECTION_CACHE_MAX_MB * 1024 * 1024)):
+    """Save store, then delete the least recently used store files until the cache fits in max_bytes."""
+    store.save()
+    if not os.path.isdir(directory):
+        return
+    with _lock:
+        files = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.npy')]
+        files.sort(key=os.path.getmtime)
+        total = sum(os.path.getsize(f) for f in files)
+        for f in files:
+            if total <= max_bytes:
+                break
+            if f == store.path:
+                continue
+            total -= os.path.getsize(f)
+            os.remove(f)
+            _stores.pop(f, None)
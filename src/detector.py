@@ -0,0 +1,97 @@
+import os
+import hashlib
+from ultralytics import YOLO
+
+from src.config import DATASET_DIR, YOLO_MODEL_PATH, DETECTOR_BACKENDS, INFERENCE_BACKEND, EXPORT_IMGSZ
+
+# Where each backend's weights live, relative to the PyTorch checkpoint (best.pt -> best.onnx)
+_SUFFIXES = {
+    'pytorch': '.pt',
+    'onnx': '.onnx',
+    'onnx-int8-static': '_int8_static.onnx',
+    'onnx-int8-dynamic': '_int8_dynamic.onnx',
+    'openvino': '_openvino_model',
+}
+
+
+def validate_backend(backend):
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Choose one of: {', '.join(DETECTOR_BACKENDS)}.")
+    return backend
+
+
+def backend_weights(weights=YOLO_MODEL_PATH, backend=INFERENCE_BACKEND):
+    """Path of the weights backend runs for the PyTorch checkpoint weights."""
+    validate_backend(backend)
+    if backend == 'pytorch':
+        return weights
+    return os.path.splitext(weights)[0] + _SUFFIXES[backend]
+
+
+def available_backends(weights=YOLO_MODEL_PATH):
+    """Backends whose weights exist for the PyTorch checkpoint weights."""
+    return [backend for backend in DETECTOR_BACKENDS if os.path.exists(backend_weights(weights, backend))]
+
+
+_versions = {}  # (path, mtime, size) -> weights_version()
+
+
+def weights_version(weights=YOLO_MODEL_PATH, backend=INFERENCE_BACKEND):
+    """
+    Short content hash of the weights backend runs (every file, for an
+    OpenVINO directory). Used to key cached results, so re-exporting or
+    retraining invalidates them. Memoized on mtime and size.
+    """
+    path = backend_weights(weights, backend)
+    files = [path]
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    stamp = tuple((f, os.path.getmtime(f), os.path.getsize(f)) for f in files)
+    if stamp not in _versions:
+        digest = hashlib.sha256()
+        for f in files:
+            with open(f, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        _versions[stamp] = digest.hexdigest()[:16]
+    return _versions[stamp]
+
+
+def load_detector(weights=YOLO_MODEL_PATH, backend=INFERENCE_BACKEND):
+    """
+    Load the detector for backend. Every backend is driven through
+    ultralytics' YOLO wrapper, which runs .onnx files (FP32 or INT8) on ONNX Runtime and
+    OpenVINO model directories on OpenVINO, so all of them take the same
+    arguments and return the same Results as best.pt. Nothing downstream of
+    src/model_registry.py needs to know which one is in use.
+    """
+    path = backend_weights(weights, backend)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No {backend} weights at {path}. Export them with: python run.py --mode export "
+                                f"--format {backend}")
+    return YOLO(path, task='detect')
+
+
+def export(weights=YOLO_MODEL_PATH, backend='onnx', imgsz=EXPORT_IMGSZ, video_dir=DATASET_DIR):
+    """
+    Export the PyTorch checkpoint for backend and return the exported path.
+    Input shapes are left dynamic so batching, rectangular letterboxing and
+    the motion gate's smaller crops work as they do in PyTorch. The INT8
+    variants are quantized from best.onnx (exported first if missing); static
+    calibration reads frames from the videos in video_dir.
+    """
+    if validate_backend(backend) == 'pytorch':
+        return weights
+    if backend == 'openvino':
+        return YOLO(weights).export(format='openvino', imgsz=imgsz, dynamic=True)
+
+    onnx_path = backend_weights(weights, 'onnx')
+    if backend == 'onnx' or not os.path.exists(onnx_path):
+        onnx_path = YOLO(weights).export(format='onnx', imgsz=imgsz, dynamic=True)
+    if backend == 'onnx':
+        return onnx_path
+
+    # Imported here so onnxruntime's quantization tooling is only needed for INT8 exports
+    from src.quantize import quantize
+    mode = backend.rsplit('-', 1)[-1]
+    return quantize(onnx_path, backend_weights(weights, backend), mode=mode, video_dir=video_dir, imgsz=imgsz)
@@ -0,0 +1,113 @@
+import uuid
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from src.config import EVIDENCE_JPEG_QUALITY, EVIDENCE_MAX_WIDTH, EVIDENCE_HISTORY
+
+BOX_COLOR = (0, 255, 0)
+
+
+def draw_boxes(image, boxes, scores, label='', scale=1.0):
+    """
+    Draw boxes (scaled by scale) and their scores onto image in place.
+    Plain cv2 primitives: unlike Results.plot() there is no copy of the
+    original frame, no font or colour palette setup and no per-box Annotator.
+    """
+    for (x1, y1, x2, y2), score in zip((np.asarray(boxes, dtype=np.float32) * scale).astype(int), scores):
+        cv2.rectangle(image, (x1, y1), (x2, y2), BOX_COLOR, 2)
+        cv2.putText(image, f"{label} {score:.2f}".strip(), (x1, max(0, y1 - 5)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, BOX_COLOR, 1)
+    return image
+
+
+def _quality(quality):
+    return int(min(100, max(1, quality)))
+
+
+class Evidence:
+    """
+    The frame of an analysis' first detection and its boxes. Nothing is drawn
+    or encoded until jpeg() or image() is called; each encoding is kept, so
+    repeated fetches of the same quality and size are free.
+    """
+
+    def __init__(self, frame_number, frame, detections, jpeg=None):
+        self.frame_number = frame_number
+        self.frame = frame
+        self.detections = detections
+        self._lock = threading.RLock()
+        self._encoded = {}  # (quality, max_width) -> bytes
+        if jpeg is not None:
+            self._encoded[(EVIDENCE_JPEG_QUALITY, EVIDENCE_MAX_WIDTH)] = jpeg
+
+    @classmethod
+    def from_jpeg(cls, jpeg, frame_number=None):
+        """Evidence that is already annotated and encoded (e.g. from the result cache)."""
+        return cls(frame_number, None, None, jpeg=jpeg)
+
+    def image(self, max_width=0):
+        """Annotated BGR image, downscaled to max_width px wide first (0 = full size) so drawing is cheaper too."""
+        if self.frame is None:
+            # Only the encoded default is available; its boxes are already drawn
+            image = cv2.imdecode(np.frombuffer(self.jpeg(), np.uint8), cv2.IMREAD_COLOR)
+            return _shrink(image, max_width)[0]
+        image, scale = _shrink(self.frame, max_width)
+        if image is self.frame:
+            image = image.copy()
+        return draw_boxes(image, self.detections.boxes, self.detections.scores, self.detections.source, scale)
+
+    def jpeg(self, quality=EVIDENCE_JPEG_QUALITY, max_width=EVIDENCE_MAX_WIDTH):
+        key = (_quality(quality), max(0, int(max_width)))
+        with self._lock:
+            if key not in self._encoded:
+                _, buffer = cv2.imencode('.jpg', self.image(key[1]), [cv2.IMWRITE_JPEG_QUALITY, key[0]])
+                self._encoded[key] = buffer.tobytes()
+            return self._encoded[key]
+
+
+def _shrink(image, max_width):
+    h, w = image.shape[:2]
+    if not max_width or w <= max_width:
+        return image, 1.0
+    scale = max_width / w
+    return cv2.resize(image, (max_width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA), scale
+
+
+class EvidenceStore:
+    """
+    Evidence of recent analyses by id, for GET /evidence/{id}. Only the
+    latest `history` entries are kept, so memory stays bounded to that many
+    frames.
+    """
+
+    def __init__(self, history=EVIDENCE_HISTORY):
+        self.history = max(1, int(history))
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+        self.served = 0
+
+    def add(self, evidence):
+        """Register evidence and return its id; adding the same Evidence again returns the same id."""
+        with self.lock:
+            evidence_id = getattr(evidence, 'id', None)
+            if evidence_id in self.items:
+                return evidence_id
+            evidence_id = evidence.id = uuid.uuid4().hex
+            self.items[evidence_id] = evidence
+            while len(self.items) > self.history:
+                self.items.popitem(last=False)
+        return evidence_id
+
+    def get(self, evidence_id):
+        with self.lock:
+            evidence = self.items.get(evidence_id)
+            if evidence is not None:
+                self.served += 1
+            return evidence
+
+    def stats(self):
+        with self.lock:
+            return {"stored": len(self.items), "history": self.history, "served": self.served}
@@ -0,0 +1,212 @@
+import time
+import queue
+import threading
+from contextlib import contextmanager
+import cv2
+
+from src.config import FRAME_QUEUE_SIZE, ANALYSIS_FPS, SEEK_MIN_STRIDE
+
+_END = object()
+
+
+def sampling_stride(fps, target_fps=ANALYSIS_FPS):
+    """Number of source frames per analysed frame, e.g. 30fps video at 6fps analysis -> 5."""
+    if not fps or not target_fps or target_fps <= 0:
+        return 1
+    return max(1, int(fps // target_fps))
+
+
+def count_frames(video_path):
+    """Number of frames in a video whose container doesn't report it, by grabbing through to the end."""
+    cap = cv2.VideoCapture(video_path)
+    frames = 0
+    try:
+        while cap.grab():
+            frames += 1
+    finally:
+        cap.release()
+    return frames
+
+
+def read_frames(cap, frame_numbers, seek_min_stride=SEEK_MIN_STRIDE, timings=None):
+    """
+    Yield (frame_number, frame) for an ascending list of 1-based frame numbers,
+    grab()bing over short gaps and seeking over gaps of seek_min_stride or more.
+    Unlike FramePipeline this runs on the caller's thread and allows the next
+    call to start anywhere in the video (it seeks backwards when needed).
+    Frames past the end of the video are silently dropped.
+    """
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    for frame_number in frame_numbers:
+        start = time.perf_counter()
+        gap = frame_number - position
+        if gap < 1 or (seek_min_stride > 0 and gap >= seek_min_stride):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number - 1)
+            position = frame_number - 1
+
+        ok = True
+        while ok and position < frame_number:
+            ok = cap.grab()
+            position += 1
+        ret, frame = cap.retrieve() if ok else (False, None)
+
+        if timings is not None:
+            timings['decode'] = timings.get('decode', 0.0) + time.perf_counter() - start
+        if not ret:
+            return
+        yield frame_number, frame
+
+
+class FramePipeline:
+    """
+    Decode frames on a background thread while the caller runs inference.
+
+    The reader thread pulls frames from an open cv2.VideoCapture into a bounded
+    queue; when the queue is full it blocks (backpressure), so at most
+    queue_size decoded frames are held in memory. OpenCV decoding and torch
+    both release the GIL, so decode and inference overlap instead of adding up.
+
+    Iterating yields (frame_number, frame) for every frame_skip-th frame,
+    numbered from 1 like the original read loops. Use it as a context manager
+    so the reader thread is stopped when the caller exits early.
+
+    Skipped frames are only grab()bed, never retrieve()d, so they skip the
+    colour conversion and copy into a numpy array. When the stride is at least
+    seek_min_stride frames, the reader seeks with CAP_PROP_POS_FRAMES instead;
+    the backend then decodes forward from the nearest keyframe, which is only
+    cheaper than grabbing when the stride spans a keyframe interval. Set
+    seek_min_stride to 0 to never seek.
+    """
+
+    def __init__(self, cap, frame_skip=1, queue_size=FRAME_QUEUE_SIZE, seek_min_stride=SEEK_MIN_STRIDE):
+        self.cap = cap
+        self.frame_skip = max(1, int(frame_skip))
+        self.seek_min_stride = int(seek_min_stride)
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.frames_read = 0
+        self.frames_grabbed = 0
+        self.seeks = 0
+        self.frames_retrieved = 0
+        self.frames_yielded = 0
+        self.timings = {'decode': 0.0, 'queue_wait': 0.0, 'inference': 0.0}
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._reader, daemon=True)
+        self._started = False
+        self._start_time = None
+        self._end_time = None
+        # perf_counter() timestamp of the first decoded frame, for time-to-first-frame
+        self.first_frame_at = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        if not self._started:
+            self._started = True
+            self._start_time = time.perf_counter()
+            self._thread.start()
+
+    def _put(self, item):
+        # Block while the queue is full, but give up as soon as close() is called
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _reader(self):
+        try:
+            next_frame = self.frame_skip
+            use_seek = self.seek_min_stride > 0 and self.frame_skip >= self.seek_min_stride
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                frame = self._read_frame(next_frame, use_seek)
+                self.timings['decode'] += time.perf_counter() - start
+                if frame is None:
+                    break
+
+                if not self._put((next_frame, frame)):
+                    return
+                next_frame += self.frame_skip
+        except Exception as e:
+            self._error = e
+        finally:
+            self._put(_END)
+
+    def _read_frame(self, frame_number, use_seek):
+        """Advance to frame_number (1-based) and decode only that frame. Returns None at end of video."""
+        position = self.frames_read
+        if use_seek and frame_number - position > 1:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number - 1)
+            position = frame_number - 1
+            self.seeks += 1
+
+        while position < frame_number:
+            if not self.cap.grab():
+                return None
+            position += 1
+            self.frames_grabbed += 1
+            self.frames_read = position
+
+        ret, frame = self.cap.retrieve()
+        if not ret:
+            return None
+        self.frames_retrieved += 1
+        if self.first_frame_at is None:
+            self.first_frame_at = time.perf_counter()
+        return frame
+
+    def __iter__(self):
+        self.start()
+        while True:
+            start = time.perf_counter()
+            item = self.queue.get()
+            self.timings['queue_wait'] += time.perf_counter() - start
+
+            if item is _END:
+                if self._error is not None:
+                    raise self._error
+                return
+
+            self.frames_yielded += 1
+            yield item
+
+    @contextmanager
+    def timed(self, stage):
+        """Accumulate the wall time of a consumer-side stage into timings[stage]."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - start
+
+    def close(self):
+        self._stop.set()
+        if self._started:
+            self._thread.join()
+            if self._end_time is None:
+                self._end_time = time.perf_counter()
+
+    def stats(self):
+        """Per-stage timings in seconds plus frame counters, ready for a JSON response."""
+        end = self._end_time or time.perf_counter()
+        total = end - self._start_time if self._start_time is not None else 0.0
+        decode_ms = 1000 * self.timings['decode'] / self.frames_retrieved if self.frames_retrieved else 0.0
+        stats = {
+            "frames_decoded": self.frames_read,
+            "frames_grabbed": self.frames_grabbed,
+            "seeks": self.seeks,
+            "frames_analyzed": self.frames_yielded,
+            "decode_ms_per_analyzed_frame": round(decode_ms, 3),
+            "total_seconds": round(total, 3),
+        }
+        for stage, seconds in self.timings.items():
+            stats[f"{stage}_seconds"] = round(seconds, 3)
+        return stats
@@ -0,0 +1,206 @@
+import os
+import json
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from src.config import (HOG_WIN_SIZE, HOG_BLOCK_SIZE, HOG_BLOCK_STRIDE, HOG_CELL_SIZE, HOG_NBINS, TRAIN_WORKERS,
+                        FEATURE_CACHE_PATH)
+
+# Stored with the cache, so features computed with other parameters are never reused
+HOG_PARAMS = json.dumps([HOG_WIN_SIZE, HOG_BLOCK_SIZE, HOG_BLOCK_STRIDE, HOG_CELL_SIZE, HOG_NBINS])
+
+
+def make_hog():
+    return cv2.HOGDescriptor(HOG_WIN_SIZE, HOG_BLOCK_SIZE, HOG_BLOCK_STRIDE, HOG_CELL_SIZE, HOG_NBINS)
+
+
+def feature_size():
+    return make_hog().getDescriptorSize()
+
+
+def compute_hog_features(image, hog=None):
+    """HOG descriptor of image resized to HOG_WIN_SIZE. Pass a descriptor from make_hog() to reuse it across images."""
+    if hog is None:
+        hog = make_hog()
+    return hog.compute(cv2.resize(image, HOG_WIN_SIZE)).flatten()
+
+
+def iter_feature_batches(load_image, indices, labels, batch_size):
+    """
+    Yield (features, labels) for the samples in indices, batch_size at a
+    time. load_image(i) returns sample i's image (or None if unreadable, in
+    which case it is dropped). Only one batch of features is ever in memory.
+    """
+    hog = make_hog()
+    for start in range(0, len(indices), batch_size):
+        rows = indices[start:start + batch_size]
+        block = np.zeros((len(rows), hog.getDescriptorSize()), dtype=np.float32)
+        keep = np.zeros(len(rows), dtype=bool)
+        for j, i in enumerate(rows):
+            image = load_image(i)
+            if image is not None:
+                block[j] = compute_hog_features(image, hog)
+                keep[j] = True
+        yield block[keep], labels[rows][keep]
+
+
+class FeatureCache:
+    """
+    HOG features of sample images, keyed by file path and mtime.
+
+    On disk it is a single .npz of parallel 'paths', 'mtimes' and 'features'
+    (float32, one row per sample) arrays plus the HOG parameters they were
+    computed with; a file from other parameters is ignored. Entries whose
+    file changed are misses. save() keeps only the entries looked up or
+    added since loading, so samples deleted from disk drop out of the cache.
+    """
+
+    def __init__(self, path=FEATURE_CACHE_PATH):
+        self.path = path
+        self.entries = {}  # path -> (mtime, row of self.features)
+        self.features = np.zeros((0, feature_size()), dtype=np.float32)
+        self.new = {}  # path -> (mtime, features)
+        self.used = set()
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with np.load(self.path) as data:
+                if str(data['params']) != HOG_PARAMS:
+                    return
+                paths, mtimes, features = data['paths'], data['mtimes'], data['features']
+        except (OSError, ValueError, KeyError):
+            return
+        self.features = features
+        self.entries = {p: (float(m), i) for i, (p, m) in enumerate(zip(paths.tolist(), mtimes.tolist()))}
+
+    def get(self, path, mtime):
+        """Cached features for path if it hasn't changed since, else None."""
+        entry = self.entries.get(path)
+        if entry is None or entry[0] != mtime:
+            return None
+        self.used.add(path)
+        return self.features[entry[1]]
+
+    def put(self, path, mtime, features):
+        self.new[path] = (mtime, features)
+
+    def save(self):
+        """Rewrite the file atomically with the entries in use plus the new ones (if that changes anything)."""
+        if not self.new and self.used == self.entries.keys():
+            return
+        kept = sorted(self.used - self.new.keys())
+        paths = kept + sorted(self.new)
+        features = np.zeros((len(paths), self.features.shape[1]), dtype=np.float32)
+        mtimes = np.zeros(len(paths), dtype=np.float64)
+        for i, p in enumerate(paths):
+            if p in self.new:
+                mtimes[i], features[i] = self.new[p]
+            else:
+                mtimes[i], row = self.entries[p]
+                features[i] = self.features[row]
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, params=np.array(HOG_PARAMS), paths=np.array(paths, dtype=str),
+                         mtimes=mtimes, features=features)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self.new = {}
+        self._load()
+        self.used = set(paths)
+
+
+_hog = None
+_shards = {}  # shard images path -> memmap, per worker process
+
+
+def _init_worker():
+    global _hog
+    # One descriptor per worker process, and no OpenCV threads competing with the other workers
+    cv2.setNumThreads(1)
+    _hog = make_hog()
+
+
+def _featurise(paths):
+    """Features of a chunk of image paths as one float32 block, plus which of them could be read."""
+    block = np.zeros((len(paths), _hog.getDescriptorSize()), dtype=np.float32)
+    ok = np.zeros(len(paths), dtype=bool)
+    for i, path in enumerate(paths):
+        image = cv2.imread(path)
+        if image is not None:
+            block[i] = compute_hog_features(image, _hog)
+            ok[i] = True
+    return block, ok
+
+
+def _featurise_packed(items):
+    """Like _featurise, for (shard images .npy, row) items of src/sample_shards.py, memory-mapped in the worker."""
+    block = np.zeros((len(items), _hog.getDescriptorSize()), dtype=np.float32)
+    for i, (images_path, row) in enumerate(items):
+        if images_path not in _shards:
+            _shards[images_path] = np.load(images_path, mmap_mode='r')
+        block[i] = compute_hog_features(_shards[images_path][row], _hog)
+    return block, np.ones(len(items), dtype=bool)
+
+
+def _extract(keys, mtimes, tasks, featurise, workers, cache, chunk_size):
+    features = np.zeros((len(keys), feature_size()), dtype=np.float32)
+    ok = np.zeros(len(keys), dtype=bool)
+
+    missing = []
+    for i, (key, mtime) in enumerate(zip(keys, mtimes)):
+        cached = cache.get(key, mtime) if cache is not None else None
+        if cached is None:
+            missing.append(i)
+        else:
+            features[i] = cached
+            ok[i] = True
+
+    chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+    if chunks:
+        with ProcessPoolExecutor(max_workers=max(1, min(int(workers), len(chunks))), initializer=_init_worker) as pool:
+            blocks = pool.map(featurise, [[tasks[i] for i in rows] for rows in chunks])
+            for rows, (block, read) in zip(chunks, blocks):
+                features[rows] = block
+                ok[rows] = read
+        if cache is not None:
+            for i in missing:
+                if ok[i]:
+                    cache.put(keys[i], mtimes[i], features[i])
+    return features, ok, len(keys) - len(missing)
+
+
+def extract_features(paths, workers=TRAIN_WORKERS, cache=None, chunk_size=64):
+    """
+    HOG features for every image in paths, as a preallocated (N, D) float32
+    array, plus a boolean mask of the images that could be read (their rows
+    are zero otherwise). Rows found in cache (a FeatureCache, or None) are
+    copied in; the rest are read and featurised by a pool of `workers`
+    processes in chunks of chunk_size images and added to the cache; call
+    cache.save() once every extraction for a training run is done, since
+    saving drops the entries that haven't been looked up yet.
+    Returns (features, ok, cached), cached being the number of cache hits.
+    """
+    mtimes = [os.path.getmtime(p) for p in paths]
+    return _extract(paths, mtimes, paths, _featurise, workers, cache, chunk_size)
+
+
+def extract_shard_features(shards, workers=TRAIN_WORKERS, cache=None, chunk_size=256):
+    """
+    extract_features() for packed samples (a src.sample_shards.SampleShards).
+    Workers map the shard files themselves, so no pixels are copied between
+    processes. Cache entries are keyed by each sample's source JPEG path and
+    mtime, so they are shared with extract_features().
+    """
+    tasks = [(shards.image_paths[shard], row) for shard, images in enumerate(shards.images)
+             for row in range(len(images))]
+    return _extract(shards.sources, shards.mtimes, tasks, _featurise_packed, workers, cache, chunk_size)
@@ -0,0 +1,154 @@
+import time
+import numpy as np
+from src.config import DEFAULT_CONF, INFERENCE_BATCH_SIZE
+from src.resolution import current_imgsz, observe_imgsz
+from src.evidence import draw_boxes
+
+
+class Detections:
+    """
+    Boxes found in one frame, whatever produced them. boxes is an (N, 4)
+    float32 array of [x1, y1, x2, y2]; source is 'detector' for YOLO output,
+    'cache' for YOLO output replayed from src/detection_cache.py,
+    'tracker' for boxes carried forward by src/tracker.py, or 'svm' for the
+    HOG-SVM of src/svm_detector.py (whose scores are SVM margins).
+    """
+
+    def __init__(self, boxes, scores, class_ids=None, source='detector'):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        if class_ids is None:
+            class_ids = np.zeros(len(self.scores), dtype=np.int64)
+        self.class_ids = np.asarray(class_ids, dtype=np.int64).reshape(-1)
+        self.source = source
+
+    @classmethod
+    def from_result(cls, result):
+        """Copy the boxes out of an ultralytics Results object (which is not kept, nor is the frame it holds)."""
+        boxes = result.boxes
+        return cls(boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy())
+
+    def __len__(self):
+        return len(self.scores)
+
+    def best(self):
+        """(box, score) of the highest-scoring box."""
+        i = int(np.argmax(self.scores))
+        return self.boxes[i], float(self.scores[i])
+
+    def filter(self, conf, classes=None, source=None):
+        """The boxes scoring at least conf, of classes (None keeps all), as new Detections."""
+        keep = self.scores >= conf
+        if classes is not None:
+            keep &= np.isin(self.class_ids, classes)
+        return Detections(self.boxes[keep], self.scores[keep], self.class_ids[keep], source=source or self.source)
+
+    def plot(self, frame):
+        """Annotated copy of frame (src/evidence.py's draw_boxes, much cheaper than Results.plot())."""
+        return draw_boxes(frame.copy(), self.boxes, self.scores, self.source)
+
+    def to_dict(self, frame_number):
+        return {
+            "frame": frame_number,
+            "box_count": len(self),
+            "boxes": self.boxes.tolist(),
+            "scores": self.scores.tolist(),
+            "source": self.source
+        }
+
+
+def add_time(timings, stage, start):
+    """Add the seconds since start (a time.perf_counter() timestamp) to timings[stage], if timings is given."""
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def square_roi(frame, box, min_side, scale):
+    """
+    (x0, y0, x1, y1) square crop of frame centred on box, at least min_side
+    px or scale times the box's longer side, or None if it would cover most
+    of the frame.
+    """
+    h, w = frame.shape[:2]
+    x1, y1, x2, y2 = [float(v) for v in box]
+    side = max(min_side, scale * max(x2 - x1, y2 - y1))
+    # Multiples of 32 so the crop can be fed to YOLO at its own size without letterboxing
+    side = int(np.ceil(side / 32) * 32)
+    if side * side >= 0.5 * w * h or side > min(w, h):
+        return None
+    cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+    x0 = int(min(max(0, cx - side / 2), w - side))
+    y0 = int(min(max(0, cy - side / 2), h - side))
+    return x0, y0, x0 + side, y0 + side
+
+
+def predict_batch(model, frames, conf=DEFAULT_CONF, classes=None, imgsz=None):
+    """Run YOLO on a list of frames in one forward pass. Returns one Results per frame."""
+    if not frames:
+        return []
+    if imgsz is not None:
+        return model(frames, conf=conf, verbose=False, classes=classes, imgsz=imgsz)
+    return model(frames, conf=conf, verbose=False, classes=classes)
+
+
+def iter_batched_predictions(model, numbered_frames, batch_size=INFERENCE_BATCH_SIZE,
+                             conf=DEFAULT_CONF, classes=None, timings=None, imgsz=None, store=None):
+    """
+    Collect (frame_number, frame) pairs into batches of batch_size and run them
+    through the model together. Yields (frame_number, frame, Detections) in the
+    original order, so callers can stop early exactly as with per-frame inference.
+
+    If a timings dict is given (e.g. FramePipeline.timings), the time spent in
+    the model is added to timings['inference']. imgsz is an inference size,
+    an AutoImgsz (see src/resolution.py) or None for the model's default.
+
+    With a FrameDetectionStore (src/detection_cache.py) or a StoreSession of one, frames it already
+    holds at the current size are answered by filtering its raw boxes
+    (source='cache') and only the rest go to the model, at the store's floor
+    confidence and without a class filter so their raw output can be stored.
+    A conf below the floor can't be served that way and ignores the store.
+    """
+    batch_size = max(1, int(batch_size))
+    if store is not None and conf < store.floor:
+        store = None
+    batch = []
+    for item in numbered_frames:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield from _run_batch(model, batch, conf, classes, timings, imgsz, store)
+            batch = []
+
+    if batch:
+        yield from _run_batch(model, batch, conf, classes, timings, imgsz, store)
+
+
+def _run_batch(model, batch, conf, classes, timings, imgsz, store=None):
+    if store is not None:
+        yield from _run_stored_batch(model, batch, conf, classes, timings, imgsz, store)
+        return
+    size = current_imgsz(imgsz)
+    start = time.perf_counter()
+    results = predict_batch(model, [frame for _, frame in batch], conf=conf, classes=classes, imgsz=size)
+    add_time(timings, 'inference', start)
+    found = [Detections.from_result(result) for result in results]
+    # The whole batch ran at size; the next size is only known once all of it was seen
+    observe_imgsz(imgsz, size, [(frame, f) for (_, frame), f in zip(batch, found)])
+    for (frame_number, frame), f in zip(batch, found):
+        yield frame_number, frame, f
+
+
+def _run_stored_batch(model, batch, conf, classes, timings, imgsz, store):
+    size = current_imgsz(imgsz)
+    raw = [store.get(frame_number, size) for frame_number, _ in batch]
+    missing = [i for i, found in enumerate(raw) if found is None]
+    if missing:
+        start = time.perf_counter()
+        results = predict_batch(model, [batch[i][1] for i in missing], conf=store.floor, imgsz=size)
+        add_time(timings, 'inference', start)
+        for i, result in zip(missing, results):
+            raw[i] = Detections.from_result(result)
+            store.put(batch[i][0], size, raw[i])
+    found = [r.filter(conf, classes) for r in raw]
+    observe_imgsz(imgsz, size, [(frame, f) for (_, frame), f in zip(batch, found)])
+    for (frame_number, frame), f in zip(batch, found):
+        yield frame_number, frame, f
@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+import hashlib
+import tempfile
+
+from src.config import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def upload_tmp_dir():
+    """Directory for upload copies: tmpfs (/dev/shm) when available so the copy never touches disk."""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+class IngestedVideo:
+    """
+    An uploaded video ready to be opened with cv2.VideoCapture(path).
+    Use as a context manager; a private copy (if one was made) is removed on exit.
+    """
+
+    def __init__(self, path, size, method, ingest_seconds, owned, digest=None):
+        self.path = path
+        self.size = size
+        self.method = method
+        self.ingest_seconds = ingest_seconds
+        self.owned = owned
+        self.digest = digest  # sha256 hex of the upload's bytes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self.owned and os.path.exists(self.path):
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def stats(self):
+        return {
+            "upload_bytes": self.size,
+            "ingest_method": self.method,
+            "ingest_ms": round(1000 * self.ingest_seconds, 3),
+        }
+
+
+def _stream_size(f):
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(0)
+    return size
+
+
+def _spooled_path(f):
+    """
+    Path under /proc/self/fd for an upload's spool file, so OpenCV can decode
+    it in place. fileno() rolls a SpooledTemporaryFile over to its own temp
+    file if it is still in memory. Returns None where /proc is not available.
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        fd = f.fileno()
+        f.flush()
+    except (AttributeError, OSError, ValueError):
+        return None
+    path = f"/proc/self/fd/{fd}"
+    return path if os.path.exists(path) else None
+
+
+def _hash_stream(f, chunk_size):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: f.read(chunk_size), b''):
+        digest.update(chunk)
+    f.seek(0)
+    return digest.hexdigest()
+
+
+def hash_file(path, chunk_size=UPLOAD_CHUNK_SIZE):
+    """sha256 hex of a file on disk, the same digest ingest_upload() gives its upload."""
+    with open(path, 'rb') as f:
+        return _hash_stream(f, chunk_size)
+
+
+def ingest_upload(upload, max_bytes=MAX_UPLOAD_BYTES, chunk_size=UPLOAD_CHUNK_SIZE, persist=False):
+    """
+    Make a FastAPI UploadFile decodable without copying it into the working directory.
+
+    On Linux the upload's own spool file is decoded in place. Elsewhere, or
+    when persist=True (the video must outlive the request, e.g. background
+    jobs), it is copied in chunk_size pieces to a uniquely named file in
+    upload_tmp_dir(), so concurrent requests with the same filename never
+    collide. Either way the bytes are hashed as they stream past (sha256,
+    for the result cache). Raises UploadTooLarge when the upload exceeds
+    max_bytes (0 disables the limit).
+    """
+    start = time.perf_counter()
+    f = upload.file
+    size = getattr(upload, 'size', None)
+    if size is None:
+        size = _stream_size(f)
+    if max_bytes and size > max_bytes:
+        raise UploadTooLarge(f"Upload is {size} bytes; the limit is {max_bytes} bytes.")
+
+    f.seek(0)
+    path = None if persist else _spooled_path(f)
+    if path:
+        digest = _hash_stream(f, chunk_size)
+        return IngestedVideo(path, size, 'spooled', time.perf_counter() - start, owned=False, digest=digest)
+
+    suffix = os.path.splitext(upload.filename or '')[1] or '.mp4'
+    fd, path = tempfile.mkstemp(prefix='upload_', suffix=suffix, dir=upload_tmp_dir())
+    written = 0
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if max_bytes and written > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds the limit of {max_bytes} bytes.")
+                out.write(chunk)
+                digest.update(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return IngestedVideo(path, written, 'tempfile', time.perf_counter() - start, owned=True,
+                         digest=digest.hexdigest())
@@ -0,0 +1,151 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.config import JOB_WORKERS, JOB_QUEUE_DEPTH, JOB_HISTORY
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Cancelled(Exception):
+    """Raised by a job function that was cancelled before it got going."""
+
+
+class Job:
+    """
+    State of one analysis job. progress is the fraction of the video read so
+    far (0.0 - 1.0). A cancelled job keeps whatever partial result its
+    function returned.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.future = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """Ask the job to stop; False if it had already finished."""
+        if self.status in ('done', 'failed', 'cancelled'):
+            return False
+        self._cancel.set()
+        return True
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def set_progress(self, done, total):
+        if total:
+            self.progress = min(1.0, done / total)
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+        }
+        if self.started_at is not None:
+            data["queue_seconds"] = round(self.started_at - self.created_at, 3)
+        if self.finished_at is not None:
+            data["run_seconds"] = round(self.finished_at - self.started_at, 3)
+        if self.status in ('done', 'cancelled') and self.result is not None:
+            data["result"] = self.result
+        elif self.status == 'failed':
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    """
+    Bounded worker pool for blocking video analysis.
+
+    At most max_workers jobs run at once and at most max_queue more wait for a
+    worker; submit() raises QueueFull beyond that so the API can answer 429
+    instead of queueing without limit. Threads are enough here because OpenCV
+    decoding and torch inference both release the GIL.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, max_queue=JOB_QUEUE_DEPTH, history=JOB_HISTORY):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.history = history
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='analysis')
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.rejected = 0
+
+    def _active(self):
+        return sum(1 for job in self.jobs.values() if job.status in ('queued', 'running'))
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, progress=job.set_progress, should_stop=job.cancelled, **kwargs)
+        on a worker. fn should poll should_stop and wrap up early once it
+        returns True (or raise Cancelled if it has nothing to show yet).
+        Returns the Job; job.future resolves to fn's return value.
+        """
+        with self.lock:
+            if self._active() >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise QueueFull(f"All {self.max_workers} workers are busy and {self.max_queue} jobs are queued.")
+            job = Job()
+            self.jobs[job.id] = job
+            self._evict_finished()
+            job.future = self.executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = fn(*args, progress=job.set_progress, should_stop=job.cancelled, **kwargs)
+            if job.cancelled():
+                job.status = 'cancelled'
+            else:
+                job.progress = 1.0
+                job.status = 'done'
+            return job.result
+        except Cancelled:
+            job.status = 'cancelled'
+            raise
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+            raise
+        finally:
+            job.finished_at = time.time()
+
+    def _evict_finished(self):
+        # Keep the most recent `history` jobs; never drop queued or running ones
+        excess = len(self.jobs) - self.history
+        for job_id in list(self.jobs):
+            if excess <= 0:
+                break
+            if self.jobs[job_id].status in ('done', 'failed', 'cancelled'):
+                del self.jobs[job_id]
+                excess -= 1
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def stats(self):
+        with self.lock:
+            statuses = [job.status for job in self.jobs.values()]
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": statuses.count('running'),
+            "queued": statuses.count('queued'),
+            "cancelled": statuses.count('cancelled'),
+            "rejected": self.rejected,
+        }
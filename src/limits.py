@@ -0,0 +1,11 @@
+import time
+
+
+def over_limit(start, frames, max_seconds=0, max_frames=0):
+    """
+    True once an analysis that began at time.perf_counter() start has
+    analysed max_frames frames or run for max_seconds (0 disables either cap).
+    """
+    if max_frames and frames >= max_frames:
+        return True
+    return bool(max_seconds) and time.perf_counter() - start >= max_seconds
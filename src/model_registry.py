@@ -0,0 +1,134 @@
+import os
+import time
+import threading
+import numpy as np
+
+from src.config import (DEFAULT_CONF, INFERENCE_BATCH_SIZE, YOLO_MODEL_PATH, INFERENCE_BACKEND,
+                        MODEL_WARMUP_RUNS, MODEL_WARMUP_SIZE, INFERENCE_IMGSZ, IMGSZ_CHOICES)
+from src.resolution import parse_imgsz
+from src.detector import load_detector, backend_weights, weights_version
+from src.inference import predict_batch
+
+
+def ball_classes(model):
+    """Class ids whose name contains 'ball', or None to keep every class."""
+    ball_ids = [k for k, v in model.names.items() if 'ball' in v.lower()]
+    return ball_ids or None
+
+
+class LoadedModel:
+    """A YOLO model plus what every front-end derives from it, and how long it took to get ready."""
+
+    def __init__(self, path, backend=INFERENCE_BACKEND, warmup_runs=MODEL_WARMUP_RUNS, warmup_size=MODEL_WARMUP_SIZE):
+        self.path = path
+        self.backend = backend
+        start = time.perf_counter()
+        self.model = load_detector(path, backend)
+        self.load_seconds = time.perf_counter() - start
+        self.classes = ball_classes(self.model)
+        self.version = weights_version(path, backend)
+        self.warmup_runs = 0
+        self.warmup_seconds = 0.0
+        self.warmup(warmup_runs, warmup_size)
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def warmup(self, runs=MODEL_WARMUP_RUNS, size=MODEL_WARMUP_SIZE):
+        """Run blank frames of the working size through the model at the batch sizes analysis uses."""
+        width, height = size
+        # 'auto' starts at the largest size, so that is the one to warm up
+        imgsz = parse_imgsz(INFERENCE_IMGSZ)
+        imgsz = max(IMGSZ_CHOICES) if imgsz == 'auto' else imgsz
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        start = time.perf_counter()
+        for _ in range(max(0, runs)):
+            for batch_size in sorted({1, INFERENCE_BATCH_SIZE}):
+                predict_batch(self.model, [frame] * batch_size, conf=DEFAULT_CONF, classes=self.classes,
+                              imgsz=imgsz)
+            self.warmup_runs += 1
+        self.warmup_seconds += time.perf_counter() - start
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "backend": self.backend,
+            "weights": backend_weights(self.path, self.backend),
+            "version": self.version,
+            "classes": self.classes,
+            "load_seconds": round(self.load_seconds, 3),
+            "warmup_runs": self.warmup_runs,
+            "warmup_seconds": round(self.warmup_seconds, 3),
+        }
+
+
+_lock = threading.Lock()
+_models = {}  # (path, backend) -> LoadedModel, shared by everything in the process
+_worker_models = []  # every per-thread LoadedModel, for registry_stats()
+_spares = {}  # (path, backend) -> preloaded LoadedModels not yet claimed by a thread
+_thread_state = threading.local()
+
+
+def get_model(path=YOLO_MODEL_PATH, backend=INFERENCE_BACKEND, warmup_runs=MODEL_WARMUP_RUNS):
+    """
+    The process-wide LoadedModel for path on backend (see src/detector.py),
+    loading and warming it up on first use. Returns None if the weights for
+    that backend don't exist.
+    """
+    key = (os.path.abspath(path), backend)
+    with _lock:
+        if key not in _models:
+            weights = backend_weights(key[0], backend)
+            if not os.path.exists(weights):
+                return None
+            print(f"Loading {backend} model from: {weights}")
+            _models[key] = LoadedModel(key[0], backend, warmup_runs=warmup_runs)
+            if _models[key].classes:
+                print(f"Filtering for ball classes: {_models[key].classes}")
+        return _models[key]
+
+
+def thread_model(path=YOLO_MODEL_PATH, backend=INFERENCE_BACKEND):
+    """
+    A LoadedModel owned by the calling thread. Ultralytics predictors keep
+    per-call state and are not thread-safe, so concurrent workers each need
+    their own instance; it is loaded and warmed up once per thread.
+    """
+    key = (os.path.abspath(path), backend)
+    models = getattr(_thread_state, 'models', None)
+    if models is None:
+        models = _thread_state.models = {}
+    if key not in models:
+        with _lock:
+            spare = _spares.get(key, [])
+            loaded = spare.pop() if spare else None
+        models[key] = loaded or LoadedModel(key[0], backend)
+        with _lock:
+            _worker_models.append(models[key])
+    return models[key]
+
+
+def preload_thread_models(path=YOLO_MODEL_PATH, backend=INFERENCE_BACKEND, count=1):
+    """
+    Load and warm up count instances for thread_model() to hand out, so
+    worker threads don't pay for loading on their first job. Returns them,
+    or [] if the weights for that backend don't exist.
+    """
+    key = (os.path.abspath(path), backend)
+    if not os.path.exists(backend_weights(key[0], backend)):
+        return []
+    loaded = [LoadedModel(key[0], backend) for _ in range(max(0, count))]
+    with _lock:
+        _spares.setdefault(key, []).extend(loaded)
+    return loaded
+
+
+def registry_stats():
+    """Load and warm-up timings of every model in the process, for /health."""
+    with _lock:
+        return {
+            "models": [m.stats() for m in _models.values()],
+            "worker_models": [m.stats() for m in _worker_models],
+            "spare_models": sum(len(spare) for spare in _spares.values()),
+        }
@@ -0,0 +1,145 @@
+import time
+import cv2
+import numpy as np
+
+from src.config import (DEFAULT_CONF, MOTION_DIFF_WIDTH, MOTION_PIXEL_THRESHOLD, MOTION_MIN_PIXELS,
+                        MOTION_MAX_SKIP, MOTION_ROI_SIZE, MOTION_ROI_SCALE)
+from src.inference import Detections, predict_batch, add_time, square_roi
+from src.resolution import current_imgsz, observe_imgsz
+
+
+class MotionGate:
+    """
+    Cheap pre-stage that decides how much of each frame YOLO needs to see.
+
+    Each frame is shrunk to MOTION_DIFF_WIDTH px, blurred and differenced
+    against the last frame that went through YOLO. If (almost) nothing moved,
+    the previous result still holds and the frame is skipped. Otherwise, when
+    the ball position is known, only a square region around it is cropped
+    for inference. Skipped frames and pixels are counted for stats().
+    """
+
+    def __init__(self, min_pixels=MOTION_MIN_PIXELS, pixel_threshold=MOTION_PIXEL_THRESHOLD,
+                 max_skip=MOTION_MAX_SKIP, roi_size=MOTION_ROI_SIZE, roi_scale=MOTION_ROI_SCALE):
+        self.min_pixels = min_pixels
+        self.pixel_threshold = pixel_threshold
+        self.max_skip = max_skip
+        self.roi_size = roi_size
+        self.roi_scale = roi_scale
+        self.reference = None
+        self.skipped_in_row = 0
+
+        self.frames_seen = 0
+        self.frames_skipped = 0
+        self.roi_frames = 0
+        self.roi_misses = 0
+        self.pixels_total = 0
+        self.pixels_inferred = 0
+
+    def _small_gray(self, frame):
+        h, w = frame.shape[:2]
+        scale = MOTION_DIFF_WIDTH / w if w > MOTION_DIFF_WIDTH else 1.0
+        small = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        # Blur so compression noise does not register as motion
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def is_static(self, frame, box=None):
+        """
+        True if frame barely differs from the last frame YOLO saw (counts
+        towards stats). With the ball box known, any change around it also
+        counts as motion, since a small ball moving is a tiny share of the frame.
+        """
+        self.frames_seen += 1
+        self.pixels_total += frame.shape[0] * frame.shape[1]
+        gray = self._small_gray(frame)
+
+        if self.reference is not None and self.skipped_in_row < self.max_skip:
+            moving = cv2.absdiff(gray, self.reference) > self.pixel_threshold
+            near_ball = False
+            if box is not None:
+                scale = gray.shape[1] / frame.shape[1]
+                x1, y1, x2, y2 = [float(v) for v in box]
+                pad = max(x2 - x1, y2 - y1)
+                x0, y0 = max(0, int((x1 - pad) * scale)), max(0, int((y1 - pad) * scale))
+                near_ball = moving[y0:int((y2 + pad) * scale) + 1, x0:int((x2 + pad) * scale) + 1].any()
+            if not near_ball and np.count_nonzero(moving) < self.min_pixels:
+                self.skipped_in_row += 1
+                self.frames_skipped += 1
+                return True
+
+        self.reference = gray
+        self.skipped_in_row = 0
+        return False
+
+    def roi(self, frame, box):
+        """(x0, y0, x1, y1) square crop centred on box, or None if it would cover most of the frame."""
+        return square_roi(frame, box, self.roi_size, self.roi_scale)
+
+    def inferred(self, pixels, roi=False, missed=False):
+        self.pixels_inferred += pixels
+        self.roi_frames += roi
+        self.roi_misses += missed
+
+    def stats(self):
+        skipped_pixels = self.pixels_total - self.pixels_inferred
+        return {
+            "frames_seen": self.frames_seen,
+            "frames_skipped": self.frames_skipped,
+            "roi_frames": self.roi_frames,
+            "roi_misses": self.roi_misses,
+            "pixels_skipped": skipped_pixels,
+            "pixels_skipped_fraction": round(skipped_pixels / self.pixels_total, 3) if self.pixels_total else 0.0,
+        }
+
+
+def iter_gated_predictions(model, numbered_frames, conf=DEFAULT_CONF, classes=None, timings=None, gate=None,
+                           imgsz=None):
+    """
+    Like iter_batched_predictions, but every frame first goes through a
+    MotionGate. Static frames repeat the previous result with source='motion'
+    and cost no model call. Moving frames are searched in a crop around the
+    last ball position, and boxes are mapped back to full-frame coordinates.
+    If the crop finds nothing, the full frame is run as well, so the ball is
+    never lost just because it left the crop. imgsz applies to full-frame
+    passes; crops always run at their own size.
+
+    Yields (frame_number, frame, Detections).
+    """
+    gate = gate or MotionGate()
+    previous = None
+
+    for frame_number, frame in numbered_frames:
+        ball = previous.best()[0] if previous is not None and len(previous) > 0 else None
+        start = time.perf_counter()
+        static = gate.is_static(frame, ball)
+        add_time(timings, 'motion', start)
+
+        if static and previous is not None:
+            yield frame_number, frame, Detections(previous.boxes, previous.scores, previous.class_ids, source='motion')
+            continue
+
+        found = None
+        h, w = frame.shape[:2]
+        region = gate.roi(frame, ball) if ball is not None else None
+        if region is not None:
+            x0, y0, x1, y1 = region
+            start = time.perf_counter()
+            result = predict_batch(model, [frame[y0:y1, x0:x1]], conf=conf, classes=classes, imgsz=x1 - x0)[0]
+            add_time(timings, 'inference', start)
+            crop = Detections.from_result(result)
+            gate.inferred((x1 - x0) * (y1 - y0), roi=True, missed=len(crop) == 0)
+            if len(crop) > 0:
+                found = Detections(crop.boxes + np.array([x0, y0, x0, y0], np.float32), crop.scores, crop.class_ids)
+
+        if found is None:
+            start = time.perf_counter()
+            size = current_imgsz(imgsz)
+            result = predict_batch(model, [frame], conf=conf, classes=classes, imgsz=size)[0]
+            add_time(timings, 'inference', start)
+            found = Detections.from_result(result)
+            observe_imgsz(imgsz, size, [(frame, found)])
+            gate.inferred(h * w)
+
+        previous = found
+        yield frame_number, frame, found
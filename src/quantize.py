@@ -0,0 +1,102 @@
+import os
+import cv2
+import numpy as np
+import onnx
+from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic,
+                                      quantize_static)
+
+from src.config import DATASET_DIR, EXPORT_IMGSZ, QUANT_CALIBRATION_FRAMES
+from src.frame_pipeline import read_frames
+
+QUANT_MODES = ('static', 'dynamic')
+
+
+def letterbox(frame, imgsz=EXPORT_IMGSZ):
+    """Resize keeping aspect ratio and pad to imgsz x imgsz, the way ultralytics preprocesses. Returns NCHW float32 RGB."""
+    h, w = frame.shape[:2]
+    scale = imgsz / max(h, w)
+    resized = cv2.resize(frame, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_LINEAR)
+    top = (imgsz - resized.shape[0]) // 2
+    left = (imgsz - resized.shape[1]) // 2
+    padded = cv2.copyMakeBorder(resized, top, imgsz - resized.shape[0] - top, left, imgsz - resized.shape[1] - left,
+                                cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return np.ascontiguousarray(padded[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def calibration_frames(video_dir=DATASET_DIR, count=QUANT_CALIBRATION_FRAMES):
+    """Up to count frames sampled evenly across every .mp4 in video_dir."""
+    videos = sorted(os.path.join(video_dir, f) for f in os.listdir(video_dir) if f.endswith('.mp4')) \
+        if os.path.isdir(video_dir) else []
+    frames = []
+    for i, video in enumerate(videos):
+        wanted = (count - len(frames)) // (len(videos) - i)
+        cap = cv2.VideoCapture(video)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if wanted > 0 and total > 0:
+            numbers = sorted({int(n) for n in np.linspace(1, total, wanted)})
+            frames.extend(frame for _, frame in read_frames(cap, numbers))
+        cap.release()
+    return frames
+
+
+class FrameCalibrationReader(CalibrationDataReader):
+    """Feeds letterboxed video frames to the ONNX Runtime static quantization calibrator."""
+
+    def __init__(self, frames, input_name, imgsz=EXPORT_IMGSZ):
+        self.frames = iter(frames)
+        self.input_name = input_name
+        self.imgsz = imgsz
+
+    def get_next(self):
+        frame = next(self.frames, None)
+        return None if frame is None else {self.input_name: letterbox(frame, self.imgsz)}
+
+
+def decode_nodes(model):
+    """
+    Nodes between the detection head's last convolutions and the output. YOLO
+    concatenates pixel box coordinates and 0-1 class scores into one output
+    tensor, so quantizing this decode step with a single scale would wipe out
+    the scores; it stays in float. Shape branches are not followed, so the
+    backbone feeding them stays quantized.
+    """
+    producer = {output: node for node in model.graph.node for output in node.output}
+    excluded = set()
+    pending = [output.name for output in model.graph.output]
+    while pending:
+        node = producer.get(pending.pop())
+        if node is None or node.name in excluded or node.op_type == 'Conv':
+            continue
+        excluded.add(node.name)
+        if node.op_type != 'Shape':
+            pending.extend(node.input)
+    return sorted(excluded)
+
+
+def quantize(onnx_path, output_path, mode='static', video_dir=DATASET_DIR, calibration_count=QUANT_CALIBRATION_FRAMES,
+             imgsz=EXPORT_IMGSZ):
+    """
+    Write an INT8 copy of the FP32 ONNX model at onnx_path to output_path.
+
+    'dynamic' quantizes weights only and needs no data. 'static' also fixes
+    activation ranges from frames of the Dataset/ videos. It uses uint8
+    activations and int8 per-channel weights in QDQ form, which ONNX Runtime
+    fuses into integer convolutions on x86.
+    """
+    if mode not in QUANT_MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}'. Choose one of: {', '.join(QUANT_MODES)}.")
+    model = onnx.load(onnx_path)
+    excluded = decode_nodes(model)
+
+    if mode == 'dynamic':
+        quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QInt8, nodes_to_exclude=excluded)
+        return output_path
+
+    frames = calibration_frames(video_dir, calibration_count)
+    if not frames:
+        raise FileNotFoundError(f"No calibration frames found in {video_dir}; static quantization needs .mp4 videos there.")
+    print(f"Calibrating on {len(frames)} frames from {video_dir}")
+    reader = FrameCalibrationReader(frames, model.graph.input[0].name, imgsz)
+    quantize_static(onnx_path, output_path, reader, quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, nodes_to_exclude=excluded)
+    return output_path
@@ -0,0 +1,90 @@
+from collections import Counter, deque
+
+from src.config import IMGSZ_CHOICES, AUTO_MIN_BALL_PX, AUTO_IMGSZ_PATIENCE
+
+STRIDE = 32  # YOLO input sides must be multiples of the largest feature-map stride
+
+
+def parse_imgsz(value):
+    """'auto' or an inference size in px (rounded up to a multiple of 32); raises ValueError otherwise."""
+    if isinstance(value, str) and value.strip().lower() == 'auto':
+        return 'auto'
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid imgsz '{value}'. Use 'auto' or a size in pixels, e.g. 640.")
+    if size < STRIDE:
+        raise ValueError(f"imgsz must be at least {STRIDE}.")
+    return -(-size // STRIDE) * STRIDE
+
+
+class AutoImgsz:
+    """
+    Resolution-adaptive inference size. The ball box seen at one size tells
+    how big the ball is in the source frame, so the next frames can use the
+    smallest of sizes at which it still spans min_ball_px pixels. The smallest
+    box among the last few detections is used, and after patience analysed
+    frames without the ball the largest size comes back so a smaller or
+    distant ball is not missed.
+    """
+
+    def __init__(self, sizes=IMGSZ_CHOICES, min_ball_px=AUTO_MIN_BALL_PX, patience=AUTO_IMGSZ_PATIENCE):
+        self.sizes = sorted(sizes)
+        self.min_ball_px = min_ball_px
+        self.patience = patience
+        self.size = self.sizes[-1]
+        self.recent = deque(maxlen=8)  # ball long side as a fraction of the frame's long side
+        self.misses = 0
+        self.frames_by_size = Counter()
+
+    def observe(self, size, results):
+        """
+        Record frames analysed at size, given as [(frame, Detections)] for one
+        model call (a whole batch), then pick the size for the next call.
+        """
+        self.frames_by_size[size] += len(results)
+        for frame, detections in results:
+            self._resize(frame, detections)
+
+    def _resize(self, frame, detections):
+        if len(detections) == 0:
+            self.misses += 1
+            if self.misses >= self.patience:
+                self.size = self.sizes[-1]
+                self.recent.clear()
+            return
+
+        self.misses = 0
+        box, _ = detections.best()
+        self.recent.append(max(box[2] - box[0], box[3] - box[1]) / max(frame.shape[:2]))
+        ball = min(self.recent)
+        self.size = next((s for s in self.sizes if ball * s >= self.min_ball_px), self.sizes[-1])
+
+    def stats(self):
+        return {
+            "mode": 'auto',
+            "current": self.size,
+            "frames_by_size": {str(size): count for size, count in sorted(self.frames_by_size.items())},
+        }
+
+
+def make_imgsz(value):
+    """What the inference loops take as imgsz: None (model default), a size, or a fresh AutoImgsz for 'auto'."""
+    if value is None:
+        return None
+    value = parse_imgsz(value)
+    return AutoImgsz() if value == 'auto' else value
+
+
+def current_imgsz(imgsz):
+    return imgsz.size if isinstance(imgsz, AutoImgsz) else imgsz
+
+
+def observe_imgsz(imgsz, size, results):
+    """results is [(frame, Detections)] for the frames one model call ran at size."""
+    if isinstance(imgsz, AutoImgsz):
+        imgsz.observe(size, results)
+
+
+def imgsz_stats(imgsz):
+    return imgsz.stats() if isinstance(imgsz, AutoImgsz) else {"mode": 'fixed', "current": imgsz}
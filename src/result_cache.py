@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+from src.config import RESULT_CACHE_DIR, RESULT_CACHE_MAX_MB
+
+
+def cache_key(content_hash, model_version, conf, options):
+    """
+    Key for one analysis: the upload's sha256, the weights version and every
+    parameter that changes the result (conf plus the sampling/mode options).
+    """
+    payload = json.dumps({"video": content_hash, "model": model_version, "conf": conf, "options": options},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Size-bounded on-disk LRU of analysis results.
+
+    Each entry is <key>.json (the response without its image) plus
+    <key>.jpg (the evidence frame, if any). Recency is the .json file's
+    mtime, touched on every hit, so the order survives restarts; the index
+    is rebuilt from a directory scan on start-up. When the total size goes
+    over max_bytes the least recently used entries are deleted. max_bytes=0
+    disables the cache.
+    """
+
+    def __init__(self, directory=RESULT_CACHE_DIR, max_bytes=int(RESULT_CACHE_MAX_MB * 1024 * 1024)):
+        self.directory = directory
+        self.max_bytes = max(0, int(max_bytes))
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> [last_used, bytes]
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+            self._scan()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + '.json', base + '.jpg'
+
+    def _scan(self):
+        for name in os.listdir(self.directory):
+            key, ext = os.path.splitext(name)
+            if ext != '.json':
+                continue
+            json_path, jpg_path = self._paths(key)
+            size = os.path.getsize(json_path) + (os.path.getsize(jpg_path) if os.path.exists(jpg_path) else 0)
+            self._entries[key] = [os.path.getmtime(json_path), size]
+
+    def get(self, key):
+        """(response dict, jpeg bytes or None) for key, or None on a miss."""
+        if not self.enabled:
+            return None
+        json_path, jpg_path = self._paths(key)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    response = json.load(f)
+                image = None
+                if os.path.exists(jpg_path):
+                    with open(jpg_path, 'rb') as f:
+                        image = f.read()
+                os.utime(json_path)
+            except (OSError, ValueError):
+                # Deleted or half-written behind our back; treat as a miss
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries[key][0] = time.time()
+            self.hits += 1
+            return response, image
+
+    def put(self, key, response, image=None):
+        """
+        Store response (JSON-serialisable) and optional jpeg bytes under key,
+        then evict down to max_bytes. image may also be a callable returning
+        the bytes, so encoding is skipped when the cache is disabled.
+        """
+        if not self.enabled:
+            return
+        if callable(image):
+            image = image()
+        data = json.dumps(response).encode('utf-8')
+        size = len(data) + (len(image) if image is not None else 0)
+        if size > self.max_bytes:
+            return
+        json_path, jpg_path = self._paths(key)
+        with self._lock:
+            # The image goes first and the .json is renamed into place last, so a
+            # reader never sees an entry whose image is still being written
+            if image is not None:
+                _atomic_write(jpg_path, image)
+            elif os.path.exists(jpg_path):
+                os.remove(jpg_path)
+            _atomic_write(json_path, data)
+            self._entries[key] = [time.time(), size]
+            self.stores += 1
+            self._evict()
+
+    def _evict(self):
+        total = sum(size for _, size in self._entries.values())
+        for key in sorted(self._entries, key=lambda k: self._entries[k][0]):
+            if total <= self.max_bytes:
+                break
+            total -= self._entries[key][1]
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": sum(size for _, size in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+
+def _atomic_write(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
@@ -0,0 +1,189 @@
+import os
+import re
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from src.config import PROCESSED_DATA_DIR, SAMPLE_SHARD_DIR, SAMPLE_SHARD_SIZE, SAMPLE_SIZE, TRAIN_WORKERS
+
+_SHARD_NAME = re.compile(r'^shard-(\d{5})\.meta\.json$')
+
+
+def shard_paths(shard_dir, index):
+    """(images .npy, labels .npy, metadata .json) of shard number index."""
+    base = os.path.join(shard_dir, f"shard-{index:05d}")
+    return base + '.images.npy', base + '.labels.npy', base + '.meta.json'
+
+
+def shard_indices(shard_dir=SAMPLE_SHARD_DIR):
+    """Numbers of the complete shards in shard_dir (those whose metadata has been written), ascending."""
+    if not os.path.isdir(shard_dir):
+        return []
+    return sorted(int(m.group(1)) for m in map(_SHARD_NAME.match, os.listdir(shard_dir)) if m)
+
+
+def list_samples(processed_dir=PROCESSED_DATA_DIR):
+    """Paths of the collected .jpg samples and their labels (1 for Ball, 0 for Background)."""
+    paths = []
+    labels = []
+    for label, folder in ((1, 'positive'), (0, 'negative')):
+        sample_dir = os.path.join(processed_dir, folder)
+        if not os.path.isdir(sample_dir):
+            continue
+        names = sorted(f for f in os.listdir(sample_dir) if f.endswith(".jpg"))
+        paths.extend(os.path.join(sample_dir, f) for f in names)
+        labels.extend([label] * len(names))
+    return paths, np.array(labels, dtype=np.int64)
+
+
+def unpacked_samples(shards, processed_dir=PROCESSED_DATA_DIR):
+    """list_samples() minus the samples already in shards (a SampleShards, or None for none packed)."""
+    paths, labels = list_samples(processed_dir)
+    if shards is None:
+        return paths, labels
+    packed = set(shards.sources)
+    rows = [i for i, p in enumerate(paths) if p not in packed]
+    return [paths[i] for i in rows], labels[np.array(rows, dtype=np.int64)]
+
+
+def _read_sample(path):
+    image = cv2.imread(path)
+    if image is not None and image.shape[1::-1] != SAMPLE_SIZE:
+        image = cv2.resize(image, SAMPLE_SIZE)
+    return image
+
+
+def _atomic_save(path, array):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _write_shard(shard_dir, index, paths, labels, workers):
+    """Decode paths into one shard. Unreadable images are left out. Returns the number of samples written."""
+    images = np.zeros((len(paths), SAMPLE_SIZE[1], SAMPLE_SIZE[0], 3), dtype=np.uint8)
+    keep = np.zeros(len(paths), dtype=bool)
+    # cv2.imread releases the GIL, so threads are enough to overlap the decodes
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as pool:
+        for i, image in enumerate(pool.map(_read_sample, paths)):
+            if image is not None:
+                images[i] = image
+                keep[i] = True
+    if not keep.all():
+        images, labels = images[keep], labels[keep]
+        paths = [p for p, k in zip(paths, keep) if k]
+    if not len(paths):
+        return 0
+
+    images_path, labels_path, meta_path = shard_paths(shard_dir, index)
+    _atomic_save(images_path, images)
+    _atomic_save(labels_path, labels.astype(np.uint8))
+    meta = {"count": len(paths), "size": list(SAMPLE_SIZE), "sources": paths,
+            "mtimes": [os.path.getmtime(p) for p in paths]}
+    # The metadata goes last: a shard without it is incomplete and ignored
+    fd, tmp = tempfile.mkstemp(dir=shard_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+    return len(paths)
+
+
+def pack_samples(processed_dir=PROCESSED_DATA_DIR, shard_dir=SAMPLE_SHARD_DIR, append=True,
+                 shard_size=SAMPLE_SHARD_SIZE, workers=TRAIN_WORKERS):
+    """
+    Pack the positive/negative JPEG samples under processed_dir into shards
+    of at most shard_size samples: a (N, h, w, 3) uint8 .npy of BGR patches
+    resized to SAMPLE_SIZE, a (N,) uint8 .npy of labels (1 for Ball, 0 for
+    Background) and a .json with each sample's source path and mtime.
+
+    With append (the default), samples whose path is already in a shard are
+    skipped and the rest go into new shards, so packing after a labelling
+    session only decodes the new JPEGs. Otherwise existing shards are
+    deleted and everything is repacked. Returns (samples packed, samples
+    already packed).
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    existing = shard_indices(shard_dir)
+    if not append:
+        for index in existing:
+            for path in shard_paths(shard_dir, index):
+                os.remove(path)
+        existing = []
+
+    packed = set()
+    for index in existing:
+        with open(shard_paths(shard_dir, index)[2], 'r', encoding='utf-8') as f:
+            packed.update(json.load(f)["sources"])
+
+    paths, labels = list_samples(processed_dir)
+    new = [i for i, p in enumerate(paths) if p not in packed]
+    next_index = existing[-1] + 1 if existing else 0
+    written = 0
+    for start in range(0, len(new), shard_size):
+        rows = new[start:start + shard_size]
+        count = _write_shard(shard_dir, next_index, [paths[i] for i in rows], labels[rows], workers)
+        if count:
+            written += count
+            next_index += 1
+    return written, len(paths) - len(new)
+
+
+class SampleShards:
+    """
+    The packed samples in shard_dir, memory-mapped read-only: nothing is
+    read from disk until a sample's pages are touched, and image(i) and
+    batches() return views into the mapping rather than copies. Labels,
+    sources and mtimes are small and loaded eagerly for all shards.
+    """
+
+    def __init__(self, shard_dir=SAMPLE_SHARD_DIR):
+        self.shard_dir = shard_dir
+        self.images = []  # one (n, h, w, 3) uint8 memmap per shard
+        self.image_paths = []
+        labels = []
+        self.sources = []
+        self.mtimes = []
+        for index in shard_indices(shard_dir):
+            images_path, labels_path, meta_path = shard_paths(shard_dir, index)
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            self.images.append(np.load(images_path, mmap_mode='r'))
+            self.image_paths.append(images_path)
+            labels.append(np.load(labels_path))
+            self.sources.extend(meta["sources"])
+            self.mtimes.extend(meta["mtimes"])
+        self.labels = np.concatenate(labels).astype(np.int64) if labels else np.zeros(0, dtype=np.int64)
+        self.offsets = np.cumsum([0] + [len(images) for images in self.images])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def locate(self, i):
+        """(shard number in this list, row in that shard) of sample i."""
+        shard = int(np.searchsorted(self.offsets, i, side='right')) - 1
+        return shard, int(i - self.offsets[shard])
+
+    def image(self, i):
+        shard, row = self.locate(i)
+        return self.images[shard][row]
+
+    def batches(self, batch_size=1024):
+        """Yield (images, labels) views of up to batch_size samples, shard by shard."""
+        for shard, images in enumerate(self.images):
+            first = self.offsets[shard]
+            for start in range(0, len(images), batch_size):
+                stop = min(start + batch_size, len(images))
+                yield images[start:stop], self.labels[first + start:first + stop]
+
+
+def load_shards(shard_dir=SAMPLE_SHARD_DIR):
+    """SampleShards for shard_dir, or None if nothing has been packed there."""
+    return SampleShards(shard_dir) if shard_indices(shard_dir) else None
@@ -0,0 +1,207 @@
+import os
+import sys
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from src.config import (DEFAULT_CONF, INFERENCE_BATCH_SIZE, ANALYSIS_FPS, YOLO_MODEL_PATH, INFERENCE_BACKEND,
+                        SHARD_WORKERS)
+from src.model_registry import get_model
+from src.inference import iter_batched_predictions
+from src.frame_pipeline import read_frames, sampling_stride, count_frames
+from src.resolution import make_imgsz
+from src.evidence import Evidence
+from src.analysis import event_confidence, trajectory
+
+
+def shard_ranges(video_frames, frame_skip, shards):
+    """
+    Split the sampled frames of a video (frame_skip, 2 * frame_skip, ... as
+    FramePipeline numbers them) into at most `shards` contiguous ranges of
+    near-equal length. The last range is open-ended, so frames past a
+    container frame count that is too low are still analysed; when the
+    count is unknown (0) the whole video is one range.
+    """
+    frame_skip = max(1, int(frame_skip))
+    sampled = video_frames // frame_skip
+    shards = max(1, min(int(shards), sampled))
+    size, extra = divmod(sampled, shards)
+    ranges = []
+    first = 1
+    for i in range(shards):
+        count = size + (i < extra)
+        ranges.append(range(first * frame_skip, (first + count) * frame_skip, frame_skip))
+        first += count
+    last = ranges[-1].start if sampled else frame_skip
+    ranges[-1] = range(last, sys.maxsize, frame_skip)
+    return ranges
+
+
+def _init_worker(weights, backend, threads):
+    # Imported here so the parent process never initialises torch just to start the pool
+    import torch
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+    # Load and warm up the worker's own model now, not inside the first segment's timing
+    get_model(weights, backend)
+
+
+def shard_pool(workers=SHARD_WORKERS, weights=YOLO_MODEL_PATH, backend=INFERENCE_BACKEND):
+    """
+    A process pool for analyze_sharded() whose workers each load their own
+    model on start-up and get an equal share of the CPU cores. Processes
+    are spawned rather than forked, since a forked copy of a process that has
+    already run torch can deadlock in its thread pools. Reuse the pool across
+    videos to pay the model loading once.
+    """
+    workers = max(1, int(workers))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_init_worker, initargs=(weights, backend, threads))
+
+
+def _analyze_segment(video_path, frame_numbers, weights, backend, conf, batch_size, imgsz):
+    """Run the batched detector over one range of frame numbers in a worker process."""
+    start = time.perf_counter()
+    loaded = get_model(weights, backend)
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError("Could not open video file.")
+
+    timings = {'decode': 0.0, 'inference': 0.0}
+    detections = []
+    first_hit = None
+    frames_processed = model_calls = last_frame = 0
+    try:
+        # Start decoding at the segment instead of reading through everything before it
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_numbers[0] - 1)
+        predictions = iter_batched_predictions(loaded.model, read_frames(cap, frame_numbers, timings=timings),
+                                               batch_size=batch_size, conf=conf, classes=loaded.classes,
+                                               timings=timings, imgsz=make_imgsz(imgsz))
+        for frame_number, frame, found in predictions:
+            frames_processed += 1
+            last_frame = frame_number
+            model_calls += found.source == 'detector'
+            if len(found) > 0:
+                detections.append(found.to_dict(frame_number))
+                if first_hit is None:
+                    first_hit = (frame_number, frame, found)
+    finally:
+        cap.release()
+
+    return {
+        "first_frame": frame_numbers[0],
+        "last_frame": last_frame,
+        "frames_processed": frames_processed,
+        "model_calls": model_calls,
+        "detections": detections,
+        "first_hit": first_hit,
+        "timings": timings,
+        "seconds": time.perf_counter() - start,
+        "pid": os.getpid(),
+    }
+
+
+def analyze_sharded(video_path, workers=SHARD_WORKERS, weights=YOLO_MODEL_PATH, backend=INFERENCE_BACKEND,
+                    target_fps=ANALYSIS_FPS, conf=DEFAULT_CONF, batch_size=INFERENCE_BATCH_SIZE, imgsz=None,
+                    pool=None):
+    """
+    Full-scan analysis of one video split across processes.
+
+    The sampled frames are cut into `workers` contiguous segments
+    (shard_ranges()); each worker seeks to its segment with
+    CAP_PROP_POS_FRAMES and runs the batched detector over it with its own
+    model, so decoding and inference scale with the cores instead of
+    sharing one GIL and one torch thread pool. The per-segment detections
+    are merged into one timeline in frame order before event confidence
+    and the trajectory are computed, so events spanning a segment boundary
+    are scored as one.
+
+    pool is a shard_pool() to reuse (it must be built for the same weights
+    and backend); without one a pool is started and shut down here. imgsz
+    'auto' adapts per segment. The detection cache is not used, since its
+    stores are shared per process. Returns a dict shaped like
+    analyze_video()'s full-scan result, plus 'workers' and per-segment
+    'shards' stats.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError("Could not open video file.")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    video_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    frame_skip = sampling_stride(fps, target_fps)
+    ranges = shard_ranges(video_frames, frame_skip, workers)
+    start = time.perf_counter()
+    own_pool = pool is None
+    if own_pool:
+        pool = shard_pool(workers, weights, backend)
+    try:
+        futures = [pool.submit(_analyze_segment, video_path, frame_numbers, weights, backend, conf, batch_size,
+                               imgsz) for frame_numbers in ranges]
+        segments = [future.result() for future in futures]
+    finally:
+        if own_pool:
+            pool.shutdown(cancel_futures=True)
+    total_seconds = time.perf_counter() - start
+
+    # Segments are disjoint and in order already; the sort only guards against imprecise seeks
+    detections = sorted((d for segment in segments for d in segment["detections"]), key=lambda d: d["frame"])
+    evidence = next((Evidence(*segment["first_hit"]) for segment in segments if segment["first_hit"]), None)
+    frames_processed = sum(segment["frames_processed"] for segment in segments)
+    last_frame = max(segment["last_frame"] for segment in segments)
+    confidence, support = event_confidence(detections, frame_skip)
+
+    # The open-ended last segment reads past a frame count that is too low, hence the max()
+    total_frames = max(video_frames, last_frame) if video_frames > 0 else count_frames(video_path)
+    # Every other segment should reach the end of its range; one that stopped short (a frame that
+    # failed to decode) left the rest of its range unanalysed
+    missed = frame_skip * sum(len(frame_numbers) - segment["frames_processed"]
+                              for segment, frame_numbers in zip(segments[:-1], ranges))
+    covered = max(0.0, 1.0 - missed / total_frames) if total_frames else 0.0
+
+    timings = {
+        # Summed over workers, so these can exceed total_seconds
+        "decode_seconds": round(sum(segment["timings"]["decode"] for segment in segments), 3),
+        "inference_seconds": round(sum(segment["timings"]["inference"] for segment in segments), 3),
+        "total_seconds": round(total_seconds, 3),
+    }
+    timings["decode_ms_per_analyzed_frame"] = round(
+        1000 * timings["decode_seconds"] / frames_processed, 3) if frames_processed else 0.0
+
+    return {
+        "total_frames": total_frames,
+        "video_frames": video_frames,
+        "fps": fps,
+        "frame_skip": frame_skip,
+        "frames_processed": frames_processed,
+        "model_calls": sum(segment["model_calls"] for segment in segments),
+        "motion": None,
+        "cascade": None,
+        "detection_cache": None,
+        "detections": detections,
+        "trajectory": trajectory(detections),
+        "evidence": evidence,
+        "mode": 'full-scan',
+        "stop_reason": 'end',
+        "coverage": {
+            "last_frame": last_frame,
+            "fraction": round(covered, 3),
+            "seconds": round(last_frame / fps, 3) if fps else None,
+        },
+        "event_confidence": round(confidence, 3),
+        "support_frames": support,
+        "timings": timings,
+        "workers": len(ranges),
+        "shards": [{
+            "first_frame": segment["first_frame"],
+            "last_frame": segment["last_frame"],
+            "frames_processed": segment["frames_processed"],
+            "detections": len(segment["detections"]),
+            "seconds": round(segment["seconds"], 3),
+            "pid": segment["pid"],
+        } for segment in segments],
+    }
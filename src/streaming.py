@@ -0,0 +1,87 @@
+import json
+import time
+import asyncio
+
+from src.config import STREAM_PROGRESS_INTERVAL, DISCONNECT_POLL_SECONDS
+
+# Events that end a stream
+FINAL_EVENTS = ('result', 'error')
+
+
+def sse(event, data):
+    """One Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def await_unless_disconnected(request, future, cancel, poll=DISCONNECT_POLL_SECONDS):
+    """
+    Await an asyncio future (e.g. asyncio.wrap_future(job.future)) while
+    checking every poll seconds whether the client of request is still
+    there. If it has gone, cancel() is called so the analysis stops, and the
+    (partial) result is still awaited so cleanup finishes.
+    """
+    while True:
+        done, _ = await asyncio.wait({future}, timeout=poll)
+        if done:
+            return future.result()
+        if await request.is_disconnected():
+            cancel()
+            return await future
+
+
+class EventStream:
+    """
+    Carries (event, data) pairs from an analysis running on a worker thread
+    to a Server-Sent Events response on the event loop. emit() is
+    thread-safe; events() yields the encoded messages until a 'result' or
+    'error' event has been sent.
+    """
+
+    def __init__(self, loop=None):
+        self.loop = loop or asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def emit(self, event, data):
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, (event, data))
+        except RuntimeError:
+            # The loop is gone, and with it whoever was listening
+            pass
+
+    def progress_callback(self, also=None, interval=STREAM_PROGRESS_INTERVAL):
+        """
+        An analyze_video() progress callback that emits 'progress' events (at
+        most one per interval seconds, plus the first) and also calls also(frame_number, video_frames).
+        """
+        state = {"analyzed": 0, "sent_at": None}
+
+        def progress(frame_number, video_frames):
+            state["analyzed"] += 1
+            if also is not None:
+                also(frame_number, video_frames)
+            now = time.perf_counter()
+            if state["sent_at"] is not None and now - state["sent_at"] < interval:
+                return
+            state["sent_at"] = now
+            self.emit('progress', {
+                "frames_read": frame_number,
+                "frames_analyzed": state["analyzed"],
+                "video_frames": video_frames,
+                "progress": round(min(1.0, frame_number / video_frames), 3) if video_frames else None,
+            })
+
+        return progress
+
+    def detection_callback(self, evidence_fields):
+        """An analyze_video() on_detection callback that emits 'detection' events, with evidence_fields(evidence) merged in."""
+        def on_detection(detection, evidence):
+            self.emit('detection', dict(detection, **evidence_fields(evidence)))
+
+        return on_detection
+
+    async def events(self):
+        while True:
+            event, data = await self.queue.get()
+            yield sse(event, data)
+            if event in FINAL_EVENTS:
+                return
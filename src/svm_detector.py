@@ -0,0 +1,164 @@
+import os
+import time
+
+import cv2
+import joblib
+import numpy as np
+
+from src.config import (svm_model_path, HOG_WIN_SIZE, HOG_BLOCK_SIZE, HOG_BLOCK_STRIDE, HOG_CELL_SIZE, HOG_NBINS,
+                        SVM_DETECT_WIDTH, SVM_MIN_WINDOW, SVM_MAX_WINDOW, SVM_SCALE_STEP, SVM_THRESHOLD,
+                        SVM_NMS_IOU)
+from src.hog_features import make_hog
+from src.inference import Detections
+
+
+def nms(boxes, scores, iou_threshold=SVM_NMS_IOU):
+    """Indices of the boxes kept by greedy non-maximum suppression, best score first."""
+    order = np.argsort(-scores)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while len(order):
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        x1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        y1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        x2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        y2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def pyramid_windows(min_window=SVM_MIN_WINDOW, max_window=SVM_MAX_WINDOW, step=SVM_SCALE_STEP):
+    """Window sizes (px at the detection width) of each pyramid level, smallest first."""
+    sizes = []
+    size = float(min_window)
+    while size <= max_window:
+        sizes.append(size)
+        size *= step
+    return sizes
+
+
+class SvmDetector:
+    """
+    Sliding-window ball detector on the HOG-SVM from `python run.py --mode train`
+    (a LinearSVC, or the SGDClassifier of --incremental; anything with coef_).
+
+    The frame is resized to `width` px wide and, for every window size in
+    pyramid_windows(), scaled so that size becomes the HOG_WIN_SIZE training
+    patch. Each level is one HOGDescriptor.compute() call with the whole
+    level as the window, which yields every block histogram exactly once.
+    Blocks are normalised on their own, so a window's descriptor is just the
+    concatenation of the blocks it covers, and the SVM decomposes into one
+    weight vector per block offset within the window: a single matrix
+    product of the level's blocks with coef_ (reshaped to block x offset)
+    scores every block at every offset, and shifted sums of that give the
+    margin of every window, stepping HOG_BLOCK_STRIDE px. The margins are
+    the same as describing each window separately, without writing out the
+    overlapping descriptors. Windows whose margin exceeds threshold are mapped
+    back to frame coordinates and thinned with NMS. Scores are SVM margins,
+    not probabilities.
+    """
+
+    def __init__(self, model_path=svm_model_path, width=SVM_DETECT_WIDTH, min_window=SVM_MIN_WINDOW,
+                 max_window=SVM_MAX_WINDOW, scale_step=SVM_SCALE_STEP, threshold=SVM_THRESHOLD,
+                 nms_iou=SVM_NMS_IOU):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"No SVM at {model_path}. Train one with: python run.py --mode train")
+        model = joblib.load(model_path)
+        weights = np.asarray(model.coef_, dtype=np.float32).ravel()
+        hog = make_hog()
+        if len(weights) != hog.getDescriptorSize():
+            raise ValueError(f"{model_path} expects {len(weights)} features, but the HOG settings give "
+                             f"{hog.getDescriptorSize()}. Retrain it.")
+        self.bias = float(np.ravel(model.intercept_)[0])
+        # Blocks per window along x and y; OpenCV orders a window's blocks x-major
+        self.blocks_x = (HOG_WIN_SIZE[0] - HOG_BLOCK_SIZE[0]) // HOG_BLOCK_STRIDE[0] + 1
+        self.blocks_y = (HOG_WIN_SIZE[1] - HOG_BLOCK_SIZE[1]) // HOG_BLOCK_STRIDE[1] + 1
+        block_size = len(weights) // (self.blocks_x * self.blocks_y)
+        # (block features, offsets): column k holds the weights for the block at offset k of a window
+        self.block_weights = np.ascontiguousarray(weights.reshape(-1, block_size).T)
+        self.width = width
+        self.windows = pyramid_windows(min_window, max_window, scale_step)
+        self.threshold = threshold
+        self.nms_iou = nms_iou
+        self._level_hogs = {}  # (w, h) -> HOGDescriptor covering a whole level
+        self.frames = 0
+        self.windows_scored = 0
+
+    def _level_hog(self, size):
+        if size not in self._level_hogs:
+            self._level_hogs[size] = cv2.HOGDescriptor(size, HOG_BLOCK_SIZE, HOG_BLOCK_STRIDE, HOG_CELL_SIZE,
+                                                       HOG_NBINS)
+        return self._level_hogs[size]
+
+    def score_level(self, image, window):
+        """(boxes, margins) of every window position on image for a window of `window` px, in image coordinates."""
+        (win_w, win_h), (block_w, block_h), (stride_x, stride_y) = HOG_WIN_SIZE, HOG_BLOCK_SIZE, HOG_BLOCK_STRIDE
+        h, w = image.shape[:2]
+        scale = win_w / window
+        # Round the level to whole block steps, so every block of it is computed and none is cut off
+        lw = block_w + stride_x * int((w * scale - block_w) // stride_x)
+        lh = block_h + stride_y * int((h * scale - block_h) // stride_y)
+        if lw < win_w or lh < win_h:
+            return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32)
+        level = cv2.resize(image, (lw, lh), interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+
+        grid_x = (lw - block_w) // stride_x + 1
+        grid_y = (lh - block_h) // stride_y + 1
+        blocks = self._level_hog((lw, lh)).compute(level).reshape(grid_x * grid_y, -1)
+        offsets = (blocks @ self.block_weights).reshape(grid_x, grid_y, self.blocks_x, self.blocks_y)
+        nx, ny = grid_x - self.blocks_x + 1, grid_y - self.blocks_y + 1
+        margins = np.full((nx, ny), self.bias, dtype=np.float32)
+        for i in range(self.blocks_x):
+            for j in range(self.blocks_y):
+                margins += offsets[i:i + nx, j:j + ny, i, j]
+
+        xs, ys = np.meshgrid(np.arange(nx), np.arange(ny), indexing='ij')
+        fx, fy = lw / w, lh / h
+        x1 = (xs * stride_x / fx).ravel()
+        y1 = (ys * stride_y / fy).ravel()
+        boxes = np.stack([x1, y1, x1 + win_w / fx, y1 + win_h / fy], axis=1).astype(np.float32)
+        return boxes, margins.ravel()
+
+    def detect(self, frame):
+        """Detections (source='svm') of the ball in a BGR frame."""
+        h, w = frame.shape[:2]
+        resize = self.width / w if self.width and w > self.width else 1.0
+        image = cv2.resize(frame, (self.width, int(h * resize)), interpolation=cv2.INTER_AREA) \
+            if resize != 1.0 else frame
+
+        all_boxes, all_scores = [], []
+        for window in self.windows:
+            boxes, margins = self.score_level(image, window)
+            self.windows_scored += len(margins)
+            keep = margins > self.threshold
+            all_boxes.append(boxes[keep])
+            all_scores.append(margins[keep])
+        self.frames += 1
+
+        boxes = np.concatenate(all_boxes) / resize
+        scores = np.concatenate(all_scores)
+        if len(scores):
+            keep = nms(boxes, scores, self.nms_iou)
+            boxes, scores = boxes[keep], scores[keep]
+        return Detections(boxes, scores, source='svm')
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "levels": len(self.windows),
+            "windows_per_frame": round(self.windows_scored / self.frames) if self.frames else 0,
+        }
+
+
+def iter_svm_predictions(detector, numbered_frames, timings=None):
+    """Like iter_batched_predictions(), with an SvmDetector in place of YOLO."""
+    for frame_number, frame in numbered_frames:
+        start = time.perf_counter()
+        found = detector.detect(frame)
+        if timings is not None:
+            timings['inference'] = timings.get('inference', 0.0) + time.perf_counter() - start
+        yield frame_number, frame, found
@@ -0,0 +1,143 @@
+import time
+import cv2
+import numpy as np
+
+from src.config import DEFAULT_CONF, TRACK_DETECT_EVERY, TRACK_MIN_CONFIDENCE, TRACK_SEARCH_SCALE
+from src.inference import Detections, predict_batch, add_time
+from src.resolution import current_imgsz, observe_imgsz
+
+
+class BallTracker:
+    """
+    Carries the ball box forward between detector runs.
+
+    A constant-velocity Kalman filter predicts where the ball centre moves
+    next, and the ball template cut from the last detection is searched for
+    with normalised cross-correlation in a window around that prediction. The
+    match score is the tracker confidence; below min_confidence the track is
+    considered lost. Box size is held from the last detection.
+    """
+
+    def __init__(self, min_confidence=TRACK_MIN_CONFIDENCE, search_scale=TRACK_SEARCH_SCALE):
+        self.min_confidence = min_confidence
+        self.search_scale = search_scale
+        self.kalman = None
+        self.template = None
+        self.size = None
+        self.confidence = 0.0
+
+    @property
+    def active(self):
+        return self.kalman is not None
+
+    def reset(self):
+        self.kalman = None
+        self.template = None
+        self.confidence = 0.0
+
+    def start(self, frame, box, score):
+        """(Re)initialise the track from a detector box."""
+        x1, y1, x2, y2 = [float(v) for v in box]
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        w, h = max(2.0, x2 - x1), max(2.0, y2 - y1)
+
+        if self.kalman is None:
+            # State [cx, cy, vx, vy], measurement [cx, cy]
+            kalman = cv2.KalmanFilter(4, 2)
+            kalman.transitionMatrix = np.array([[1, 0, 1, 0], [0, 1, 0, 1], [0, 0, 1, 0], [0, 0, 0, 1]], np.float32)
+            kalman.measurementMatrix = np.array([[1, 0, 0, 0], [0, 1, 0, 0]], np.float32)
+            kalman.processNoiseCov = np.eye(4, dtype=np.float32) * 1e-2
+            kalman.measurementNoiseCov = np.eye(2, dtype=np.float32) * 1e-1
+            kalman.errorCovPost = np.eye(4, dtype=np.float32)
+            kalman.statePost = np.array([[cx], [cy], [0], [0]], np.float32)
+            self.kalman = kalman
+        else:
+            # Keep the velocity estimate across re-detections
+            self.kalman.predict()
+            self.kalman.correct(np.array([[cx], [cy]], np.float32))
+
+        self.size = (w, h)
+        self.template = self._crop(frame, cx, cy, w, h)
+        self.confidence = score
+
+    def track(self, frame):
+        """Predict and measure the ball in frame. Returns (box, confidence), or None once the track is lost."""
+        if self.kalman is None or self.template is None or self.template.size == 0:
+            return None
+
+        predicted = self.kalman.predict()
+        px, py = float(predicted[0, 0]), float(predicted[1, 0])
+        w, h = self.size
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        sw, sh = w * self.search_scale, h * self.search_scale
+        x0, y0 = max(0, int(px - sw / 2)), max(0, int(py - sh / 2))
+        x1, y1 = min(gray.shape[1], int(px + sw / 2)), min(gray.shape[0], int(py + sh / 2))
+        window = gray[y0:y1, x0:x1]
+        th, tw = self.template.shape[:2]
+        if window.shape[0] < th or window.shape[1] < tw:
+            self.reset()
+            return None
+
+        scores = cv2.matchTemplate(window, self.template, cv2.TM_CCOEFF_NORMED)
+        _, confidence, _, (mx, my) = cv2.minMaxLoc(scores)
+        self.confidence = float(confidence)
+        if self.confidence < self.min_confidence:
+            self.reset()
+            return None
+
+        cx, cy = x0 + mx + tw / 2, y0 + my + th / 2
+        self.kalman.correct(np.array([[cx], [cy]], np.float32))
+        box = [cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2]
+        return box, self.confidence
+
+    @staticmethod
+    def _crop(frame, cx, cy, w, h):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        x0, y0 = max(0, int(cx - w / 2)), max(0, int(cy - h / 2))
+        x1, y1 = min(gray.shape[1], int(cx + w / 2)), min(gray.shape[0], int(cy + h / 2))
+        return gray[y0:y1, x0:x1].copy()
+
+
+def iter_tracked_predictions(model, numbered_frames, detect_every=TRACK_DETECT_EVERY, conf=DEFAULT_CONF,
+                             classes=None, timings=None, tracker=None, imgsz=None):
+    """
+    Like iter_batched_predictions, but once the ball is found it is followed
+    by a BallTracker and YOLO only runs again every detect_every frames or as
+    soon as the tracker loses confidence. Frames without a track always go
+    to the detector, so recall before the first hit is unchanged. imgsz is
+    passed to the detector runs as in iter_batched_predictions.
+
+    Yields (frame_number, frame, Detections); tracked frames have
+    source='tracker' and the tracker confidence as score.
+    """
+    tracker = tracker or BallTracker()
+    detect_every = max(1, int(detect_every))
+    since_detection = detect_every
+
+    for frame_number, frame in numbered_frames:
+        found = None
+        if tracker.active and since_detection < detect_every:
+            start = time.perf_counter()
+            tracked = tracker.track(frame)
+            add_time(timings, 'tracking', start)
+            if tracked is not None:
+                box, confidence = tracked
+                found = Detections([box], [confidence], source='tracker')
+                since_detection += 1
+
+        if found is None:
+            start = time.perf_counter()
+            size = current_imgsz(imgsz)
+            result = predict_batch(model, [frame], conf=conf, classes=classes, imgsz=size)[0]
+            add_time(timings, 'inference', start)
+            found = Detections.from_result(result)
+            observe_imgsz(imgsz, size, [(frame, found)])
+            since_detection = 1
+            if len(found) > 0:
+                box, score = found.best()
+                tracker.start(frame, box, score)
+            else:
+                tracker.reset()
+
+        yield frame_number, frame, found
@@ -1,70 +1,65 @@
 import cv2
 import numpy as np
 import os
+import json
+import time
+import zlib
 import joblib
-# cv2 has HOGDescriptor.
 
 from sklearn.svm import LinearSVC
+from sklearn.linear_model import SGDClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
-from src.config import PROCESSED_DATA_DIR, MODELS_DIR, svm_model_path
+from src.config import (PROCESSED_DATA_DIR, MODELS_DIR, svm_model_path, TRAIN_WORKERS, SGD_BATCH_SIZE, SGD_EPOCHS,
+                        SGD_ALPHA, HOLDOUT_PERCENT)
+from src.hog_features import extract_features, extract_shard_features, iter_feature_batches, FeatureCache
+from src.sample_shards import load_shards, unpacked_samples
 
-def compute_hog_features(image):
-    # Resize to fixed size
-    image = cv2.resize(image, (64, 64))
-    
-    # WinSize, BlockSize, BlockStride, CellSize, NBin
-    win_size = (64, 64)
-    block_size = (16, 16)
-    block_stride = (8, 8)
-    cell_size = (8, 8)
-    nbins = 9
-    
-    hog = cv2.HOGDescriptor(win_size, block_size, block_stride, cell_size, nbins)
-    
-    # Compute HOG descriptors
-    h = hog.compute(image)
-    return h.flatten()
+def sample_features(workers=TRAIN_WORKERS, cache=None):
+    """
+    HOG features of every sample through extract_features() and its cache:
+    the packed shards first, then the JPEGs collected since the last pack.
+    Returns (sources, features, ok, labels, cached).
+    """
+    shards = load_shards()
+    # Samples collected since the last pack are only on disk as JPEGs
+    paths, path_labels = unpacked_samples(shards)
+    parts = []
+    if shards is not None:
+        # Packed samples (python run.py --mode pack) are read straight from the memory-mapped shards
+        print(f"Extracting HOG features from {len(shards)} packed samples...")
+        parts.append(extract_shard_features(shards, workers=workers, cache=cache) + (shards.labels, shards.sources))
+        if paths:
+            print(f"... and from {len(paths)} samples not packed yet (pack them with: python run.py --mode pack)")
+    else:
+        print(f"Extracting HOG features from {len(paths)} samples...")
+    if paths or shards is None:
+        parts.append(extract_features(paths, workers=workers, cache=cache) + (path_labels, paths))
+    features = np.concatenate([part[0] for part in parts]) if len(parts) > 1 else parts[0][0]
+    ok = np.concatenate([part[1] for part in parts])
+    cached = sum(part[2] for part in parts)
+    labels = np.concatenate([part[3] for part in parts])
+    sources = [source for part in parts for source in part[4]]
+    return sources, features, ok, labels, cached
 
-def train():
-    pos_dir = os.path.join(PROCESSED_DATA_DIR, 'positive')
-    neg_dir = os.path.join(PROCESSED_DATA_DIR, 'negative')
-    
-    data = []
-    labels = []
-    
-    print("Loading positive samples...")
-    for filename in os.listdir(pos_dir):
-        if filename.endswith(".jpg"):
-            path = os.path.join(pos_dir, filename)
-            img = cv2.imread(path)
-            if img is not None:
-                features = compute_hog_features(img)
-                data.append(features)
-                labels.append(1) # 1 for Ball
-
-    print(f"Loaded {len(labels)} positive samples.")
-
-    print("Loading negative samples...")
-    for filename in os.listdir(neg_dir):
-        if filename.endswith(".jpg"):
-            path = os.path.join(neg_dir, filename)
-            img = cv2.imread(path)
-            if img is not None:
-                features = compute_hog_features(img)
-                data.append(features)
-                labels.append(0) # 0 for Background
-
-    print(f"Loaded {len(data) - labels.count(1)} negative samples.")
+def train(workers=TRAIN_WORKERS):
+    cache = FeatureCache()
+    start = time.perf_counter()
+    _, features, ok, labels, cached = sample_features(workers, cache)
+    cache.save()
+    print(f"Featurised {len(labels) - cached} samples ({cached} from the cache) in "
+          f"{time.perf_counter() - start:.2f}s")
+
+    # Unreadable images keep a zero row in features; only copy when there are any to drop
+    X = features if ok.all() else features[ok]
+    y = labels if ok.all() else labels[ok]
+    print(f"Loaded {int(y.sum())} positive samples.")
+    print(f"Loaded {len(y) - int(y.sum())} negative samples.")
     
-    if len(data) == 0:
+    if len(X) == 0:
         print("No data found! Please run collect_training_data.py first.")
         return
 
-    # Convert to numpy arrays
-    X = np.array(data)
-    y = np.array(labels)
-    
     # Split
     print("Training SVM...")
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -80,6 +75,113 @@ def train():
     # Save
     print(f"Saving model to {svm_model_path}")
     joblib.dump(model, svm_model_path)
+    # A from-scratch model has seen every sample; the incremental record no longer applies
+    if os.path.exists(seen_path()):
+        os.remove(seen_path())
+    print("Done.")
+
+def seen_path(model_path=None):
+    """Sidecar listing the samples an incrementally trained model has been fitted on."""
+    return os.path.splitext(model_path or svm_model_path)[0] + '_seen.json'
+
+def is_holdout(path):
+    """Whether a sample is in the fixed held-out set: decided by its file name, so it never changes."""
+    return zlib.crc32(os.path.basename(path).encode('utf-8')) % 100 < HOLDOUT_PERCENT
+
+def load_sample_images():
+    """
+    (sources, labels, load_image) for every sample: the packed shards first,
+    then the JPEGs collected since the last pack, so new samples are
+    trainable without repacking.
+    """
+    shards = load_shards()
+    paths, labels = unpacked_samples(shards)
+    if shards is None:
+        return paths, labels, lambda i: cv2.imread(paths[i])
+    packed = len(shards)
+
+    def load_image(i):
+        return shards.image(i) if i < packed else cv2.imread(paths[i - packed])
+
+    return shards.sources + paths, np.concatenate([shards.labels, labels]), load_image
+
+def holdout_accuracy(model, load_image, indices, labels, batch_size):
+    correct = total = 0
+    for X, y in iter_feature_batches(load_image, indices, labels, batch_size):
+        if len(y):
+            correct += int((model.predict(X) == y).sum())
+            total += len(y)
+    return correct / total if total else 0.0
+
+def train_incremental(batch_size=SGD_BATCH_SIZE, epochs=SGD_EPOCHS, baseline=True):
+    """
+    Out-of-core training: HOG features are computed batch by batch and fed
+    to an SGDClassifier with hinge loss (a linear SVM) through partial_fit,
+    so memory stays at one batch whatever the dataset size. If the saved
+    model is an SGDClassifier it is updated with only the samples it hasn't
+    seen (listed in the seen_path() sidecar), so a labelling session costs
+    a pass over the new samples, not a retrain. Accuracy is measured on the
+    fixed held-out set (is_holdout()); with baseline, a LinearSVC fitted on
+    every training sample in memory, as train() does, is scored next to it.
+    """
+    sources, labels, load_image = load_sample_images()
+    if len(sources) == 0:
+        print("No data found! Please run collect_training_data.py first.")
+        return
+
+    holdout = np.array([is_holdout(p) for p in sources], dtype=bool)
+    train_rows = np.flatnonzero(~holdout)
+    test_rows = np.flatnonzero(holdout)
+
+    model = joblib.load(svm_model_path) if os.path.exists(svm_model_path) else None
+    seen = set()
+    if isinstance(model, SGDClassifier) and os.path.exists(seen_path()):
+        with open(seen_path(), 'r', encoding='utf-8') as f:
+            seen = set(json.load(f))
+        print(f"Updating {svm_model_path} ({len(seen)} samples seen so far)")
+    else:
+        # Averaged SGD: the averaged weights are far less noisy than the last iterate on small batches
+        model = SGDClassifier(loss='hinge', alpha=SGD_ALPHA, average=True, random_state=42)
+        print("Starting a new incremental model")
+
+    new_rows = np.array([i for i in train_rows if sources[i] not in seen], dtype=np.int64)
+    print(f"{len(new_rows)} new training samples, {len(train_rows) - len(new_rows)} already seen, "
+          f"{len(test_rows)} held out")
+
+    start = time.perf_counter()
+    rng = np.random.default_rng(42)
+    fitted = 0
+    for _ in range(max(1, epochs) if len(new_rows) else 0):
+        # Samples are listed positives first; shuffle so every batch mixes both classes
+        for X, y in iter_feature_batches(load_image, rng.permutation(new_rows), labels, batch_size):
+            if len(y):
+                model.partial_fit(X, y, classes=np.array([0, 1]))
+                fitted += len(y)
+    print(f"partial_fit on {fitted} samples in {time.perf_counter() - start:.2f}s")
+
+    if not hasattr(model, 'coef_'):
+        print("Nothing to train on.")
+        return
+    accuracy = holdout_accuracy(model, load_image, test_rows, labels, batch_size)
+    print(f"Incremental SGD held-out accuracy: {accuracy * 100:.2f}%")
+
+    if baseline:
+        # The in-memory baseline featurises through the feature cache, as train() does
+        start = time.perf_counter()
+        cache = FeatureCache()
+        baseline_sources, features, ok, baseline_labels, _ = sample_features(cache=cache)
+        cache.save()
+        in_holdout = np.array([is_holdout(p) for p in baseline_sources], dtype=bool)
+        fit, score = ok & ~in_holdout, ok & in_holdout
+        svc = LinearSVC(C=1.0, random_state=42, max_iter=1000).fit(features[fit], baseline_labels[fit])
+        svc_accuracy = svc.score(features[score], baseline_labels[score]) if score.any() else 0.0
+        print(f"LinearSVC baseline held-out accuracy: {svc_accuracy * 100:.2f}% "
+              f"(fitted on all {int(fit.sum())} training samples in memory, {time.perf_counter() - start:.2f}s)")
+
+    print(f"Saving model to {svm_model_path}")
+    joblib.dump(model, svm_model_path)
+    with open(seen_path(), 'w', encoding='utf-8') as f:
+        json.dump(sorted(seen | {sources[i] for i in new_rows}), f)
     print("Done.")
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+import pytest
+
+BALL_FRAMES = ((40, 90), (200, 230))  # inclusive 1-based frame ranges in which the clip shows the ball
+BALL_BGR = (30, 90, 200)
+
+
+class _Array:
+    """Just enough of a torch tensor for Detections.from_result()."""
+
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=np.float32)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+
+class _Boxes:
+    def __init__(self, xyxy, conf):
+        self.xyxy = _Array(np.reshape(xyxy, (-1, 4)))
+        self.conf = _Array(conf)
+        self.cls = _Array(np.zeros(len(conf)))
+
+
+class _Result:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class FakeModel:
+    """
+    Stands in for YOLO: finds the clip's ball by its colour, scores it
+    `score` and records the frame count and imgsz of every call.
+    """
+
+    names = {0: 'ball'}
+
+    def __init__(self, score=0.9):
+        self.score = score
+        self.calls = []  # (frames, imgsz) per call
+
+    def __call__(self, frames, conf=0.25, verbose=False, classes=None, imgsz=None):
+        self.calls.append((len(frames), imgsz))
+        results = []
+        for frame in frames:
+            ys, xs = np.nonzero(cv2.inRange(frame, (20, 70, 180), (40, 110, 220)))
+            if len(xs) > 10 and self.score >= conf:
+                results.append(_Result(_Boxes([[xs.min(), ys.min(), xs.max(), ys.max()]], [self.score])))
+            else:
+                results.append(_Result(_Boxes(np.zeros((0, 4)), [])))
+        return results
+
+    @property
+    def frames_run(self):
+        return sum(frames for frames, _ in self.calls)
+
+
+def write_clip(path, frames=300, ball_frames=BALL_FRAMES, size=(320, 180), fps=30):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    for i in range(1, frames + 1):
+        frame = np.full((size[1], size[0], 3), (40, 120, 40), np.uint8)
+        if any(first <= i <= last for first, last in ball_frames):
+            cv2.circle(frame, (20 + i % 280, 90), 8, BALL_BGR, -1)
+        writer.write(frame)
+    writer.release()
+    return str(path)
+
+
+@pytest.fixture
+def fake_model():
+    return FakeModel()
+
+
+@pytest.fixture(scope='session')
+def clip(tmp_path_factory):
+    """A 300-frame 30fps clip with the ball on frames 40-90 and 200-230."""
+    return write_clip(tmp_path_factory.mktemp('clips') / 'clip.mp4')
@@ -0,0 +1,33 @@
+from src.adaptive_search import coarse_samples, refine_points, group_events, adaptive_search
+
+HIT = object()  # any non-None value means the sampled frame has the ball
+
+
+def test_coarse_samples_include_the_last_frame():
+    assert coarse_samples(10, 4) == [1, 5, 9, 10]
+    assert coarse_samples(9, 4) == [1, 5, 9]
+    assert coarse_samples(0, 4) == []
+
+
+def test_refine_points_subdivide_only_boundaries():
+    assert refine_points({1: None, 31: HIT}, 4) == [8, 15, 22, 29]
+    assert refine_points({1: HIT, 31: HIT, 61: HIT}, 4) == []
+    assert refine_points({1: None, 31: None}, 4) == []
+
+
+def test_refine_points_take_every_frame_in_short_gaps():
+    assert refine_points({10: None, 13: HIT}, 4) == [11, 12]
+    assert refine_points({10: None, 11: HIT}, 4) == []
+
+
+def test_group_events():
+    hits = {1: None, 5: HIT, 6: HIT, 9: None, 12: HIT}
+    assert group_events(hits) == [{"start": 5, "end": 6}, {"start": 12, "end": 12}]
+    assert group_events({1: None, 2: None}) == []
+
+
+def test_adaptive_search_pins_events_to_exact_frames(fake_model, clip):
+    analysis = adaptive_search(fake_model, clip, batch_size=8)
+    assert analysis["events"] == [{"start": 40, "end": 90}, {"start": 200, "end": 230}]
+    assert analysis["total_frames"] == 300
+    assert analysis["model_calls"] == fake_model.frames_run < 300
@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+from src.analysis import analyze_video, video_length, event_confidence
+from src.detection_cache import FrameDetectionStore
+from tests.conftest import FakeModel, write_clip
+
+
+def test_full_scan_covers_the_whole_video(fake_model, clip):
+    analysis = analyze_video(fake_model, clip, mode='full-scan')
+    assert analysis["stop_reason"] == 'end'
+    assert analysis["total_frames"] == 300
+    assert analysis["coverage"] == {"last_frame": 300, "fraction": 1.0, "seconds": 10.0}
+    assert analysis["model_calls"] == fake_model.frames_run == 60
+
+
+def test_first_hit_reports_the_video_length_and_partial_coverage(fake_model, clip):
+    analysis = analyze_video(fake_model, clip, mode='first-hit')
+    assert analysis["stop_reason"] == 'first-hit'
+    assert analysis["coverage"]["last_frame"] == 40
+    # The reader has run ahead of frame 40, but the length is still the video's
+    assert analysis["total_frames"] == 300
+    assert analysis["coverage"]["fraction"] == round(40 / 300, 3)
+
+
+def test_seeking_scan_reports_the_video_length(fake_model, clip):
+    # 30fps at 0.25fps analysis: a stride of 120 frames, which is seeked over
+    analysis = analyze_video(fake_model, clip, mode='full-scan', target_fps=0.25)
+    assert analysis["timings"]["seeks"] > 0
+    assert analysis["coverage"]["last_frame"] == 240
+    assert analysis["total_frames"] == 300
+
+
+def test_video_length(clip):
+    grabbed = SimpleNamespace(seeks=0, frames_read=298)
+    seeked = SimpleNamespace(seeks=2, frames_read=240)
+    assert video_length(grabbed, clip, 300, 295, 'end') == 298
+    assert video_length(seeked, clip, 300, 240, 'end') == 300
+    # No frame count from the container: count the frames
+    assert video_length(seeked, clip, 0, 240, 'end') == 300
+    assert video_length(grabbed, clip, 300, 40, 'first-hit') == 300
+    assert video_length(grabbed, clip, 0, 40, 'limit') == 40
+
+
+def test_adaptive_coverage(fake_model, clip):
+    analysis = analyze_video(fake_model, clip, mode='adaptive')
+    assert analysis["events"] == [{"start": 40, "end": 90}, {"start": 200, "end": 230}]
+    assert analysis["total_frames"] == 300
+    assert analysis["coverage"]["fraction"] == 1.0
+    assert "last_frame" not in analysis
+
+
+def test_detection_cache_stats_are_per_analysis(tmp_path, clip):
+    store = FrameDetectionStore(str(tmp_path / 'clip_v1.npy'))
+    model = FakeModel()
+    first = analyze_video(model, clip, mode='full-scan', store=store)["detection_cache"]
+    second = analyze_video(model, clip, mode='full-scan', conf=0.5, store=store)["detection_cache"]
+    assert (first["hits"], first["misses"]) == (0, 60)
+    assert (second["hits"], second["misses"]) == (60, 0)
+    assert model.frames_run == 60
+
+
+def test_motion_gate_counts_every_model_call(tmp_path):
+    # Large enough frames for the gate to crop around the ball
+    clip = write_clip(tmp_path / 'wide.mp4', size=(640, 360))
+    model = FakeModel()
+    analysis = analyze_video(model, clip, mode='full-scan', motion=True)
+    assert analysis["motion"]["roi_misses"] > 0
+    assert analysis["model_calls"] == len(model.calls)
+
+
+def test_event_confidence_needs_consecutive_support():
+    def detection(frame):
+        return {"frame": frame, "scores": [0.9], "source": 'detector'}
+
+    assert event_confidence([], 5) == (0.0, 0)
+    confidence, support = event_confidence([detection(5)], 5)
+    assert support == 1 and confidence < 0.9
+    assert event_confidence([detection(5), detection(10), detection(15)], 5) == (0.9, 3)
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from src.config import DATASET_DIR, YOLO_MODEL_PATH
+from src.detector import available_backends, load_detector
+from src.inference import Detections, predict_batch
+from src.model_registry import ball_classes
+from src.benchmark import box_parity, load_frames
+
+PARITY_CONF = 0.05  # low, so there are more boxes to compare than the confident ball alone
+TOLERANCE_PX = 1.0
+
+pytestmark = pytest.mark.skipif('onnx' not in available_backends(YOLO_MODEL_PATH),
+                                reason="no ONNX export of YOLO_MODEL_PATH (python run.py --mode export --format onnx)")
+
+
+@pytest.fixture(scope='module')
+def frames():
+    """Every 5th frame of PARITY_VIDEO, or frames sampled across the .mp4s in DATASET_DIR."""
+    video = os.environ.get('PARITY_VIDEO')
+    if video:
+        frames = load_frames(video, 16, frame_skip=5)
+    else:
+        # Imported here since it needs onnxruntime's quantization tooling
+        from src.quantize import calibration_frames
+        frames = calibration_frames(DATASET_DIR, 16)
+    if not frames:
+        pytest.skip(f"no fixture clip: set PARITY_VIDEO or put .mp4 videos in {DATASET_DIR}")
+    return frames
+
+
+def detect(backend, frames):
+    model = load_detector(YOLO_MODEL_PATH, backend)
+    results = predict_batch(model, frames, conf=PARITY_CONF, classes=ball_classes(model))
+    return [Detections.from_result(result) for result in results]
+
+
+def test_onnx_matches_pytorch(frames):
+    reference = detect('pytorch', frames)
+    if not any(len(found) for found in reference):
+        pytest.skip("the PyTorch model finds nothing in the fixture frames, so there is nothing to compare")
+    worst, unmatched = box_parity(reference, detect('onnx', frames), PARITY_CONF, TOLERANCE_PX)
+    assert unmatched == 0, f"{unmatched} boxes differ between PyTorch and ONNX (max error {worst:.2f}px)"
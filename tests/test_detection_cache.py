@@ -0,0 +1,100 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from src.detection_cache import FrameDetectionStore, save_store, validate_conf
+from src.inference import Detections, iter_batched_predictions
+from tests.conftest import FakeModel
+
+
+def numbered(frames):
+    return list(enumerate(frames, start=1))
+
+
+@pytest.fixture
+def frames(clip):
+    """The clip's first 60 frames."""
+    cap = cv2.VideoCapture(clip)
+    frames = [cap.read()[1] for _ in range(60)]
+    cap.release()
+    return frames
+
+
+def run(model, frames, store, conf):
+    return list(iter_batched_predictions(model, numbered(frames), batch_size=8, conf=conf, store=store))
+
+
+def test_store_round_trip(tmp_path):
+    path = str(tmp_path / 'video_v1.npy')
+    store = FrameDetectionStore(path)
+    store.put(1, 640, Detections([[1, 2, 3, 4]], [0.5], [2]))
+    store.put(2, 640, Detections(np.zeros((0, 4)), []))
+    store.save()
+
+    reloaded = FrameDetectionStore(path)
+    assert len(reloaded) == 2
+    found = reloaded.get(1, 640)
+    assert found.source == 'cache'
+    assert found.boxes.tolist() == [[1, 2, 3, 4]] and found.class_ids.tolist() == [2]
+    # Frames where nothing was found are cached too
+    assert len(reloaded.get(2, 640)) == 0
+    assert reloaded.get(1, 320) is None
+
+
+def test_higher_threshold_is_answered_from_the_store(tmp_path, frames):
+    store = FrameDetectionStore(str(tmp_path / 'video_v1.npy'))
+    model = FakeModel(score=0.5)
+    first = run(model, frames, store, conf=0.25)
+    calls = model.frames_run
+    assert calls == len(frames)
+    assert sum(len(found) for _, _, found in first) > 0
+
+    # Stricter than the stored boxes' score: everything filtered out, no model call
+    assert all(len(found) == 0 for _, _, found in run(model, frames, store, conf=0.6))
+    again = run(model, frames, store, conf=0.4)
+    assert model.frames_run == calls
+    assert [len(f) for _, _, f in again] == [len(f) for _, _, f in first]
+    assert all(found.source == 'cache' for _, _, found in again)
+
+
+def test_threshold_below_the_floor_bypasses_the_store(tmp_path, frames):
+    store = FrameDetectionStore(str(tmp_path / 'video_v1.npy'), floor=0.1)
+    model = FakeModel()
+    run(model, frames[:8], store, conf=0.05)
+    assert len(store) == 0 and model.frames_run == 8
+
+
+def test_session_counts_only_its_own_lookups(tmp_path, frames):
+    store = FrameDetectionStore(str(tmp_path / 'video_v1.npy'))
+    model = FakeModel()
+    first = store.session()
+    run(model, frames, first, conf=0.25)
+    second = store.session()
+    run(model, frames, second, conf=0.25)
+    assert (first.hits, first.misses) == (0, len(frames))
+    assert (second.hits, second.misses) == (len(frames), 0)
+    assert second.stats()["hits"] == len(frames) and second.stats()["misses"] == 0
+    assert (store.hits, store.misses) == (len(frames), len(frames))
+
+
+def test_save_evicts_least_recently_used_stores(tmp_path):
+    directory = str(tmp_path)
+    old = FrameDetectionStore(os.path.join(directory, 'old_v1.npy'))
+    old.put(1, 640, Detections([[1, 2, 3, 4]], [0.5]))
+    old.save()
+    os.utime(old.path, (0, 0))
+    current = FrameDetectionStore(os.path.join(directory, 'new_v1.npy'))
+    current.put(1, 640, Detections([[1, 2, 3, 4]], [0.5]))
+    save_store(current, directory=directory, max_bytes=os.path.getsize(old.path) + 1)
+    assert os.path.exists(current.path)
+    assert not os.path.exists(old.path)
+
+
+def test_validate_conf():
+    assert validate_conf(0.25) == 0.25
+    with pytest.raises(ValueError):
+        validate_conf(0.001)
+    with pytest.raises(ValueError):
+        validate_conf(1.5)
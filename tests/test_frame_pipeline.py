@@ -0,0 +1,51 @@
+import cv2
+
+from src.frame_pipeline import FramePipeline, sampling_stride, count_frames, read_frames
+
+
+def test_sampling_stride():
+    assert sampling_stride(30, 6) == 5
+    assert sampling_stride(25, 6) == 4
+    assert sampling_stride(10, 30) == 1
+    # Unknown frame rate or no target: analyse every frame
+    assert sampling_stride(0, 6) == 1
+    assert sampling_stride(30, 0) == 1
+
+
+def test_count_frames(clip):
+    assert count_frames(clip) == 300
+
+
+def test_pipeline_yields_every_stride_th_frame(clip):
+    cap = cv2.VideoCapture(clip)
+    try:
+        with FramePipeline(cap, frame_skip=5, seek_min_stride=0) as pipeline:
+            numbers = [frame_number for frame_number, _ in pipeline]
+    finally:
+        cap.release()
+    assert numbers == list(range(5, 301, 5))
+    # Grabbing every frame, the reader ends at the video's length
+    assert pipeline.frames_read == 300
+    assert pipeline.seeks == 0
+
+
+def test_seeking_pipeline_stops_at_last_sample(clip):
+    cap = cv2.VideoCapture(clip)
+    try:
+        with FramePipeline(cap, frame_skip=120, seek_min_stride=10) as pipeline:
+            numbers = [frame_number for frame_number, _ in pipeline]
+    finally:
+        cap.release()
+    assert numbers == [120, 240]
+    assert pipeline.seeks > 0
+    # Which is why analyze_video() can't take the reader position as total_frames here
+    assert pipeline.frames_read == 240
+
+
+def test_read_frames_drops_frames_past_the_end(clip):
+    cap = cv2.VideoCapture(clip)
+    try:
+        numbers = [frame_number for frame_number, _ in read_frames(cap, [1, 150, 300, 301, 400])]
+    finally:
+        cap.release()
+    assert numbers == [1, 150, 300]
@@ -0,0 +1,64 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.inference import Detections, iter_batched_predictions
+from src.resolution import AutoImgsz, parse_imgsz, make_imgsz, imgsz_stats
+from tests.conftest import FakeModel
+
+FRAME = np.zeros((360, 640, 3), np.uint8)
+BALL = Detections([[300, 170, 316, 186]], [0.9])  # 16 px of 640: spans 12 px at inference sizes of 480 and up
+NOTHING = Detections(np.zeros((0, 4)), [])
+
+
+def test_parse_imgsz():
+    assert parse_imgsz('auto') == 'auto'
+    assert parse_imgsz('640') == 640
+    assert parse_imgsz(600) == 608
+    with pytest.raises(ValueError):
+        parse_imgsz('big')
+    with pytest.raises(ValueError):
+        parse_imgsz(16)
+
+
+def test_auto_drops_to_the_smallest_size_that_resolves_the_ball():
+    auto = AutoImgsz(sizes=(320, 416, 512, 640), min_ball_px=12, patience=2)
+    assert auto.size == 640
+    auto.observe(640, [(FRAME, BALL)])
+    assert auto.size == 512
+    # Back to the largest size after `patience` frames without the ball
+    auto.observe(512, [(FRAME, NOTHING), (FRAME, NOTHING)])
+    assert auto.size == 640
+
+
+def test_a_batch_is_counted_under_the_size_it_ran_at():
+    auto = AutoImgsz(sizes=(320, 416, 512, 640), min_ball_px=12, patience=5)
+    # The size changes on the first frame, but all eight ran at 640
+    auto.observe(640, [(FRAME, BALL)] * 8)
+    assert auto.frames_by_size == {640: 8}
+    auto.observe(auto.size, [(FRAME, BALL)] * 6)
+    assert auto.stats()["frames_by_size"] == {"512": 6, "640": 8}
+
+
+def test_frames_by_size_matches_what_the_model_ran(clip):
+    cap = cv2.VideoCapture(clip)
+    frames = []
+    for frame_number in range(1, 301):
+        ok, frame = cap.read()
+        if frame_number % 5 == 0:
+            frames.append((frame_number, frame))
+    cap.release()
+
+    model = FakeModel()
+    imgsz = make_imgsz('auto')
+    list(iter_batched_predictions(model, frames, batch_size=8, imgsz=imgsz))
+    ran = {}
+    for count, size in model.calls:
+        ran[str(size)] = ran.get(str(size), 0) + count
+    assert len(ran) > 1
+    assert imgsz_stats(imgsz)["frames_by_size"] == ran
+
+
+def test_fixed_size_stats():
+    assert imgsz_stats(make_imgsz('640')) == {"mode": 'fixed', "current": 640}
+    assert make_imgsz(None) is None
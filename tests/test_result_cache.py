@@ -0,0 +1,33 @@
+from src.result_cache import ResultCache, cache_key
+
+OPTIONS = {"mode": 'full-scan', "target_fps": 6, "imgsz": '640'}
+
+
+def test_cache_key_is_stable_and_order_independent():
+    reordered = dict(reversed(list(OPTIONS.items())))
+    assert cache_key('video', 'v1', 0.25, OPTIONS) == cache_key('video', 'v1', 0.25, reordered)
+
+
+def test_cache_key_changes_with_anything_that_changes_the_result():
+    key = cache_key('video', 'v1', 0.25, OPTIONS)
+    assert cache_key('other', 'v1', 0.25, OPTIONS) != key
+    assert cache_key('video', 'v2', 0.25, OPTIONS) != key
+    assert cache_key('video', 'v1', 0.5, OPTIONS) != key
+    assert cache_key('video', 'v1', 0.25, dict(OPTIONS, mode='first-hit')) != key
+
+
+def test_result_cache_round_trip(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), max_bytes=1024 * 1024)
+    assert cache.get('key') is None
+    cache.put('key', {"event_detected": True}, b'jpeg')
+    response, image = cache.get('key')
+    assert response == {"event_detected": True}
+    assert image == b'jpeg'
+    # The index is rebuilt from the directory on start-up
+    assert ResultCache(directory=str(tmp_path), max_bytes=1024 * 1024).get('key') is not None
+
+
+def test_disabled_result_cache(tmp_path):
+    cache = ResultCache(directory=str(tmp_path / 'off'), max_bytes=0)
+    cache.put('key', {"event_detected": True})
+    assert cache.get('key') is None
@@ -0,0 +1,36 @@
+import sys
+from itertools import takewhile
+
+from src.sharded import shard_ranges
+
+
+def sampled(ranges, video_frames):
+    """The frame numbers the ranges hold up to video_frames (the last range is open-ended)."""
+    return [n for r in ranges for n in takewhile(lambda n: n <= video_frames, r)]
+
+
+def test_ranges_cover_every_sampled_frame_once():
+    ranges = shard_ranges(300, 5, 2)
+    assert len(ranges) == 2
+    assert ranges[0] == range(5, 155, 5)
+    assert sampled(ranges, 300) == list(range(5, 301, 5))
+
+
+def test_ranges_are_near_equal():
+    ranges = shard_ranges(110, 10, 3)
+    lengths = [len(r) for r in ranges[:-1]] + [len(sampled(ranges[-1:], 110))]
+    assert lengths == [4, 4, 3]
+
+
+def test_last_range_is_open_ended():
+    # A container count that is too low must not cut off the end of the video
+    last = shard_ranges(300, 5, 4)[-1]
+    assert last.stop == sys.maxsize and last.step == 5
+
+
+def test_no_more_shards_than_sampled_frames():
+    assert len(shard_ranges(10, 5, 8)) == 2
+
+
+def test_unknown_frame_count_is_one_range():
+    assert shard_ranges(0, 5, 4) == [range(5, sys.maxsize, 5)]